@@ -0,0 +1,257 @@
+import re
+import threading
+
+# ความสัมพันธ์สำหรับ select แบบ embed เช่น "*, subjects(*)": (ตารางหลัก, ตารางที่ embed) -> (คอลัมน์หลัก, คอลัมน์ปลายทาง)
+RELATIONS = {
+    ('curriculums', 'subjects'): ('subject_code', 'subject_code'),
+}
+
+class MemoryResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _like_to_regex(pattern):
+    """แปลง pattern แบบ SQL LIKE (% และ _) เป็น regex"""
+    parts = []
+    for ch in pattern:
+        if ch == '%': parts.append('.*')
+        elif ch == '_': parts.append('.')
+        else: parts.append(re.escape(ch))
+    return re.compile('^' + ''.join(parts) + '$', re.IGNORECASE | re.DOTALL)
+
+COMPARISONS = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+def _compare(value, other, op):
+    """เทียบแบบ SQL: NULL ไม่ผ่านทุกเงื่อนไข, เทียบเป็นตัวเลขถ้าแปลงได้"""
+    if value is None: return False
+    try:
+        value, other = float(value), float(other)
+    except (TypeError, ValueError):
+        value, other = str(value), str(other)
+    return {'>': value > other, '>=': value >= other, '<': value < other, '<=': value <= other}[op]
+
+def _is(value, other):
+    other = str(other).lower()
+    if other == 'null': return value is None
+    return value is (other == 'true')
+
+def _split_columns(columns):
+    """แยก "*, subjects(*)" ตาม comma ที่ไม่อยู่ในวงเล็บ"""
+    items, depth, current = [], 0, ''
+    for ch in columns:
+        if ch == ',' and depth == 0:
+            items.append(current.strip())
+            current = ''
+            continue
+        depth += ch == '('
+        depth -= ch == ')'
+        current += ch
+    if current.strip():
+        items.append(current.strip())
+    return items
+
+class MemoryQuery:
+    """query builder แบบเดียวกับ supabase-py (เฉพาะส่วนที่ระบบใช้)"""
+
+    def __init__(self, db, table_name):
+        self.db = db
+        self.table_name = table_name
+        self.op = 'select'
+        self.columns = '*'
+        self.count_mode = None
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.limit_n = None
+        self.offset = 0
+
+    # --- operations ---
+    def select(self, columns='*', count=None):
+        self.op, self.columns, self.count_mode = 'select', columns, count
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = 'insert', rows
+        return self
+
+    def upsert(self, rows, on_conflict=''):
+        self.op, self.payload = 'upsert', rows
+        self.conflict_columns = [c.strip() for c in on_conflict.split(',') if c.strip()] or ['id']
+        return self
+
+    def update(self, values):
+        self.op, self.payload = 'update', values
+        return self
+
+    def delete(self):
+        self.op = 'delete'
+        return self
+
+    # --- filters ---
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) != str(value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: _compare(row.get(column), value, '>'))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: _compare(row.get(column), value, '>='))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: _compare(row.get(column), value, '<'))
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: _compare(row.get(column), value, '<='))
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: _is(row.get(column), value))
+        return self
+
+    def in_(self, column, values):
+        allowed = {str(v) for v in values}
+        self.filters.append(lambda row: str(row.get(column)) in allowed)
+        return self
+
+    def ilike(self, column, pattern):
+        regex = _like_to_regex(pattern)
+        self.filters.append(lambda row: row.get(column) is not None and bool(regex.match(str(row.get(column)))))
+        return self
+
+    def or_(self, expression):
+        """รูปแบบ "first_name.ilike.%x%,last_name.eq.y" (รองรับ eq / neq / ilike / is / gt / gte / lt / lte)"""
+        checks = []
+        for part in expression.split(','):
+            column, operator, value = part.split('.', 2)
+            if operator == 'ilike':
+                regex = _like_to_regex(value)
+                checks.append(lambda row, c=column, r=regex: row.get(c) is not None and bool(r.match(str(row.get(c)))))
+            elif operator == 'eq':
+                checks.append(lambda row, c=column, v=value: str(row.get(c)) == v)
+            elif operator == 'neq':
+                checks.append(lambda row, c=column, v=value: str(row.get(c)) != v)
+            elif operator == 'is':
+                checks.append(lambda row, c=column, v=value: _is(row.get(c), v))
+            elif operator in COMPARISONS:
+                checks.append(lambda row, c=column, v=value, op=COMPARISONS[operator]: _compare(row.get(c), v, op))
+            else:
+                raise ValueError(f"Unsupported or_ operator: {operator}")
+        self.filters.append(lambda row: any(check(row) for check in checks))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    # --- execute ---
+    def _matches(self, row):
+        return all(f(row) for f in self.filters)
+
+    def _project(self, row):
+        out = {}
+        for item in _split_columns(self.columns):
+            if item == '*':
+                out.update(row)
+            elif '(' in item:
+                name = item[:item.index('(')].strip()
+                local, remote = RELATIONS[(self.table_name, name)]
+                related = self.db.index(name, remote).get(str(row.get(local)))
+                out[name] = dict(related) if related is not None else None
+            else:
+                out[item] = row.get(item)
+        return out
+
+    def execute(self):
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table_name, [])
+            if self.op == 'insert':
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = [self.db.with_id(self.table_name, row) for row in payload]
+                rows.extend(inserted)
+                self.db.invalidate(self.table_name)
+                return MemoryResponse([dict(r) for r in inserted])
+            if self.op == 'upsert':
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                existing = {tuple(str(r.get(c)) for c in self.conflict_columns): r for r in rows}
+                written = []
+                for row in payload:
+                    current = existing.get(tuple(str(row.get(c)) for c in self.conflict_columns))
+                    if current is not None:
+                        current.update(row)
+                    else:
+                        current = self.db.with_id(self.table_name, row)
+                        rows.append(current)
+                        existing[tuple(str(current.get(c)) for c in self.conflict_columns)] = current
+                    written.append(dict(current))
+                self.db.invalidate(self.table_name)
+                return MemoryResponse(written)
+            if self.op == 'delete':
+                removed = [r for r in rows if self._matches(r)]
+                self.db.tables[self.table_name] = [r for r in rows if not self._matches(r)]
+                self.db.invalidate(self.table_name)
+                return MemoryResponse([dict(r) for r in removed])
+            if self.op == 'update':
+                updated = []
+                for r in rows:
+                    if self._matches(r):
+                        r.update(self.payload)
+                        updated.append(dict(r))
+                self.db.invalidate(self.table_name)
+                return MemoryResponse(updated)
+
+            selected = [r for r in rows if self._matches(r)]
+            count = len(selected) if self.count_mode else None
+            for column, desc in reversed(self.orders):
+                selected.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            end = None if self.limit_n is None else self.offset + self.limit_n
+            return MemoryResponse([self._project(r) for r in selected[self.offset:end]], count)
+
+class MemoryDB:
+    """ฐานข้อมูลในหน่วยความจำที่ใช้แทน Supabase client ตอน benchmark (ไม่ต่อ network)"""
+
+    def __init__(self, tables=None):
+        self.tables = {name: [dict(r) for r in rows] for name, rows in (tables or {}).items()}
+        self.lock = threading.RLock()
+        self.next_id = {}
+        self.indexes = {}
+
+    def table(self, name):
+        return MemoryQuery(self, name)
+
+    def with_id(self, table_name, row):
+        row = dict(row)
+        if 'id' not in row:
+            if table_name not in self.next_id:
+                ids = [r['id'] for r in self.tables.get(table_name, []) if isinstance(r.get('id'), int)]
+                self.next_id[table_name] = max(ids, default=0) + 1
+            row['id'] = self.next_id[table_name]
+            self.next_id[table_name] += 1
+        return row
+
+    def index(self, table_name, column):
+        """index สำหรับ embed (สร้างครั้งเดียวจนกว่าตารางจะเปลี่ยน)"""
+        key = (table_name, column)
+        if key not in self.indexes:
+            self.indexes[key] = {str(r.get(column)): r for r in self.tables.get(table_name, [])}
+        return self.indexes[key]
+
+    def invalidate(self, table_name):
+        for key in [k for k in self.indexes if k[0] == table_name]:
+            del self.indexes[key]
@@ -0,0 +1,224 @@
+"""Benchmark ตัวจัดตาราง โดยไม่ต่อ Supabase
+
+ตัวอย่าง:
+    python -m benchmarks.run --scales 50,500 --modes fast --output report.json
+    python -m benchmarks.run --scales 500 --baseline old.json   # เทียบกับรายงานของเวอร์ชันก่อน
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from core import ai_scheduler
+from core.ai_scheduler import GEN_CONFIGS, load_problem, create_smart_individual, save_to_db
+from core.fitness_engine import PopulationEvaluator, population_to_array
+from core.delta_eval import DeltaEvaluator
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+
+DEFAULT_SCALES = "50,500"
+DEFAULT_MODES = "fast"
+DEFAULT_POP = 200       # จำนวน individual ที่ใช้วัด init / evaluation
+EDIT_MOVES = 200        # จำนวนการแก้ทีละวิชาที่ใช้วัด delta apply เทียบกับประเมินเต็ม
+DEFAULT_TIME_BUDGET = 60
+
+# ค่าที่ยิ่งมากยิ่งดี (ใช้กำหนดทิศทางตอนเทียบกับ baseline)
+HIGHER_IS_BETTER = ("per_sec",)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+@contextlib.contextmanager
+def quiet(enabled):
+    """ปิด print ของ scheduler ระหว่างจับเวลา"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+# --- Scenarios ---
+def bench_init(table, n):
+    """สร้างประชากรเริ่มต้น n ตัว -> individuals/sec"""
+    population, seconds = timed(lambda: [create_smart_individual(table) for _ in range(n)])
+    return population, {"individuals": n, "seconds": round(seconds, 4),
+                        "individuals_per_sec": round(n / seconds, 1)}
+
+def list_bytes(rows):
+    """ขนาดของ gene แบบ list ของ [room, start, teacher] (แบบเดิมก่อนใช้ array) รวม int ที่ไม่ได้อยู่ใน cache ของ Python"""
+    return sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row if not -5 <= v <= 256)
+                                     for row in rows)
+
+def bench_genome(population):
+    """หน่วยความจำของ gene ทั้งรุ่น (array เทียบกับ list ซ้อนแบบเดิม) และเวลา clone ทั้งรุ่นแบบใน varAnd"""
+    as_lists = [ind.tolist() for ind in population]
+    # individual อาจเป็น view ของ array อื่น (getsizeof ไม่นับ buffer) จึงบวก nbytes เอง
+    array_bytes = sum(sys.getsizeof(ind) + (ind.nbytes if ind.base is not None else 0) for ind in population)
+    _, clone_seconds = timed(lambda: [copy.deepcopy(ind) for ind in population])
+    _, list_clone_seconds = timed(lambda: [copy.deepcopy(rows) for rows in as_lists])
+    return {"individuals": len(population), "dtype": str(population[0].dtype) if population else None,
+            "population_bytes": array_bytes, "list_population_bytes": sum(list_bytes(rows) for rows in as_lists),
+            "clone_seconds": round(clone_seconds, 4), "list_clone_seconds": round(list_clone_seconds, 4)}
+
+def bench_evaluation(table, problem_maps, population):
+    """ประเมินทั้งรุ่น (vectorized) -> evals/sec และการแก้ทีละวิชาแบบ editor (delta apply เทียบกับประเมินเต็ม 1 ตาราง)"""
+    evaluator = PopulationEvaluator(table, *problem_maps)
+    genomes = population_to_array(population)
+    evaluator.evaluate_population(genomes)  # warm-up
+    _, seconds = timed(evaluator.evaluate_population, genomes)
+    vectorized = {"evals": len(population), "seconds": round(seconds, 4),
+                  "evals_per_sec": round(len(population) / seconds, 1)}
+
+    # แก้ทีละ 1 วิชาแบบ editor: ย้ายวิชาไปตำแหน่งเดียวกับใน individual อื่นของรุ่น
+    delta = DeltaEvaluator(evaluator)
+    genes = np.array(population[0], dtype=np.int64)
+    state = delta.build(genes)
+    rng = random.Random(0)
+    edits = [(rng.randrange(len(genes)), rng.randrange(len(population))) for _ in range(EDIT_MOVES)]
+
+    def edit_delta():
+        for course, source in edits:
+            genes[course] = population[source][course]
+            delta.apply(state, genes, np.array([course]))
+
+    def edit_full():
+        for course, source in edits:
+            genes[course] = population[source][course]
+            evaluator.evaluate_population([genes])
+
+    _, delta_seconds = timed(edit_delta)
+    _, full_seconds = timed(edit_full)
+    return {"vectorized": vectorized,
+            "single_edit": {"edits": len(edits),
+                            "delta_us_per_edit": round(delta_seconds / len(edits) * 1e6, 1),
+                            "full_us_per_edit": round(full_seconds / len(edits) * 1e6, 1)}}
+
+def bench_full_run(db, mode, time_budget, decompose=None):
+    """run_genetic_algorithm ทั้งรอบ (โหลด -> evolve -> local search -> บันทึก) ใน db จำลอง"""
+    result, seconds = timed(ai_scheduler.run_genetic_algorithm, mode, db=db, time_budget_seconds=time_budget,
+                            decompose=decompose)
+    return {"seconds": round(seconds, 3), "status": result.get("status"), "penalty": result.get("penalty"),
+            "stop_reason": result.get("stop_reason"), "generations_run": result.get("generations_run"),
+            "generations_per_sec": round(result.get("generations_run", 0) / seconds, 2),
+            "fitness_cache": result.get("fitness_cache"), "decomposition": result.get("decomposition")}
+
+def bench_save(db, table, individual):
+    """save_to_db ครั้งแรก (ทุกแถวใหม่) และบันทึกซ้ำด้วยตารางเดิม (diff ว่าง)"""
+    saved, seconds = timed(save_to_db, individual, table, db)
+    _, repeat_seconds = timed(save_to_db, individual, table, db)
+    rows = saved["rows"] if saved else 0
+    return {"rows": rows, "seconds": round(seconds, 4), "rows_per_sec": round(rows / seconds, 1),
+            "unchanged_seconds": round(repeat_seconds, 4)}
+
+def run_scale(n_courses, modes, pop, time_budget, seed, verbose, department_local=0.0, decompose=None):
+    random.seed(seed)
+    np.random.seed(seed)
+    dataset = generate_dataset(n_courses, seed, department_local)
+    db = MemoryDB(dataset)
+    report = {"courses": n_courses, "rooms": len(dataset["classrooms"]),
+              "instructors": len(dataset["instructors"]), "subjects": len(dataset["subjects"])}
+
+    with quiet(not verbose):
+        (table, *problem_maps), seconds = timed(load_problem, db)
+        report["load"] = {"seconds": round(seconds, 4)}
+
+        population, report["init"] = bench_init(table, pop)
+        report["genome"] = bench_genome(population)
+        report["evaluation"] = bench_evaluation(table, problem_maps, population)
+        report["save"] = bench_save(db, table, population[0])
+        report["runs"] = {mode: bench_full_run(db, mode, time_budget, decompose) for mode in modes}
+    return report
+
+# --- Report ---
+def flatten(report, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1} (เฉพาะตัวเลข)"""
+    out = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+def compare(report, baseline):
+    """เทียบตัวเลขทุกตัวกับ baseline -> {metric: {"baseline", "current", "change_pct", "better"}}"""
+    current, previous = flatten(report["scales"]), flatten(baseline.get("scales", {}))
+    diff = {}
+    for name in sorted(current.keys() & previous.keys()):
+        old, new = previous[name], current[name]
+        if old == new: continue
+        change = (new - old) / abs(old) * 100 if old else None
+        better = None
+        if name.endswith("seconds") or name.endswith("penalty"):
+            better = new < old
+        elif any(tag in name for tag in HIGHER_IS_BETTER):
+            better = new > old
+        diff[name] = {"baseline": old, "current": new,
+                      "change_pct": round(change, 1) if change is not None else None, "better": better}
+    return diff
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the timetable scheduler on synthetic data")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="จำนวนวิชา คั่นด้วย comma เช่น 50,500,5000")
+    parser.add_argument("--modes", default=DEFAULT_MODES, help=f"โหมดที่รันเต็มรอบ ({' | '.join(GEN_CONFIGS)}) หรือ none")
+    parser.add_argument("--pop", type=int, default=DEFAULT_POP, help="จำนวน individual สำหรับวัด init / evaluation")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET, help="เวลาสูงสุดต่อการรันเต็ม (วินาที)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--department-local", type=float, default=0.0,
+                        help="สัดส่วนวิชาที่ใช้ครูในแผนกเดียวกัน (0-1, ข้อมูลที่แผนกใช้ครูร่วมกันน้อย)")
+    parser.add_argument("--decompose", type=int, help="จำนวนส่วนที่แบ่งปัญหา (ไม่ระบุ = ตามโหมด)")
+    parser.add_argument("--output", help="ไฟล์ JSON ที่จะเขียนรายงาน (ไม่ระบุ = stdout)")
+    parser.add_argument("--baseline", help="รายงานเดิมสำหรับเทียบผล")
+    parser.add_argument("--verbose", action="store_true", help="แสดง log ของ scheduler")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    modes = [] if args.modes == "none" else [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in GEN_CONFIGS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    report = {"meta": {"git_commit": git_commit(), "timestamp": datetime.now(timezone.utc).isoformat(),
+                       "python": platform.python_version(), "numpy": np.__version__,
+                       "platform": platform.platform(), "seed": args.seed, "pop": args.pop,
+                       "time_budget_seconds": args.time_budget, "department_local": args.department_local,
+                       "decompose": args.decompose},
+              "scales": {}}
+    for n in scales:
+        print(f"⏱️ Benchmark: {n} courses", file=sys.stderr)
+        report["scales"][str(n)] = run_scale(n, modes, args.pop, args.time_budget, args.seed, args.verbose,
+                                              args.department_local, args.decompose)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["baseline"] = {"git_commit": baseline.get("meta", {}).get("git_commit")}
+        report["diff"] = compare(report, baseline)
+
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import random
+
+# ชื่อวิชาตัวอย่าง: (ชื่อ, น้ำหนักการสุ่ม) วิชาลูกเสือ / คอม / ทฤษฎี ต้องใช้ห้องเฉพาะจึงให้น้ำหนักต่ำ
+SUBJECT_NAMES = [
+    ("วงจรไฟฟ้า", 6), ("ฟิสิกส์", 6), ("เคมี", 6), ("เครื่องยนต์เบื้องต้น", 6), ("งานเชื่อม", 6),
+    ("การเขียนโปรแกรมคอมพิวเตอร์", 0.6), ("ภาษาไทย", 0.5), ("ภาษาอังกฤษ", 0.5), ("ลูกเสือ", 0.2),
+]
+DEPARTMENTS = ["คอมพิวเตอร์", "ไฟฟ้า", "ช่างยนต์", "อิเล็กทรอนิกส์"]
+FIXED_ROOMS = ["LB101", "LB102", "TH201", "TH202", "สนามฟุตบอล"]
+COURSES_PER_GROUP = 8       # จำนวนวิชาต่อกลุ่มนักเรียน (ใกล้เคียงข้อมูลจริง)
+STUDENTS_PER_GROUP = 30
+
+def generate_dataset(n_courses, seed=0, department_local=0.0):
+    """ข้อมูลจำลองขนาด n_courses วิชา -> dict ของแถวแต่ละตาราง (curriculums / subjects / classrooms / instructors / students)
+
+    สัดส่วน: ห้อง ~ n/8, ครู ~ n/4 (หัวหน้าแผนกทุกคนที่ 10), วิชา ~ n/4 แต่ละวิชามีครูที่สอนได้ 1-3 คน
+    department_local: สัดส่วนวิชาที่สอนโดยครูในแผนกเดียวกันและเรียนเฉพาะแผนกนั้น (0 = สุ่มข้ามแผนกทั้งหมด)
+    """
+    rnd = random.Random(seed)
+    n_groups = max(1, n_courses // COURSES_PER_GROUP)
+    n_rooms = max(4, n_courses // 8)
+    n_instructors = max(4, n_courses // 4)
+    n_subjects = max(4, n_courses // 4)
+
+    classrooms = [{"room_code": code, "room_type": "special"} for code in FIXED_ROOMS]
+    classrooms += [{"room_code": f"R{k:04d}", "room_type": "lecture"} for k in range(n_rooms)]
+
+    instructors = []
+    for k in range(n_instructors):
+        instructors.append({
+            "id": k + 1, "first_name": f"ครู{k}", "last_name": f"ทดสอบ{k}",
+            "department": DEPARTMENTS[k % len(DEPARTMENTS)],
+            "position_role": "หัวหน้าแผนก" if k % 10 == 0 else "ครู",
+        })
+
+    names, weights = zip(*SUBJECT_NAMES)
+    subjects = []
+    for k in range(n_subjects):
+        subject = {
+            "subject_code": f"S{k:05d}",
+            "subject_name": rnd.choices(names, weights=weights)[0],
+            "theory_hours": rnd.randint(0, 2),
+            "practice_hours": rnd.randint(0, 2),  # รวมไม่เกิน 4 ชั่วโมง (5 ชั่วโมงไม่มีช่องที่ลงได้)
+        }
+        pool = instructors
+        if department_local and rnd.random() < department_local:
+            subject["department"] = DEPARTMENTS[k % len(DEPARTMENTS)]
+            pool = [ins for ins in instructors if ins["department"] == subject["department"]]
+        for slot, ins in enumerate(rnd.sample(pool, min(len(pool), rnd.randint(1, 3))), start=1):
+            subject[f"instructor_{slot}_fname"] = ins["first_name"]
+            subject[f"instructor_{slot}_lname"] = ins["last_name"]
+        subjects.append(subject)
+
+    groups = [(DEPARTMENTS[g % len(DEPARTMENTS)], str(g // len(DEPARTMENTS) % 3 + 1), str(g // (3 * len(DEPARTMENTS)) + 1))
+              for g in range(n_groups)]
+    by_department = {}
+    for subject in subjects:
+        by_department.setdefault(subject.get("department"), []).append(subject)
+    curriculums = []
+    for k in range(n_courses):
+        dept, year, group_no = groups[k % n_groups]
+        pool = subjects
+        if department_local and dept in by_department and rnd.random() < department_local:
+            pool = by_department[dept]
+        curriculums.append({
+            "id": k + 1, "subject_code": rnd.choice(pool)["subject_code"],
+            "department": dept, "year_level": year, "group_no": group_no,
+            "advisor_id": rnd.choice(instructors)["id"] if rnd.random() < 0.3 else None,
+        })
+
+    students = []
+    for g, (dept, year, group_no) in enumerate(groups):
+        for s in range(STUDENTS_PER_GROUP):
+            students.append({"id": len(students) + 1, "student_id": f"{g:04d}{s:02d}",
+                             "first_name": f"นักเรียน{g}_{s}", "last_name": "ทดสอบ",
+                             "department": dept, "year_level": year, "group_no": group_no})
+
+    # ตารางเรียนแบบมีเวอร์ชัน ตามหลัง migrations/001_schedule_versions.sql
+    return {"curriculums": curriculums, "subjects": subjects, "classrooms": classrooms,
+            "instructors": instructors, "students": students, "generated_schedules": [],
+            "schedule_versions": [{"id": 0, "status": "ready", "mode": "legacy"}],
+            "schedule_active": [{"id": 1, "version_id": 0}]}
@@ -7,4 +7,29 @@ class Config:
     # ถ้าไม่มีค่าใน env จะใช้ default (ควรตั้งค่าใน Production environment)
     SUPABASE_URL = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
-    SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
\ No newline at end of file
+    SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
+
+    # จำนวน process สำหรับประเมิน fitness แบบขนาน (0/1 = ไม่ใช้ pool)
+    GA_WORKERS = int(os.getenv("GA_WORKERS", "0"))
+
+    # จำนวนงานจัดตารางที่รันพร้อมกันใน background (ต่อ process)
+    # สถานะงานอยู่ใน memory ของ process จึงต้องรัน gunicorn แบบ worker เดียว (ดู Procfile) ไม่งั้น /jobs/<id> อาจหา job ไม่เจอ
+    GA_JOB_WORKERS = int(os.getenv("GA_JOB_WORKERS", "1"))
+
+    # อายุของ cache ข้อมูลปัญหา (curriculums / classrooms / instructors) ในหน่วยวินาที (0 = โหลดใหม่ทุกครั้ง)
+    PROBLEM_CACHE_TTL = float(os.getenv("PROBLEM_CACHE_TTL", "300"))
+
+    # อายุของ index ตารางเรียนสำหรับ /schedules/search (กันกรณี process อื่นเป็นคนบันทึกตารางใหม่, 0 = โหลดใหม่ทุกครั้ง)
+    SCHEDULE_INDEX_TTL = float(os.getenv("SCHEDULE_INDEX_TTL", "60"))
+
+    # อายุของจำนวนแถวที่ cache ไว้สำหรับ /stats (วินาที)
+    STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+
+    # จำนวนแถวต่อการ insert 1 ครั้งของ bulk import
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+    # จำนวน thread ที่ใช้ insert batch ของตารางเรียนเวอร์ชันใหม่พร้อมกัน
+    SAVE_WORKERS = int(os.getenv("SAVE_WORKERS", "4"))
+
+    # เก็บเวลาแต่ละช่วง / สถิติรายรุ่น / penalty แยกตามกฎ ของการจัดตาราง (ดูที่ /ai/metrics, 0 = ปิด)
+    GA_METRICS = os.getenv("GA_METRICS", "1") == "1"
@@ -1,23 +1,47 @@
 import random
+import time
 import traceback
 import numpy as np
-from deap import base, creator, tools, algorithms
+from deap import base, creator, tools
 from core.database import supabase
+from core.rules import (
+    DAYS, SLOTS_PER_DAY, LUNCH_SLOT, SCOUT_SLOT, HARD_PENALTY, SCOUT_ROOM_PENALTY,
+    ADVISOR_PENALTY, LATE_PENALTY, METHA_PENALTY, HEAD_LOAD_PENALTY, MIN_LOAD_PENALTY,
+    COMP_DAYS_PENALTY, SD_PENALTY, COMP_ROOM_CODES, THEORY_ROOM_CODES, SCOUT_ROOM_KEYWORDS,
+    get_course_metadata, find_stadium_index, is_head_instructor, is_computer_department,
+)
+from core.course_table import build_allowed_teachers_map, compile_course_table
+from core.fitness_engine import PopulationEvaluator
+from core.parallel_eval import ParallelEvaluator, chunked_population, genome_dtype, make_individual
+from core.islands import run_islands
+from core.decompose import run_decomposed
+from core.constructive import DraftSolver, STOP_CONSTRUCTED
+from core.occupancy import Occupancy, feasible_starts
+from core.problem_cache import get_problem_snapshot
+from core.schedule_index import refresh_schedule_index, invalidate_schedule_index
+from core.stats_cache import stats_cache
+from core.schedule_store import save_schedule_version
+from core.warm_start import (
+    WARM_START_RATIO, load_current_schedule, rebuild_individual, find_affected_courses, gene_records,
+)
+from core.local_search import LocalSearch
+from core.fitness_cache import FitnessCache
+from core.metrics import RunMetrics, metrics_registry
+from core.evolution import (
+    evolve, STOP_MAX_GENERATIONS, STOP_TARGET_REACHED, STOP_TIME_BUDGET, STOP_CANCELLED,
+)
+from config import Config
 
 # --- 1. Setup DEAP ---
 # สร้างคลาสสำหรับ Fitness และ Individual เพียงครั้งเดียว
+# Individual = numpy array (วิชา, 3) ของ [ห้อง, เวลาเริ่ม, ครู] (dtype ตาม genome_dtype) -> clone คือ copy array ก้อนเดียว
+# ระวัง: individual[i] เป็น view การสลับแถวระหว่าง 2 ตัวต้องใช้ fancy index (ได้สำเนา) ดู cx_blocks
 if not hasattr(creator, "FitnessMin"):
     creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
 if not hasattr(creator, "Individual"):
-    creator.create("Individual", list, fitness=creator.FitnessMin)
-
-toolbox = base.Toolbox()
+    creator.create("Individual", np.ndarray, fitness=creator.FitnessMin)
 
 # --- 2. Constants & Configuration ---
-DAYS = 5
-SLOTS_PER_DAY = 10  # 08:00 - 17:00 (รวมพักเที่ยง)
-LUNCH_SLOT = 4      # Slot 4 = 12:00 - 13:00
-
 # Config: เพิ่มโหมด 'precise' สำหรับการจัดตารางที่ซับซ้อนและเงื่อนไขเยอะ
 GEN_CONFIGS = {
     # แนะนำให้ใช้โหมดนี้เพื่อให้ตรงเงื่อนไขทั้ง 17 ข้อมากที่สุด
@@ -25,170 +49,131 @@ GEN_CONFIGS = {
         'pop_size': 2000,       # ประชากรเยอะ เพื่อความหลากหลาย
         'generations': 500,     # รอบเยอะ เพื่อให้ AI เกลี่ยงานครูได้ละเอียด
         'runs': 1,
-        'mutation_prob': 0.2
+        'mutation_prob': 0.2,
+        'evaluation': 'vectorized', # ประเมินทั้งรุ่นในครั้งเดียว (PopulationEvaluator / ParallelEvaluator)
+        'patience': 60,             # หยุดถ้า best ไม่ดีขึ้นติดต่อกันกี่รุ่น (None = ไม่หยุด)
+        'target_penalty': None,     # หยุดเมื่อ penalty ต่ำกว่านี้ (เช่น 1_000_000 = ไม่มี hard violation)
+        'time_budget_seconds': None,# เวลาสูงสุดของการรันทั้งหมด
+        'islands': 1,               # > 1 = แบ่ง pop_size เป็นหลายเกาะรันขนานกันใน process แยก
+        'migration_interval': 20,   # แลก migrant ทุกกี่รุ่น
+        'migration_size': 4,        # จำนวนตัวที่ดีที่สุดที่ส่งออกต่อครั้ง
+        'topology': 'ring',         # 'ring' | 'complete' | 'none'
+        'decompose': 1,             # > 1 = แบ่งตาม (แผนก, ชั้นปี) เป็นหลายส่วนที่ใช้ครู/ห้องร่วมกันน้อย จัดพร้อมกันใน process แยก
+        'draft_seed': False,        # True = ใส่ผลของโหมด draft (DraftSolver) เป็นจุดเริ่มของประชากร
+        'local_search_top_k': 2,    # จำนวนตัวที่ดีที่สุดต่อรุ่นที่ส่งเข้า local search (tabu)
+        'local_search_iterations': 120,       # จำนวนรอบ local search ต่อรุ่น (0 = ปิด) กำหนดด้วยรอบ ผลจึงซ้ำได้ตาม seed
+        'local_search_seconds': 3,            # เพดานเวลาต่อรุ่น (กันค้างเท่านั้น ถ้าชนเพดานผลจะขึ้นกับความเร็วเครื่อง)
+        'final_local_search_iterations': 3000,# จำนวนรอบ local search กับคำตอบสุดท้ายก่อนบันทึก
+        'final_local_search_seconds': 60,     # เพดานเวลาของรอบสุดท้าย
+        'fitness_cache_size': 50000 # จำนวน genome ที่จำ fitness ไว้ (LRU, 0 = ปิด)
     },
-    'balanced': {'pop_size': 800, 'generations': 200, 'runs': 1, 'mutation_prob': 0.3},
-    'fast':     {'pop_size': 200, 'generations': 50,  'runs': 1, 'mutation_prob': 0.4}
+    'balanced': {'pop_size': 800, 'generations': 200, 'runs': 1, 'mutation_prob': 0.3, 'evaluation': 'vectorized',
+                 'patience': 40, 'target_penalty': None, 'time_budget_seconds': None,
+                 'islands': 1, 'migration_interval': 10, 'migration_size': 2, 'topology': 'ring', 'decompose': 1,
+                 'draft_seed': False, 'local_search_top_k': 1, 'local_search_iterations': 80,
+                 'local_search_seconds': 1.5, 'final_local_search_iterations': 1500,
+                 'final_local_search_seconds': 30, 'fitness_cache_size': 20000},
+    'fast':     {'pop_size': 200, 'generations': 50,  'runs': 1, 'mutation_prob': 0.4, 'evaluation': 'vectorized',
+                 'patience': 15, 'target_penalty': HARD_PENALTY, 'time_budget_seconds': None,
+                 'islands': 1, 'migration_interval': 5, 'migration_size': 2, 'topology': 'ring', 'decompose': 1,
+                 'draft_seed': False, 'local_search_top_k': 1, 'local_search_iterations': 30,
+                 'local_search_seconds': 0.5, 'final_local_search_iterations': 500,
+                 'final_local_search_seconds': 10, 'fitness_cache_size': 5000},
+    # ไม่มี GA: จัดแบบ constructive (DSatur + backtrack) ผลเหมือนเดิมทุกครั้ง ใช้ดูตัวอย่างระหว่างแก้หลักสูตร
+    'draft':    {'solver': 'constructive', 'evaluation': 'vectorized', 'local_search_iterations': 0,
+                 'final_local_search_iterations': 0}
 }
+# ชื่อโหมดอื่นที่รับได้ (ตามเอกสาร API เดิม)
+MODE_ALIASES = {'perfect': 'precise'}
 
-# --- 3. Helper Functions ---
-def get_course_metadata(course):
-    """วิเคราะห์ข้อมูลวิชา เพื่อระบุเงื่อนไขพิเศษ"""
-    subj = course.get('subjects', {}) or {}
-    if isinstance(subj, list): subj = subj[0] 
-    
-    t_hrs = int(subj.get('theory_hours') or 0)
-    p_hrs = int(subj.get('practice_hours') or 0)
-    total_hours = t_hrs + p_hrs
-    duration = total_hours if total_hours > 0 else 1
-    
-    subj_name = str(subj.get('subject_name', '')).strip()
-    
-    # 1. เงื่อนไขข้อ 7: วิชาลูกเสือ
-    is_scout = 'ลูกเสือ' in subj_name or 'scout' in subj_name.lower()
-    
-    # 2. เงื่อนไขข้อ 16: วิชาคอมพิวเตอร์ (บังคับห้อง LB)
-    comp_targets = [
-        "การเขียนโปรแกรมคอมพิวเตอร์",
-        "การพัฒนาโปรแกรมบนอุปกรณ์พกพา",
-        "ไมโครคอนโทรลเลอร์",
-        "วงจรพัลส์และดิจิทัล",
-        "อุปกรณ์อิเล็กทรอนิกส์และวงจร",
-        "การใช้โปรแกรมคอมพิวเตอร์กราฟิก"
-    ]
-    is_computer_subj = any(target in subj_name for target in comp_targets)
-    
-    # 3. วิชาทฤษฎีบังคับ (บังคับห้อง TH) - เพิ่มเติมเพื่อความเป็นระเบียบ
-    theory_targets = [
-        "ภาษาไทย", "ภาษาอังกฤษ", "วิทยาศาสตร์", "คณิตศาสตร์คอมพิวเตอร์"
-    ]
-    is_theory_subj = any(target in subj_name for target in theory_targets)
-    
-    # เงื่อนไขข้อ 17: ครูที่ปรึกษา (ถ้าใน DB มีข้อมูล advisor_id ให้ return ค่ามาใช้)
-    advisor_id = course.get('advisor_id') 
-    
-    return duration, is_scout, is_computer_subj, is_theory_subj, advisor_id
-
-def find_stadium_index(room_ids):
-    """ค้นหาห้องที่เป็นสนาม (สำหรับลูกเสือ)"""
-    for idx, r_code in enumerate(room_ids):
-        code_lower = r_code.lower()
-        if any(x in code_lower for x in ['สนาม', 'stadium', 'field', 'sport', 'foot', 'ball']):
-            return idx
-    return len(room_ids) - 1 # Fallback ไปห้องสุดท้ายถ้าหาไม่เจอ
-
-# --- 4. Smart Initialization (หัวใจสำคัญ: หาช่องว่างก่อนลง) ---
-def create_smart_individual(courses, room_count, allowed_teachers_map, room_ids):
-    ind = [None] * len(courses)
-    stadium_idx = find_stadium_index(room_ids)
+# --- 3. Smart Initialization (หัวใจสำคัญ: หาช่องว่างก่อนลง) ---
+ROOM_SAMPLE_TRIES = 8  # จำนวนครั้งที่สุ่มหยิบห้องก่อนจะไล่ดูทุกห้อง
+
+def find_free_placement(occ, table, i, teacher_idx):
+    """หา (ห้อง, เวลาเริ่ม) ที่วิชา i ลงได้โดยไม่ชนใน occ -> None ถ้าไม่มี"""
+    duration = int(table.duration[i])
+
+    # เลือกกลุ่มห้องเป้าหมาย (ห้องคอม / ห้องทฤษฎี / ทุกห้อง)
+    candidate_rooms = table.room_options[i]
     
-    # เตรียม Index ห้องสำหรับวิชาเฉพาะทาง
-    comp_rooms = [i for i, r in enumerate(room_ids) if r in ['LB101', 'LB102']]
-    theory_rooms = [i for i, r in enumerate(room_ids) if r in ['TH201', 'TH202']]
-    # Fallback กันเหนียว
-    if not comp_rooms: comp_rooms = [0]
-    if not theory_rooms: theory_rooms = [0]
-
-    # ตารางบันทึกการจองชั่วคราว (เพื่อกันชนตั้งแต่เริ่ม)
-    used_teacher_slots = set() # (abs_slot, teacher_id)
-    used_room_slots = set()    # (abs_slot, room_idx)
-    used_student_slots = set() # (abs_slot, group_id)
+    # เวลาที่เป็นไปได้ (เว้นพักเที่ยง / ไม่เกิน 17.00) คำนวณไว้แล้วตาม duration
+    starts, _ = feasible_starts(duration)
+
+    # ข้อ 3,4,5: ช่องที่ครูและนักเรียนว่าง (ถ้าไม่มีเลย ห้องไหนก็ลงไม่ได้)
+    teacher_group_free = occ.free_starts(teacher_idx, int(table.group[i]), duration)
+    if not teacher_group_free:
+        return None
+
+    # ข้อ 6: สุ่ม 1 ห้องจากห้องที่มีช่องว่างตรงกัน (เท่ากับสุ่มลำดับห้องแล้วเอาห้องแรกที่ลงได้)
+    # สุ่มหยิบก่อนไม่กี่ครั้ง ถ้าไม่เจอค่อยไล่ดูทุกห้อง
+    open_rooms = []
+    for _ in range(ROOM_SAMPLE_TRIES):
+        room_idx = random.choice(candidate_rooms)
+        free = occ.free_in_room(teacher_group_free, room_idx, duration)
+        if free:
+            open_rooms.append((room_idx, free))
+            break
+    else:
+        for room_idx in candidate_rooms:
+            free = occ.free_in_room(teacher_group_free, room_idx, duration)
+            if free: open_rooms.append((room_idx, free))
+    if not open_rooms:
+        return None
+
+    # สุ่มเวลาจากช่องที่ว่าง
+    room_idx, free = random.choice(open_rooms)
+    return room_idx, random.choice([st for st in starts if free >> st & 1])
+
+def create_smart_individual(table, seed_genes=None):
+    ind = [None] * table.n_courses
+    if seed_genes is None: seed_genes = table.pinned_genes
+
+    # ตารางบันทึกการจองชั่วคราว (เพื่อกันชนตั้งแต่เริ่ม): bitmask 50 ชั่วโมงต่อห้อง / ครู / กลุ่มนักเรียน
+    occ = Occupancy(table.n_rooms, len(table.instructor_ids), table.n_groups)
+    occ.block(table)
 
     # สุ่มลำดับวิชาที่จะลงตาราง
-    indices = list(range(len(courses)))
+    indices = list(range(table.n_courses))
     random.shuffle(indices)
 
+    # gene ที่กำหนดมาแล้ว (เช่น ตารางเดิมจาก warm start / วิชาที่ถูก pin) ลงก่อนแล้วจองช่องไว้
+    if seed_genes is not None:
+        for i, gene in enumerate(seed_genes):
+            if gene is None: continue
+            room_idx, start_slot, teacher_idx = gene
+            occ.reserve(room_idx, teacher_idx, int(table.group[i]), start_slot, int(table.duration[i]))
+            ind[i] = [room_idx, start_slot, teacher_idx]
+        indices = [i for i in indices if seed_genes[i] is None]
+
     for i in indices:
-        course = courses[i]
-        duration, is_scout, is_comp_subj, is_theory_subj, _ = get_course_metadata(course)
+        duration = int(table.duration[i])
         
         # Group ID สำหรับเช็คนักเรียนชนกัน (ข้อ 3)
-        dept = course.get('department')
-        yr = course.get('year_level')
-        grp = course.get('group_no', '1')
-        group_id = f"{dept}_{yr}_{grp}"
+        group_id = int(table.group[i])
 
         # สุ่มครูจากผู้ที่มีสิทธิ์สอน (ข้อ 15)
-        valid_teachers = allowed_teachers_map.get(i, [0])
+        valid_teachers = table.teacher_options[i]
         teacher_idx = random.choice(valid_teachers) if valid_teachers else 0
 
         # --- Case 1: วิชาลูกเสือ (Fixed Slot) ---
-        if is_scout:
+        if table.is_scout[i]:
             # ข้อ 7: พุธ 15.00-17.00 (Day 2, Slot 7) -> Index 27
-            final_slot = 27
-            room_idx = stadium_idx
-            
             # จำเป็นต้องลง แม้จะชน (เพราะเป็นกฎตายตัว)
-            for t in range(duration):
-                curr = final_slot + t
-                used_teacher_slots.add((curr, teacher_idx))
-                used_room_slots.add((curr, room_idx))
-                used_student_slots.add((curr, group_id))
-            
-            ind[i] = [room_idx, final_slot, teacher_idx]
+            occ.reserve(table.stadium_idx, teacher_idx, group_id, SCOUT_SLOT, duration)
+            ind[i] = [table.stadium_idx, SCOUT_SLOT, teacher_idx]
             continue
 
         # --- Case 2: วิชาทั่วไป/เฉพาะทาง (หาช่องว่าง) ---
         
-        # เลือกกลุ่มห้องเป้าหมาย
-        candidate_rooms = list(range(room_count))
-        if is_comp_subj: candidate_rooms = comp_rooms
-        elif is_theory_subj: candidate_rooms = theory_rooms
-        
-        random.shuffle(candidate_rooms) # สุ่มห้องในกลุ่มเพื่อกระจายตัว
-        
-        found_placement = False
-        
-        # วนหาห้องและเวลาที่ว่างพร้อมกัน
-        for room_idx in candidate_rooms:
-            # สร้างรายการเวลาที่เป็นไปได้ (เว้นพักเที่ยง)
-            possible_starts = []
-            for d in range(DAYS):
-                for s in range(SLOTS_PER_DAY - duration + 1):
-                    # ข้อ 10: ห้ามทับพักเที่ยง
-                    if s <= LUNCH_SLOT < s + duration: continue
-                    # ข้อ 9: ไม่เกิน 17.00
-                    if s + duration > 9: continue 
-                    # ข้อ 13: เช็ควันว่างครูเมธา (คร่าวๆ) ตรงนี้ก็ได้ หรือไปรอ Mutation ก็ได้
-                    # แต่เพื่อความเร็ว ปล่อยให้ Penalty จัดการเรื่อง Soft Constraint
-                    
-                    possible_starts.append((d * SLOTS_PER_DAY) + s)
-            
-            random.shuffle(possible_starts)
-
-            for start_slot in possible_starts:
-                # ตรวจสอบการชนกัน (Look-ahead Check)
-                collision = False
-                for t in range(duration):
-                    curr = start_slot + t
-                    
-                    # ข้อ 6: ห้องว่างไหม?
-                    if (curr, room_idx) in used_room_slots: 
-                        collision = True; break
-                    # ข้อ 4,5: ครูว่างไหม?
-                    if (curr, teacher_idx) in used_teacher_slots:
-                        collision = True; break
-                    # ข้อ 3: นักเรียนว่างไหม?
-                    if (curr, group_id) in used_student_slots:
-                        collision = True; break
-                
-                if not collision:
-                    # เจอที่ว่าง! จองเลย
-                    for t in range(duration):
-                        curr = start_slot + t
-                        used_room_slots.add((curr, room_idx))
-                        used_teacher_slots.add((curr, teacher_idx))
-                        used_student_slots.add((curr, group_id))
-                    
-                    ind[i] = [room_idx, start_slot, teacher_idx]
-                    found_placement = True
-                    break
-            
-            if found_placement: break
-        
-        # ถ้าหาที่ลงไม่ได้จริงๆ (หายากมากถ้าห้องพอ) -> จำใจต้องสุ่มลงไปก่อน
-        if not found_placement:
-            fallback_room = candidate_rooms[0]
+        placement = find_free_placement(occ, table, i, teacher_idx)
+        if placement is not None:
+            # เจอที่ว่าง! จองเลย
+            room_idx, start_slot = placement
+            occ.reserve(room_idx, teacher_idx, group_id, start_slot, duration)
+            ind[i] = [room_idx, start_slot, teacher_idx]
+        else:
+            # ถ้าหาที่ลงไม่ได้จริงๆ (หายากมากถ้าห้องพอ) -> จำใจต้องสุ่มลงไปก่อน
+            fallback_room = random.choice(table.room_options[i])
             d = random.randint(0, DAYS - 1)
             s = random.randint(0, 8)
             if s >= LUNCH_SLOT: s+=1
@@ -196,41 +181,116 @@ def create_smart_individual(courses, room_count, allowed_teachers_map, room_ids)
             final_slot = (d * SLOTS_PER_DAY) + s
             ind[i] = [fallback_room, final_slot, teacher_idx]
 
-    return creator.Individual(ind)
+    return make_individual(ind, genome_dtype(table))
+
+# --- 4. Mutation & Crossover (ปรับปรุงเพื่อรักษากฎ) ---
+SWAP_PROB = 0.3            # โอกาสสลับเวลา 2 วิชาที่ยาวเท่ากันต่อการ mutate 1 ครั้ง
+TEACHER_CHANGE_PROB = 0.5  # โอกาสเปลี่ยนครูของวิชาที่ถูกเลือก
+INSTRUCTOR_BLOCK_PROB = 0.3  # โอกาสที่ crossover แลกตารางของครู 1 คน แทนการแลกทั้งกลุ่มนักเรียน
+
+def swap_move(individual, table):
+    """สลับเวลา (และห้อง ถ้าห้องของอีกฝ่ายลงได้) ระหว่าง 2 วิชาที่ยาวเท่ากัน"""
+    i = random.choice(table.movable)
+    j = random.choice(table.same_duration[int(table.duration[i])])
+    if i == j: return
+    pair = [i, j]
+    rows = individual[pair]  # fancy index = สำเนา (แถว individual[i] เป็น view สลับตรงๆ ไม่ได้)
+    individual[pair, 1] = rows[::-1, 1]
+    if table.room_mask[i, rows[1, 0]] and table.room_mask[j, rows[0, 0]]:
+        individual[pair, 0] = rows[::-1, 0]
+
+def smart_mutate(individual, table, indpb=0.2, swap_prob=SWAP_PROB):
+    """ย้ายวิชาที่สุ่มได้ (โอกาส indpb) ไปยัง (ห้อง, เวลา) ใน domain ที่ลงได้จริง โดยเลือกช่องที่ยังว่างใน individual นี้ก่อน
+
+    ลูกเสือและวิชาที่ถูก pin (warm start) ไม่ถูกแตะ
+    """
+    if not table.movable: return individual,
+
+    # Swap move: สลับช่องเวลาระหว่าง 2 วิชา
+    if random.random() < swap_prob:
+        swap_move(individual, table)
+
+    chosen = [i for i in table.movable if random.random() < indpb]
+    if not chosen: return individual,
+
+    # จองช่องของวิชาที่ไม่ได้ถูกเลือก แล้วลงวิชาที่ถูกเลือกใหม่ทีละวิชา
+    chosen_set = set(chosen)
+    rows = individual.tolist()  # อ่านเป็น int ของ Python (bitmask ใน Occupancy ต้องใช้ int)
+    occ = Occupancy(table.n_rooms, len(table.instructor_ids), table.n_groups)
+    occ.block(table)
+    for i, (room_idx, start_slot, teacher_idx) in enumerate(rows):
+        if i not in chosen_set:
+            occ.reserve(room_idx, teacher_idx, int(table.group[i]), start_slot, int(table.duration[i]))
+
+    random.shuffle(chosen)
+    for i in chosen:
+        gene = rows[i]
+        duration = int(table.duration[i])
 
-# --- 5. Mutation (ปรับปรุงเพื่อรักษากฎ) ---
-def smart_mutate(individual, courses, room_count, allowed_teachers_map, indpb=0.2):
-    for i, gene in enumerate(individual):
-        _, is_scout, is_comp_subj, is_theory_subj, _ = get_course_metadata(courses[i])
-        
-        if is_scout: continue # ห้ามแตะต้องลูกเสือเด็ดขาด
-        
-        # Mutate Room: ห้ามเปลี่ยนประเภทห้องของวิชาบังคับ
-        if random.random() < indpb:
-            if not is_comp_subj and not is_theory_subj:
-                gene[0] = random.randint(0, room_count - 1)
-            # ถ้าเป็น Comp/Theory เราไม่เปลี่ยนห้องใน Mutation เพื่อรักษา Hard Constraint
-        
-        # Mutate Time: ลองขยับเวลา
-        if random.random() < indpb: 
-            d = random.randint(0, DAYS - 1)
-            candidates = [0, 1, 2, 3, 5, 6, 7]
-            s = random.choice(candidates)
-            duration, _, _, _, _ = get_course_metadata(courses[i])
-            if s + duration > SLOTS_PER_DAY: s = SLOTS_PER_DAY - duration
-            gene[1] = (d * SLOTS_PER_DAY) + s
-            
         # Mutate Teacher: เปลี่ยนครู (ในรายชื่อที่สอนได้)
-        if random.random() < indpb: 
-            valid = allowed_teachers_map.get(i, [])
+        if random.random() < TEACHER_CHANGE_PROB:
+            valid = table.teacher_options[i]
             if valid: gene[2] = random.choice(valid)
-                
+
+        # Mutate Room/Time: ช่องว่างก่อน ถ้าไม่มีเลยสุ่มจาก domain (ห้องตามประเภท, ไม่ทับพักเที่ยง, ไม่เกิน 17.00)
+        placement = find_free_placement(occ, table, i, gene[2])
+        if placement is None:
+            starts, _ = feasible_starts(duration)
+            if starts:
+                placement = (random.choice(table.room_options[i]), random.choice(starts))
+        if placement is not None:
+            gene[0], gene[1] = placement
+        occ.reserve(gene[0], gene[2], int(table.group[i]), gene[1], duration)
+        individual[i] = gene
+
     return individual,
 
-# --- 6. Fitness Function (High Penalty) ---
-def evaluate(individual, courses, room_ids, instructor_ids, 
-             room_details, instructor_details_map, head_instructor_ids):
+def repair_conflicts(individual, table, changed):
+    """ย้ายวิชาใน changed ที่ชนกับวิชาอื่น (ห้อง/ครู/นักเรียน) ไปช่องที่ว่าง ถ้าไม่มีช่องว่างปล่อยไว้ตามเดิม"""
+    changed_set = set(changed)
+    rows = individual.tolist()
+    occ = Occupancy(table.n_rooms, len(table.instructor_ids), table.n_groups)
+    occ.block(table)
+    for i, (room_idx, start_slot, teacher_idx) in enumerate(rows):
+        if i not in changed_set:
+            occ.reserve(room_idx, teacher_idx, int(table.group[i]), start_slot, int(table.duration[i]))
+
+    for i in changed:
+        gene = rows[i]
+        duration = int(table.duration[i])
+        group_id = int(table.group[i])
+        movable = not table.is_scout[i] and not table.pinned[i]
+        if movable and not occ.is_free(gene[0], gene[2], group_id, gene[1], duration):
+            placement = find_free_placement(occ, table, i, gene[2])
+            if placement is not None:
+                gene[0], gene[1] = placement
+                individual[i, :2] = placement
+        occ.reserve(gene[0], gene[2], group_id, gene[1], duration)
+
+def cx_blocks(ind1, ind2, table, indpb=0.5):
+    """Crossover แบบยกก้อน: แลก gene ทั้งกลุ่มนักเรียน (แต่ละกลุ่มโอกาส indpb) หรือทั้งหมดของครู 1 คน
+    แล้วซ่อมวิชาที่แลกมาแล้วชน (ลำดับวิชาใน curriculums ไม่มีความหมาย ตัดแบบ cxTwoPoint จะแยกกลุ่มเดียวกันออกจากกัน)
+    """
+    if random.random() < INSTRUCTOR_BLOCK_PROB:
+        teacher_idx = ind1[random.randrange(table.n_courses), 2]
+        block = np.flatnonzero((ind1[:, 2] == teacher_idx) | (ind2[:, 2] == teacher_idx)).tolist()
+    else:
+        block = [i for courses in table.group_courses if random.random() < indpb for i in courses]
+    if not block:
+        return ind1, ind2
+
+    # fancy index ฝั่งขวาเป็นสำเนา (ind1[i], ind2[i] = ind2[i], ind1[i] กับแถวที่เป็น view จะได้ค่าของ ind2 ทั้งคู่)
+    ind1[block], ind2[block] = ind2[block], ind1[block]
+    random.shuffle(block)
+    repair_conflicts(ind1, table, block)
+    repair_conflicts(ind2, table, block)
+    return ind1, ind2
+
+# --- 5. Fitness Function (High Penalty) ---
+def evaluate(individual, table, instructor_details_map, head_instructor_ids):
     penalty = 0
+    room_ids = table.room_ids
+    instructor_ids = table.instructor_ids
     
     room_usage = {}
     teacher_usage = {}
@@ -243,14 +303,9 @@ def evaluate(individual, courses, room_ids, instructor_ids,
         r_idx, start_slot, t_idx = gene
         room_code = room_ids[r_idx]
         teacher_id = instructor_ids[t_idx]
-        course = courses[i]
-        
-        duration, is_scout, is_comp_subj, is_theory_subj, advisor_id = get_course_metadata(course)
-        
-        dept = course.get('department')
-        yr = course.get('year_level')
-        grp = course.get('group_no', '1')
-        group_id = f"{dept}_{yr}_{grp}"
+        duration = int(table.duration[i])
+        is_scout = table.is_scout[i]
+        group_id = int(table.group[i])
         
         teacher_obj = instructor_details_map.get(teacher_id, {})
         
@@ -261,37 +316,44 @@ def evaluate(individual, courses, room_ids, instructor_ids,
         # --- Hard Constraints Checks (โทษประหาร 1 ล้าน) ---
         
         # ข้อ 16: ห้องคอม
-        if is_comp_subj and room_code not in ['LB101', 'LB102']:
-            penalty += 1_000_000
+        if table.is_comp[i] and room_code not in COMP_ROOM_CODES:
+            penalty += HARD_PENALTY
         
         # ห้องทฤษฎีบังคับ
-        if is_theory_subj and room_code not in ['TH201', 'TH202']:
-            penalty += 1_000_000
+        if table.is_theory[i] and room_code not in THEORY_ROOM_CODES:
+            penalty += HARD_PENALTY
             
         # ข้อ 7: ลูกเสือ
         if is_scout:
-            if day != 2 or slot != 7: penalty += 1_000_000
-            if not any(x in room_code.lower() for x in ['สนาม', 'stadium', 'field']):
-                 penalty += 500_000 
+            if day != 2 or slot != 7: penalty += HARD_PENALTY
+            if not any(x in room_code.lower() for x in SCOUT_ROOM_KEYWORDS):
+                 penalty += SCOUT_ROOM_PENALTY
             # ข้อ 17: ครูที่ปรึกษา (ถ้ามีข้อมูล)
-            if advisor_id and int(advisor_id) != int(teacher_id):
-                 penalty += 200_000
+            if table.has_advisor[i] and int(table.advisor_id[i]) != int(teacher_id):
+                 penalty += ADVISOR_PENALTY
 
         # ข้อ 10: พักเที่ยง
         for t in range(duration):
             curr_slot_in_day = slot + t
             if curr_slot_in_day == LUNCH_SLOT:
-                 penalty += 1_000_000
+                 penalty += HARD_PENALTY
+
+        # ชั่วโมงที่จองไว้ให้ส่วนอื่นของตาราง (table.block(), ใช้กับ decompose)
+        if table.blocked_rooms is not None:
+            for t in range(duration):
+                h = min(max(start_slot + t, 0), len(table.blocked_rooms) - 1)
+                if table.blocked_rooms[h, r_idx] or table.blocked_teachers[h, t_idx]:
+                    penalty += HARD_PENALTY
         
         # --- Soft Constraints & Collisions ---
 
         # ข้อ 13: ครูเมธา
         if 'เมธา' in teacher_obj.get('first_name', ''):
-            if day == 0 and slot < 4: penalty += 50_000
-            if day == 4 and slot >= 5: penalty += 50_000
+            if day == 0 and slot < 4: penalty += METHA_PENALTY
+            if day == 4 and slot >= 5: penalty += METHA_PENALTY
 
         # ข้อ 9: เลิกเย็น
-        if end_slot > 9: penalty += 100_000
+        if end_slot > 9: penalty += LATE_PENALTY
 
         # Loop เช็คการชนกัน
         for t in range(duration):
@@ -301,15 +363,15 @@ def evaluate(individual, courses, room_ids, instructor_ids,
             teacher_days_active[teacher_id].add(day)
             
             # ข้อ 6: ห้องชน
-            if (curr_abs, r_idx) in room_usage: penalty += 1_000_000
+            if (curr_abs, r_idx) in room_usage: penalty += HARD_PENALTY
             else: room_usage[(curr_abs, r_idx)] = True
             
             # ข้อ 4,5: ครูชน
-            if (curr_abs, teacher_id) in teacher_usage: penalty += 1_000_000
+            if (curr_abs, teacher_id) in teacher_usage: penalty += HARD_PENALTY
             else: teacher_usage[(curr_abs, teacher_id)] = True
                 
             # ข้อ 3: นร.ชน
-            if (curr_abs, group_id) in student_usage: penalty += 1_000_000
+            if (curr_abs, group_id) in student_usage: penalty += HARD_PENALTY
             else: student_usage[(curr_abs, group_id)] = True
 
     # --- Summary Checks (Workload) ---
@@ -320,169 +382,311 @@ def evaluate(individual, courses, room_ids, instructor_ids,
         
         # ข้อ 1: หัวหน้าสอน 18-24
         if tid in head_instructor_ids:
-            if h < 18 or h > 24: penalty += 50_000 * abs(h - 21) # ยิ่งห่าง 21 ยิ่งโดนปรับ
+            if h < 18 or h > 24: penalty += HEAD_LOAD_PENALTY * abs(h - 21) # ยิ่งห่าง 21 ยิ่งโดนปรับ
         # ข้อ 2: ครูทั่วไป >= 18
         elif h < 18:
-            penalty += 20_000 * (18 - h)
+            penalty += MIN_LOAD_PENALTY * (18 - h)
             
         # ข้อ 12: ครูคอมสอนทุกวัน
-        if 'คอม' in str(dept) or 'computer' in str(dept).lower():
+        if is_computer_department(dept):
             if len(teacher_days_active[tid]) < 5:
-                penalty += 10_000 * (5 - len(teacher_days_active[tid]))
+                penalty += COMP_DAYS_PENALTY * (5 - len(teacher_days_active[tid]))
         
         if h > 0: hours_values.append(h)
 
     # ข้อ 14: เกลี่ยชั่วโมง (SD)
     if hours_values:
-        penalty += (np.std(hours_values) * 5000)
+        penalty += (np.std(hours_values) * SD_PENALTY)
 
     return (penalty,)
 
+# --- 6. Toolbox ---
+def register_operators(tb, table, cfg, evaluator):
+    """ลงทะเบียน operator ของ GA ลงใน toolbox (ใช้ทั้งรอบหลักและ island worker)
+
+    คืน FitnessCache ที่ครอบ evaluator (หรือ None ถ้าปิด cache)
+    """
+    for alias in ['individual', 'population', 'evaluate', 'mutate', 'mate', 'select', 'map']:
+        if hasattr(tb, alias): tb.unregister(alias)
+
+    tb.register("individual", create_smart_individual, table=table)
+    if hasattr(evaluator, 'population'):
+        tb.register("population", evaluator.population)  # สร้างประชากรแบบขนานใน process pool
+    else:
+        tb.register("population", chunked_population, table)  # chunk / seed เดียวกับแบบขนาน ผลจึงเท่ากัน
+    tb.register("mate", cx_blocks, table=table)
+    tb.register("mutate", smart_mutate, table=table, indpb=cfg['mutation_prob'])
+    tb.register("select", tools.selTournament, tournsize=3)
+
+    # Fitness cache: genome ที่เคยประเมินแล้วไม่ต้องประเมินซ้ำ
+    cache = FitnessCache(evaluator, cfg['fitness_cache_size']) if cfg.get('fitness_cache_size') else None
+    scorer = cache or evaluator
+    tb.register("evaluate", scorer.evaluate)
+    tb.register("map", scorer.map)
+    return cache
+
+def build_population(tb, n, seed_genes=None, warm_ratio=WARM_START_RATIO):
+    """ประชากรเริ่มต้น: ถ้ามี seed (ตารางเดิม) ใส่ตัวเดิม + mutant ของมันตาม warm_ratio ที่เหลือสุ่มใหม่"""
+    if seed_genes is None:
+        return tb.population(n=n)
+
+    base_ind = tb.individual(seed_genes=seed_genes)  # เติมวิชาที่ไม่มีในตารางเดิม
+    pop = [base_ind]
+    n_warm = min(n, max(1, int(n * warm_ratio)))
+    while len(pop) < n_warm:
+        mutant, = tb.mutate(tb.clone(base_ind))
+        pop.append(mutant)
+    pop.extend(tb.population(n=n - len(pop)))
+    return pop
+
 # --- 7. Main Execution ---
-def run_genetic_algorithm(mode='balanced'):
+def load_problem(db=None, refresh=False):
+    """ข้อมูลปัญหาจาก snapshot cache (โหลดจาก Supabase หรือ db ที่ส่งมาเมื่อ cache หมดอายุ)
+    -> (table, instructor_details_map, head_instructor_ids) หรือ None ถ้าข้อมูลไม่ครบ
+    """
+    snapshot = get_problem_snapshot(db, refresh)
+    return snapshot.problem() if snapshot is not None else None
+
+def run_genetic_algorithm(mode='balanced', evaluation=None, workers=None,
+                          progress=None, cancel_event=None,
+                          time_budget_seconds=None, patience=None, target_penalty=None,
+                          islands=None, topology=None, decompose=None, draft_seed=None,
+                          warm_start=False, pin_unchanged=False, changed_subjects=None,
+                          changed_instructors=None, warm_ratio=None, local_search=None, db=None):
+    started = time.monotonic()
+    mode = MODE_ALIASES.get(mode, mode)
     print(f"🧬 AI SCHEDULER STARTED... MODE: {mode.upper()}")
     cfg = GEN_CONFIGS.get(mode, GEN_CONFIGS['balanced'])
+    evaluation = evaluation or cfg.get('evaluation', 'vectorized')
+    if evaluation == 'delta':
+        # GA ไม่ใช้ delta แล้ว (ช้ากว่าประเมินทั้งรุ่น) รับค่าเดิมไว้ให้ client เก่ายังเรียกได้
+        print("   ⚠️ evaluation='delta' is no longer used for GA runs, using 'vectorized'")
+        evaluation = 'vectorized'
+    workers = Config.GA_WORKERS if workers is None else int(workers)
+    patience = cfg.get('patience') if patience is None else int(patience)
+    target_penalty = cfg.get('target_penalty') if target_penalty is None else float(target_penalty)
+    time_budget_seconds = cfg.get('time_budget_seconds') if time_budget_seconds is None else float(time_budget_seconds)
+    deadline = started + time_budget_seconds if time_budget_seconds else None
+    islands = cfg.get('islands', 1) if islands is None else int(islands)
+    topology = topology or cfg.get('topology', 'ring')
+    decompose = cfg.get('decompose', 1) if decompose is None else int(decompose)
+    draft_seed = cfg.get('draft_seed', False) if draft_seed is None else bool(draft_seed)
+    warm_ratio = WARM_START_RATIO if warm_ratio is None else float(warm_ratio)
+    local_search = cfg.get('local_search_iterations', 0) > 0 if local_search is None else bool(local_search)
+    evaluator = None
+    cache = None
+    decomposition = None
+    draft = None
+    metrics = RunMetrics(mode)
 
     try:
-        # Load Data from Supabase
-        courses = supabase.table('curriculums').select("*, subjects(*)").execute().data
-        rooms = supabase.table('classrooms').select("*").execute().data
-        instructors = supabase.table('instructors').select("*").execute().data
-        
-        if not courses or not rooms or not instructors:
+        with metrics.span('load'):
+            problem = load_problem(db)
+        if problem is None:
             return {"status": "error", "message": "Incomplete Data"}
-
-        # Prepare Maps & IDs
-        room_ids = [r['room_code'] for r in rooms]
-        instructor_ids = [i['id'] for i in instructors]
-        room_details = {r['room_code']: r.get('room_type', '') for r in rooms}
-        instructor_details_map = {i['id']: i for i in instructors}
-        
-        # Map Names to IDs
-        instructor_name_map = {
-            (ins['first_name'].strip(), ins['last_name'].strip()): int(ins['id']) 
-            for ins in instructors
-        }
-        instructor_db_id_to_index = {int(ins['id']): idx for idx, ins in enumerate(instructors)}
-        
-        # Identify Heads
-        head_instructor_ids = set()
-        for ins in instructors:
-            pos = str(ins.get('position_role', '')).lower()
-            if 'head' in pos or 'หัวหน้า' in pos:
-                head_instructor_ids.add(ins['id'])
-        
-        # Map Allowed Teachers per Course
-        allowed_teachers_map = {} 
-        for idx, course in enumerate(courses):
-            valid_indices = []
-            subj_data = course.get('subjects')
-            if isinstance(subj_data, list) and subj_data: subj_data = subj_data[0]
-            
-            if subj_data:
-                for k in range(1, 6): 
-                    fname = subj_data.get(f'instructor_{k}_fname')
-                    lname = subj_data.get(f'instructor_{k}_lname')
-                    if fname and lname:
-                        key = (fname.strip(), lname.strip())
-                        if key in instructor_name_map:
-                            real_id = instructor_name_map[key]
-                            if real_id in instructor_db_id_to_index:
-                                valid_indices.append(instructor_db_id_to_index[real_id])
-            
-            if not valid_indices: 
-                valid_indices = list(range(len(instructors)))
-            allowed_teachers_map[idx] = valid_indices
-
-        # Register DEAP functions
-        for alias in ['individual', 'population', 'evaluate', 'mutate', 'mate', 'select']:
-            if hasattr(toolbox, alias): toolbox.unregister(alias)
-
-        toolbox.register("individual", create_smart_individual, 
-                         courses=courses, room_count=len(room_ids),
-                         allowed_teachers_map=allowed_teachers_map, room_ids=room_ids)
-        toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-        toolbox.register("mate", tools.cxTwoPoint)
-        toolbox.register("mutate", smart_mutate, 
-                         courses=courses, room_count=len(room_ids), 
-                         allowed_teachers_map=allowed_teachers_map, indpb=cfg['mutation_prob']) 
-        toolbox.register("select", tools.selTournament, tournsize=3)
-        toolbox.register("evaluate", evaluate, 
-                         courses=courses, room_ids=room_ids, instructor_ids=instructor_ids,
-                         room_details=room_details, instructor_details_map=instructor_details_map,
-                         head_instructor_ids=head_instructor_ids)
+        table, instructor_details_map, head_instructor_ids = problem
+
+        # Warm Start: เริ่มจากตารางปัจจุบันใน generated_schedules (และ pin วิชาที่ไม่เปลี่ยน)
+        seed_genes = None
+        pinned_count = 0
+        if warm_start:
+            with metrics.span('warm_start'):
+                seed_genes = rebuild_individual(load_current_schedule(db), table)
+            matched = sum(g is not None for g in seed_genes)
+            if matched == 0:
+                print("   ⚠️ Warm start: no current schedule, starting from scratch")
+                seed_genes = None
+            else:
+                affected = find_affected_courses(seed_genes, table, changed_subjects, changed_instructors)
+                if pin_unchanged:
+                    table.pin(seed_genes, ~affected)
+                    pinned_count = int(table.pinned.sum())
+                print(f"   ♻️ Warm start: {matched}/{table.n_courses} courses from current schedule, "
+                      f"{int(affected.sum())} to re-search, {pinned_count} pinned")
+
+        # Memetic: tabu search กับตัวที่ดีที่สุดของแต่ละรุ่น และกับคำตอบสุดท้าย
+        scorer = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+        ls = LocalSearch(table, scorer)
+        refine = None
+        if local_search:
+            def refine(population):
+                ls.refine(population, cfg.get('local_search_top_k', 1), cfg.get('local_search_iterations', 0),
+                          cfg.get('local_search_seconds'), deadline)
+
+        warm_started = seed_genes is not None
+
+        # Draft: ตารางจาก DraftSolver (ไม่สุ่ม) ใช้เป็นคำตอบของโหมด draft หรือเป็นจุดเริ่มของ GA
+        constructive = cfg.get('solver') == 'constructive'
+        if constructive or draft_seed:
+            draft = DraftSolver(table)
+            with metrics.span('construct'):
+                draft_genes = draft.solve(seed_genes)
+            print(f"   📐 Draft: {draft.seconds:.3f}s, {draft.backtracks} backtracks, {draft.unplaced} unplaced")
+            if not constructive:
+                seed_genes = draft_genes
 
         # Run Evolution
         best_overall = None
         best_overall_fitness = float('inf')
-
-        for run_idx in range(cfg['runs']):
-            print(f"   🔄 Run {run_idx+1}/{cfg['runs']}")
-            pop = toolbox.population(n=cfg['pop_size'])
-            hof = tools.HallOfFame(1)
-            stats = tools.Statistics(lambda ind: ind.fitness.values)
-            stats.register("min", np.min)
+        generations_run = 0
+        stop_reason = STOP_MAX_GENERATIONS
+
+        if constructive:
+            best_overall = make_individual(draft_genes, genome_dtype(table))
+            best_overall.fitness.values = scorer.evaluate(best_overall)
+            best_overall_fitness = best_overall.fitness.values[0]
+            stop_reason = STOP_CONSTRUCTED
+        elif decompose > 1:
+            # Decomposition: แต่ละส่วน (กลุ่มแผนก/ชั้นปี) รัน GA ของตัวเองใน process แยก แล้วรวม + ซ่อมการชนข้ามส่วน
+            print(f"   🧩 Decompose: {decompose} partitions")
+            part_cfg = dict(cfg, seed_genes=seed_genes, warm_ratio=warm_ratio, local_search=local_search)
+            with metrics.span('evolve'):
+                best_overall, best_overall_fitness, stop_reason, generations_run, decomposition = run_decomposed(
+                    table, instructor_details_map, head_instructor_ids, part_cfg, decompose,
+                    progress=progress, cancel_event=cancel_event, patience=patience,
+                    target_penalty=target_penalty, deadline=deadline)
+            print(f"   🧩 Partitions {decomposition['sizes']} (cut {decomposition['cut_ratio']:.1%})")
+            if 'merged_penalty' in decomposition:
+                print(f"   🧩 Conflicts after merge: {decomposition['conflicts_before_repair']} -> "
+                      f"{decomposition['conflicts_after_repair']}")
+        elif islands > 1:
+            # Island model: แต่ละเกาะรันใน process แยก แลก migrant ทุก migration_interval รุ่น
+            print(f"   🏝️ Islands: {islands} x {cfg['pop_size'] // islands} ({topology})")
+            island_cfg = dict(cfg, seed_genes=seed_genes, warm_ratio=warm_ratio, local_search=local_search)
+            with metrics.span('evolve'):
+                best_overall, best_overall_fitness, stop_reason, generations_run = run_islands(
+                    table, instructor_details_map, head_instructor_ids, island_cfg, islands, topology=topology,
+                    progress=progress, cancel_event=cancel_event, patience=patience,
+                    target_penalty=target_penalty, deadline=deadline)
+        else:
+            # ประเมินทั้งรุ่นในครั้งเดียว (ผลเท่ากับ evaluate() ทุกตัว)
+            if workers > 1:
+                # แบบขนาน: ส่งข้อมูลปัญหาไปแต่ละ worker ครั้งเดียวตอนเริ่ม pool
+                evaluator = ParallelEvaluator(table, instructor_details_map, head_instructor_ids, workers)
+            else:
+                evaluator = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+            # toolbox ใหม่ทุกรอบ: งานที่รันพร้อมกันใน process เดียว (GA_JOB_WORKERS > 1) ไม่แย่ง operator กัน
+            toolbox = base.Toolbox()
+            cache = register_operators(toolbox, table, cfg, evaluator)
+
+            for run_idx in range(cfg['runs']):
+                print(f"   🔄 Run {run_idx+1}/{cfg['runs']}")
+                with metrics.span('init'):
+                    pop = build_population(toolbox, cfg['pop_size'], seed_genes, warm_ratio)
+                hof = tools.HallOfFame(1, similar=np.array_equal)
+                stats = tools.Statistics(lambda ind: ind.fitness.values)
+                stats.register("min", np.min)
+
+                # รายงานความคืบหน้า + เช็คคำสั่งยกเลิกระหว่างรุ่น
+                def on_generation(gen, population, halloffame, run_idx=run_idx):
+                    metrics.generation(run_idx, gen, population)
+                    if progress:
+                        progress({"run": run_idx + 1, "runs": cfg['runs'],
+                                  "generation": gen, "generations": cfg['generations'],
+                                  "best_penalty": min(halloffame[0].fitness.values[0], best_overall_fitness)})
+                    return cancel_event is not None and cancel_event.is_set()
             
-            pop, log = algorithms.eaSimple(pop, toolbox, cxpb=0.7, mutpb=cfg['mutation_prob'],     
-                                           ngen=cfg['generations'], stats=stats, halloffame=hof, verbose=True)
+                with metrics.span('evolve'):
+                    pop, log, stop_reason = evolve(pop, toolbox, cxpb=0.7, mutpb=cfg['mutation_prob'],
+                                                   ngen=cfg['generations'], stats=stats, halloffame=hof, verbose=True,
+                                                   on_generation=on_generation, patience=patience,
+                                                   target_penalty=target_penalty, deadline=deadline, refine=refine)
+                metrics.add_logbook(run_idx, log)
+                generations_run += len(log) - 1
+                if stop_reason == STOP_CANCELLED:
+                    break
             
-            current_best = hof[0]
-            fit = current_best.fitness.values[0]
-            print(f"      ✅ Score: {fit:,.0f}")
-            if fit < best_overall_fitness:
-                best_overall = current_best
-                best_overall_fitness = fit
+                current_best = hof[0]
+                fit = current_best.fitness.values[0]
+                print(f"      ✅ Score: {fit:,.0f}")
+                if fit < best_overall_fitness:
+                    best_overall = current_best
+                    best_overall_fitness = fit
+                print(f"      ⏹️ Stopped: {stop_reason} after {len(log) - 1} generations")
+                # ถึงเป้าหรือหมดเวลาแล้ว ไม่ต้องรันรอบถัดไป
+                if stop_reason in (STOP_TARGET_REACHED, STOP_TIME_BUDGET):
+                    break
+
+        if cache is not None:
+            print(f"   🗃️ Fitness cache: {cache.hits:,} hits / {cache.misses:,} misses")
+
+        if stop_reason == STOP_CANCELLED:
+            print("   🛑 Cancelled")
+            metrics.finish('cancelled')
+            metrics_registry.record(metrics)
+            return {"status": "cancelled", "mode": mode, "generations_run": generations_run,
+                    "metrics": metrics.report()}
+
+        if local_search and best_overall is not None:
+            final_seconds = cfg.get('final_local_search_seconds', 0)
+            if deadline is not None:
+                final_seconds = min(final_seconds, deadline - time.monotonic())
+            if final_seconds > 0:
+                with metrics.span('local_search'):
+                    ls.improve(best_overall, cfg.get('final_local_search_iterations', 0), final_seconds)
+                best_overall_fitness = best_overall.fitness.values[0]
+            print(f"   🔧 Local search: -{ls.penalty_removed:,.0f} penalty in {ls.moves} moves ({ls.seconds:.1f}s)")
+            if ls.capped:
+                print(f"   ⚠️ Local search hit its time cap {ls.capped}x (result depends on machine speed)")
 
         print(f"🏆 FINAL BEST FITNESS: {best_overall_fitness:,.0f}")
-        save_to_db(best_overall, courses, room_ids, instructor_ids)
-        return {"status": "success", "mode": mode, "penalty": best_overall_fitness}
+        with metrics.span('save'):
+            saved = save_to_db(best_overall, table, db, penalty=best_overall_fitness, mode=mode)
+        # penalty แยกตามกฎของคำตอบที่บันทึก (ดูว่าโทษที่เหลือมาจากกฎไหน)
+        metrics.finish('success', best_overall_fitness,
+                       scorer.penalty_breakdown(best_overall) if metrics.enabled else None)
+        metrics_registry.record(metrics)
+        result = {"status": "success", "mode": mode, "evaluation": evaluation,
+                "workers": workers if isinstance(evaluator, ParallelEvaluator) else 1,
+                "islands": islands, "decomposition": decomposition, "draft": draft.report() if draft else None,
+                "warm_start": warm_started, "pinned_courses": pinned_count,
+                "penalty": best_overall_fitness, "stop_reason": stop_reason,
+                "generations_run": generations_run,
+                "local_search": ls.report() if local_search else None,
+                "fitness_cache": cache.report() if cache is not None else None,
+                "schedule_version": saved["version_id"] if saved else None,
+                "metrics": metrics.report(),
+                "elapsed_seconds": round(time.monotonic() - started, 2)}
+        # สำหรับ dashboard (/stats)
+        stats_cache.record_generation({k: result[k] for k in ("mode", "penalty", "stop_reason", "generations_run",
+                                                              "elapsed_seconds", "schedule_version")})
+        return result
 
     except Exception as e:
         traceback.print_exc()
+        metrics.finish('error')
+        metrics_registry.record(metrics)
         return {"status": "error", "message": str(e)}
+    finally:
+        if isinstance(evaluator, ParallelEvaluator):
+            evaluator.close()
 
-def save_to_db(best_schedule, courses, room_ids, instructor_ids):
+def save_to_db(best_schedule, table, db=None, penalty=None, mode=None):
+    """บันทึกเป็นเวอร์ชันใหม่ของตารางเรียน (เฉพาะแถวที่เปลี่ยน) -> ข้อมูลเวอร์ชัน หรือ None ถ้าบันทึกไม่สำเร็จ"""
     print("💾 Saving to database...")
+    db = db or supabase
     try:
-        supabase.table('generated_schedules').delete().neq('id', 0).execute()
+        # แปลง individual (array) เป็น list ของ int ที่นี่ที่เดียว ก่อนสร้างแถวของ generated_schedules
         data_list = []
+        for i, gene in enumerate(np.asarray(best_schedule).tolist()):
+            data_list.extend(gene_records(table, i, gene))
         
-        for i, gene in enumerate(best_schedule):
-            r_idx, start_slot, t_idx = gene
-            course = courses[i]
-            duration, _, _, _, _ = get_course_metadata(course)
-            
-            s_name = "Unknown"
-            subj = course.get('subjects')
-            if isinstance(subj, list) and subj: subj = subj[0]
-            if isinstance(subj, dict): s_name = subj.get('subject_name', 'Unknown')
-            
-            for t in range(duration):
-                current_slot = start_slot + t
-                day = current_slot // SLOTS_PER_DAY
-                slot_in_day = current_slot % SLOTS_PER_DAY
-                
-                if slot_in_day == LUNCH_SLOT: continue
-                if day != (start_slot // SLOTS_PER_DAY): continue
-
-                record = {
-                    "subject_code": course.get('subject_code', 'N/A'),
-                    "subject_name": s_name,
-                    "room_code": room_ids[r_idx],
-                    "instructor_id": int(instructor_ids[t_idx]),
-                    "day_of_week": int(day),
-                    "start_slot": int(slot_in_day),
-                    "department": course.get('department', 'General'),
-                    "year_level": course.get('year_level', 'N/A')
-                }
-                data_list.append(record)
-        
-        batch_size = 1000
-        for k in range(0, len(data_list), batch_size):
-            supabase.table('generated_schedules').insert(data_list[k:k+batch_size]).execute()
-            
-        print(f"✅ Saved {len(data_list)} slots successfully!")
+        saved = save_schedule_version(data_list, db, penalty=penalty, mode=mode)
+        if saved["version_id"] is None:
+            print(f"✅ Saved {len(data_list)} slots successfully! (unversioned: run migrations/001_schedule_versions.sql)")
+        else:
+            print(f"✅ Saved version {saved['version_id']}: {len(data_list)} slots "
+                  f"(+{saved['added']} / -{saved['removed']} vs version {saved['parent_id']})")
+
+        # ตารางใหม่ -> สร้าง index สำหรับ /schedules/search ใหม่ทันที
+        try:
+            refresh_schedule_index(db)
+        except Exception as e:
+            print(f"⚠️ Schedule index refresh failed: {e}")
+            invalidate_schedule_index()
+        return saved
         
     except Exception as e:
         print(f"❌ Error saving to DB: {e}")
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+        return None
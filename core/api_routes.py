@@ -1,7 +1,20 @@
-from flask import Blueprint, request
+import hashlib
+import json
+from flask import Blueprint, Response, request, stream_with_context
 from flask_restx import Api, Resource, fields
 from core.database import supabase
-from core.ai_scheduler import run_genetic_algorithm
+from core.jobs import get_job_manager
+from core.problem_cache import invalidate_problem_cache
+from core.schedule_index import get_schedule_index, invalidate_schedule_index, refresh_schedule_index
+from core.schedule_store import (
+    StaleVersionError, get_active_version, list_versions, activate_version, compare_versions,
+)
+from core.schedule_editor import EditError, editor_summary, validate_edit, apply_edit
+from core.stats_cache import stats_cache
+from core.schedule_export import EXPORT_FORMATS, GROUP_BY, merge_sessions, week_start, export_csv, export_ics, export_grouped_json
+from core.bulk_import import BulkImporter, detect_format, iter_records
+from core.metrics import metrics_registry
+from config import Config
 
 api_bp = Blueprint('api', __name__)
 
@@ -59,31 +72,160 @@ subject_model = api.model('Subject', {
 @ns_stats.route('/')
 class StatsResource(Resource):
     def get(self):
-        try:
-            count_std = supabase.table('students').select('*', count='exact').limit(0).execute().count
-            count_ins = supabase.table('instructors').select('*', count='exact').limit(0).execute().count
-            count_subj = supabase.table('subjects').select('*', count='exact').limit(0).execute().count
-            count_rooms = supabase.table('classrooms').select('*', count='exact').limit(0).execute().count
-            return {"students": count_std, "instructors": count_ins, "subjects": count_subj, "rooms": count_rooms}
-        except Exception as e:
-            print(f"🔥🔥 FIRE IN THE HOLE! Error fetching stats: {e}")  # ให้มันตะโกนออกมาใน Log
-            return {"students": 0, "instructors": 0, "subjects": 0, "rooms": 0}
+        """จำนวนนักเรียน / ครู / วิชา / ห้อง (cache, นับพร้อมกันเมื่อหมดอายุ) + ผลการจัดตารางครั้งล่าสุด"""
+        stats, error = stats_cache.get()
+        if error:
+            print(f"🔥🔥 FIRE IN THE HOLE! Error fetching stats: {error}")  # ให้มันตะโกนออกมาใน Log
+        if stats is None:
+            return {"error": error, "students": None, "instructors": None, "subjects": None, "rooms": None}, 503
+        return stats
 
 
 
 @ns_sched.route('/generate')
 class GenerateAI(Resource):
-    @api.doc(params={'mode': 'draft | balanced | perfect'}) # Documentation
+    @api.doc(params={'mode': 'draft | fast | balanced | precise (perfect)'}) # Documentation
     def post(self):
+        """สั่งจัดตารางแบบ background: คืน job_id ทันที แล้วใช้ /schedules/jobs/<job_id> ติดตามผล"""
         try:
             # รับค่า JSON body
             data = request.json or {} 
-            mode = data.get('mode', 'balanced') # ถ้าไม่ส่งมา ให้เป็น balanced
+            params = {
+                'mode': data.get('mode', 'balanced'),         # ถ้าไม่ส่งมา ให้เป็น balanced (draft = ไม่มี GA, ไม่ถึงวินาที)
+                'evaluation': data.get('evaluation'),         # 'vectorized' (ไม่ส่ง = ตาม mode)
+                'workers': data.get('workers'),               # จำนวน process (ไม่ส่ง = Config.GA_WORKERS)
+                'time_budget_seconds': data.get('time_budget_seconds'),  # เวลาสูงสุด (วินาที)
+                'patience': data.get('patience'),             # หยุดเมื่อไม่ดีขึ้นกี่รุ่นติดกัน
+                'target_penalty': data.get('target_penalty'), # หยุดเมื่อ penalty ต่ำกว่าค่านี้
+                'islands': data.get('islands'),               # จำนวนเกาะ (> 1 = island model)
+                'topology': data.get('topology'),             # 'ring' | 'complete' | 'none'
+                'decompose': data.get('decompose'),           # จำนวนส่วน (> 1 = แบ่งตามแผนก/ชั้นปี จัดพร้อมกัน)
+                'draft_seed': data.get('draft_seed'),         # True = เริ่ม GA จากผลของโหมด draft
+                # Warm start: เริ่มจากตารางปัจจุบัน, pin วิชาที่ไม่เกี่ยวกับการแก้ไข
+                'warm_start': bool(data.get('warm_start', False)),
+                'pin_unchanged': bool(data.get('pin_unchanged', False)),
+                'changed_subjects': data.get('changed_subjects'),       # list ของ subject_code
+                'changed_instructors': data.get('changed_instructors'), # list ของ instructor id
+                'warm_ratio': data.get('warm_ratio'),                   # สัดส่วนประชากรจากตารางเดิม
+                'local_search': data.get('local_search'),     # เปิด/ปิด tabu search (ไม่ส่ง = ตาม mode)
+            }
             
-            return run_genetic_algorithm(mode=mode)
+            job, created = get_job_manager().submit(params)
+            body = job.to_dict()
+            body['attached'] = not created  # True = มีงาน input เดียวกันกำลังรันอยู่แล้ว
+            return body, 202
         except Exception as e:
             return {"error": str(e)}, 500
 
+@ns_sched.route('/jobs')
+class GenerateJobs(Resource):
+    def get(self):
+        """รายการงานจัดตารางทั้งหมดใน process นี้"""
+        return [job.to_dict() for job in get_job_manager().list()]
+
+@ns_sched.route('/jobs/<string:job_id>')
+class GenerateJob(Resource):
+    def get(self, job_id):
+        """สถานะงาน: รุ่นปัจจุบัน, penalty ที่ดีที่สุด, ETA และผลลัพธ์เมื่อเสร็จ"""
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return {"error": "Job not found"}, 404
+        return job.to_dict()
+
+    def delete(self, job_id):
+        """ยกเลิกงาน (GA จะหยุดหลังจบรุ่นปัจจุบัน)"""
+        job = get_job_manager().cancel(job_id)
+        if job is None:
+            return {"error": "Job not found"}, 404
+        return job.to_dict(), 202
+
+# ================= GA Metrics =================
+
+@ns_ai.route('/metrics')
+class GAMetrics(Resource):
+    def get(self):
+        """metrics ของการจัดตาราง (Prometheus text format): เวลาแต่ละช่วง, evals/sec, penalty แยกตามกฎ"""
+        return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@ns_ai.route('/runs')
+class GARuns(Resource):
+    def get(self):
+        """metrics ของการรันล่าสุด (ล่าสุดก่อน) รวมสถิติรายรุ่น best / mean / diversity"""
+        return list(reversed(metrics_registry.recent()))
+
+# ================= Schedule Versions =================
+
+@ns_sched.route('/versions')
+class ScheduleVersions(Resource):
+    def get(self):
+        """เวอร์ชันของตารางเรียน (ล่าสุดก่อน) และเวอร์ชันที่ active"""
+        try:
+            limit = int(request.args.get('limit', 50))
+            return {"active": get_active_version(), "versions": list_versions(limit=limit)}
+        except Exception as e:
+            return {"error": str(e)}, 400
+
+@ns_sched.route('/versions/<int:version_id>/activate')
+class ActivateScheduleVersion(Resource):
+    def post(self, version_id):
+        """rollback / สลับไปใช้เวอร์ชันที่ระบุ"""
+        try:
+            if not activate_version(version_id):
+                return {"error": "Version not found or not ready"}, 404
+            refresh_schedule_index()
+            return {"active": version_id}
+        except Exception as e:
+            return {"error": str(e)}, 400
+
+@ns_sched.route('/versions/<int:old_id>/compare/<int:new_id>')
+class CompareScheduleVersions(Resource):
+    def get(self, old_id, new_id):
+        """แถวที่เพิ่ม / หายไปจาก old_id ถึง new_id"""
+        try:
+            return compare_versions(old_id, new_id)
+        except Exception as e:
+            return {"error": str(e)}, 400
+
+# ================= Manual Edits =================
+
+@ns_sched.route('/edits')
+class ScheduleEdits(Resource):
+    def get(self):
+        """วิชาทั้งหมดในตารางที่ active พร้อม index (ใช้อ้างถึงใน moves / swaps) และ penalty ปัจจุบัน"""
+        try:
+            return editor_summary()
+        except EditError as e:
+            return {"error": str(e)}, 409
+        except Exception as e:
+            return {"error": str(e)}, 400
+
+@ns_sched.route('/edits/validate')
+class ValidateScheduleEdit(Resource):
+    def post(self):
+        """ตรวจ move / swap โดยไม่บันทึก: การชนที่เกิดขึ้น, กฎที่ผิด และ penalty ที่เปลี่ยน (กฎเดียวกับ evaluate)"""
+        try:
+            return validate_edit(request.json or {})
+        except Exception as e:
+            return {"error": str(e)}, 400
+
+@ns_sched.route('/edits/apply')
+class ApplyScheduleEdit(Resource):
+    def post(self):
+        """บันทึก move / swap เป็นเวอร์ชันใหม่ (เฉพาะแถวของวิชาที่ขยับ) ถ้าไม่ valid ต้องส่ง force: true"""
+        try:
+            data = request.json or {}
+            result, saved = apply_edit(data, force=bool(data.get('force', False)))
+            if saved is None:
+                return dict(result, applied=False), 409
+            invalidate_schedule_index()
+            return dict(result, applied=True, saved=saved)
+        except StaleVersionError as e:
+            return {"error": str(e)}, 409
+        except EditError as e:
+            return {"error": str(e)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 400
+
 # ================= ADVANCED SEARCH (หัวใจหลักที่ปรับปรุง) =================
 
 @ns_sched.route('/search')
@@ -92,123 +234,64 @@ class AdvancedSchedule(Resource):
         """
         ค้นหาตารางเรียนแบบละเอียด รองรับ 4 โหมด: Student, Instructor, Room, Subject
         รองรับ Parameter จาก Frontend ใหม่ทั้งหมด
+        (ค้นจาก index ในหน่วยความจำ ตอบ 304 ถ้าตารางไม่เปลี่ยนตั้งแต่ครั้งก่อน)
         """
-        type_ = request.args.get('type') 
-        query = supabase.table('generated_schedules').select('*')
-        
-        # Helper function to clean inputs
-        def clean(val):
-            return val.strip() if val else None
-
         try:
-            # --- 1. SEARCH STUDENT ---
-            if type_ == 'student':
-                std_id = clean(request.args.get('id'))
-                fname = clean(request.args.get('fname')) 
-                lname = clean(request.args.get('lname'))
-                dept = clean(request.args.get('dept'))
-                year = clean(request.args.get('year'))
-                group = clean(request.args.get('group'))
-                
-                # A. กรณีระบุตัวตนชัดเจน (ID หรือ ชื่อ) -> ไปค้นข้อมูลนักเรียนก่อนเพื่อเอา Dept/Year
-                if std_id or fname or lname:
-                    std_query = supabase.table('students').select('*')
-                    if std_id: std_query = std_query.eq('student_id', std_id)
-                    if fname: std_query = std_query.ilike('first_name', f'%{fname}%')
-                    if lname: std_query = std_query.ilike('last_name', f'%{lname}%')
-                    
-                    students = std_query.execute().data
-                    if not students:
-                        return [] # ไม่เจอนักเรียน
-                    
-                    # เอาข้อมูลนักเรียนคนแรกที่เจอมาใช้เป็น Filter ตารางเรียน
-                    # (สมมติว่าตารางเรียนจัดตาม แผนก และ ชั้นปี)
-                    target = students[0]
-                    query = query.eq('department', target['department']).eq('year_level', target['year_level'])
-                
-                # B. กรณีระบุแค่ filter (แผนก, ชั้นปี, กลุ่ม)
-                else:
-                    if dept: query = query.eq('department', dept)
-                    if year: query = query.eq('year_level', year)
-                    # หมายเหตุ: ถ้า DB generated_schedules ไม่ได้เก็บ group_no อาจต้องข้าม filter นี้
-                    # หรือถ้ามีการเก็บในอนาคตให้ uncomment บรรทัดล่าง
-                    # if group: query = query.eq('group_no', group)
-
-            # --- 2. SEARCH INSTRUCTOR ---
-            elif type_ == 'instructor':
-                fname = clean(request.args.get('fname'))
-                lname = clean(request.args.get('lname'))
-                dept = clean(request.args.get('dept'))
-                
-                # ต้องหา ID ของอาจารย์ก่อน
-                if fname or lname or dept:
-                    ins_query = supabase.table('instructors').select('id')
-                    if fname: ins_query = ins_query.ilike('first_name', f'%{fname}%')
-                    if lname: ins_query = ins_query.ilike('last_name', f'%{lname}%')
-                    if dept: ins_query = ins_query.eq('department', dept)
-                    
-                    instructors = ins_query.execute().data
-                    if not instructors:
-                        return []
-                    
-                    ins_ids = [str(i['id']) for i in instructors]
-                    query = query.in_('instructor_id', ins_ids)
-
-            # --- 3. SEARCH ROOM ---
-            elif type_ == 'room':
-                room_code = clean(request.args.get('room_code'))
-                room_type = clean(request.args.get('room_type'))
-                building = clean(request.args.get('building'))
-                dept = clean(request.args.get('dept'))
-                
-                # ถ้าค้นหาด้วย code ตรงๆ
-                if room_code:
-                    query = query.ilike('room_code', f'%{room_code}%')
-                
-                # ถ้าค้นหาด้วยคุณสมบัติห้อง (ตึก, ประเภท, แผนกเจ้าของ) -> ต้องไปหา room_code จากตาราง classrooms
-                if room_type or building or dept:
-                    room_query = supabase.table('classrooms').select('room_code')
-                    if room_type: room_query = room_query.eq('room_type', room_type)
-                    if building: room_query = room_query.ilike('building', f'%{building}%')
-                    if dept: room_query = room_query.eq('department_owner', dept)
-                    
-                    matching_rooms = room_query.execute().data
-                    if not matching_rooms:
-                        return [] # ไม่เจอห้องที่มีคุณสมบัตินี้
-                        
-                    valid_room_codes = [r['room_code'] for r in matching_rooms]
-                    query = query.in_('room_code', valid_room_codes)
-
-            # --- 4. SEARCH SUBJECT ---
-            elif type_ == 'subject':
-                code = clean(request.args.get('code'))
-                name = clean(request.args.get('name'))
-                instructor_name = clean(request.args.get('instructor'))
-                
-                if code: query = query.ilike('subject_code', f'%{code}%')
-                if name: query = query.ilike('subject_name', f'%{name}%')
-                
-                # ถ้าค้นหาด้วยชื่อครูในหน้ารายวิชา -> ซับซ้อนหน่อย ต้องหาครู -> ได้ ID -> มาหาในตาราง
-                if instructor_name:
-                    ins_query = supabase.table('instructors').select('id') \
-                        .or_(f"first_name.ilike.%{instructor_name}%,last_name.ilike.%{instructor_name}%")
-                    
-                    instructors = ins_query.execute().data
-                    if instructors:
-                        ins_ids = [str(i['id']) for i in instructors]
-                        query = query.in_('instructor_id', ins_ids)
-                    else:
-                        return [] # ไม่เจอครูชื่อนี้
-
-            # Execute Final Query
-            # เรียงตาม วัน (0-4) และ เวลาเรียน (Slot)
-            result = query.order('day_of_week').order('start_slot').execute().data
-            return result
+            index = get_schedule_index()
+
+            # ETag = เวอร์ชันของ index + query ที่ค้น
+            raw = json.dumps([index.version, sorted(request.args.items(multi=True))], ensure_ascii=False)
+            etag = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+            headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+            if etag in request.if_none_match:
+                return '', 304, headers
+
+            result = index.search(request.args.get('type'), request.args)
+            # เรียงตาม วัน (0-4) และ เวลาเรียน (Slot) อยู่แล้วใน index
+            return result, 200, headers
 
         except Exception as e:
             print(f"Search Error: {e}")
             return {"error": str(e)}, 400
 
+@ns_sched.route('/export')
+class ExportSchedule(Resource):
+    @api.doc(params={
+        'format': 'csv | ics | json',
+        'group_by': 'json: group | instructor | room',
+        'start': 'ics: วันที่ของสัปดาห์แรก (YYYY-MM-DD)',
+        'weeks': 'ics: จำนวนสัปดาห์ที่ซ้ำ (ไม่ส่ง = ไม่สิ้นสุด)',
+        'type': 'filter แบบเดียวกับ /schedules/search (student | instructor | room | subject)',
+    })
+    def get(self):
+        """ส่งออกตารางเรียน (รวมชั่วโมงที่ต่อกันเป็นคาบเดียว) แบบ stream ทีละ chunk"""
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
+        group_by = request.args.get('group_by', 'group')
+        if fmt == 'json' and group_by not in GROUP_BY:
+            return {"error": f"group_by must be one of: {', '.join(GROUP_BY)}"}, 400
+        try:
+            start = request.args.get('start')
+            if start: week_start(start)
+            weeks = int(request.args['weeks']) if request.args.get('weeks') else None
+
+            index = get_schedule_index()
+            positions = index.select(request.args.get('type'), request.args)
+        except Exception as e:
+            return {"error": str(e)}, 400
+
+        # อ่านแถวจาก index ตรงๆ (ไม่สำเนา) แล้วรวมเป็นคาบระหว่าง stream
+        if fmt == 'csv':
+            body = export_csv(index, merge_sessions(index.iter_rows(positions)))
+        elif fmt == 'ics':
+            body = export_ics(index, merge_sessions(index.iter_rows(positions)), start=start, weeks=weeks)
+        else:
+            body = export_grouped_json(index, positions, group_by)
+        filename = f"timetable.{fmt}"
+        return Response(stream_with_context(body), content_type=EXPORT_FORMATS[fmt],
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 # ================= Data Management (CRUD) =================
 
 @ns_data.route('/students')
@@ -217,6 +300,8 @@ class ManageStudents(Resource):
     def post(self):
         try:
             res = supabase.table('students').insert(api.payload).execute()
+            stats_cache.bump('students', len(res.data or []))
+            invalidate_schedule_index()
             return res.data, 201
         except Exception as e:
             return {"error": str(e)}, 400
@@ -227,6 +312,9 @@ class ManageInstructors(Resource):
     def post(self):
         try:
             res = supabase.table('instructors').insert(api.payload).execute()
+            stats_cache.bump('instructors', len(res.data or []))
+            invalidate_problem_cache()
+            invalidate_schedule_index()
             return res.data, 201
         except Exception as e:
             return {"error": str(e)}, 400
@@ -237,6 +325,9 @@ class ManageClassrooms(Resource):
     def post(self):
         try:
             res = supabase.table('classrooms').insert(api.payload).execute()
+            stats_cache.bump('rooms', len(res.data or []))
+            invalidate_problem_cache()
+            invalidate_schedule_index()
             return res.data, 201
         except Exception as e:
             return {"error": str(e)}, 400
@@ -247,6 +338,65 @@ class ManageSubjects(Resource):
     def post(self):
         try:
             res = supabase.table('subjects').insert(api.payload).execute()
+            stats_cache.bump('subjects', len(res.data or []))
+            invalidate_problem_cache()
             return res.data, 201
         except Exception as e:
-            return {"error": str(e)}, 400
\ No newline at end of file
+            return {"error": str(e)}, 400
+# ================= Bulk Import (CSV / JSON Lines) =================
+
+# resource -> (ตาราง, model สำหรับตรวจแถว, key ของ stats, คอลัมน์ unique สำหรับ upsert)
+BULK_TARGETS = {
+    'students': ('students', student_model, 'students', 'student_id'),
+    'instructors': ('instructors', instructor_model, 'instructors', None),
+    'classrooms': ('classrooms', classroom_model, 'rooms', 'room_code'),
+    'subjects': ('subjects', subject_model, 'subjects', 'subject_code'),
+}
+
+@ns_data.route('/<string:resource>/bulk')
+class BulkImport(Resource):
+    @api.doc(params={
+        'format': 'csv | jsonl (ไม่ส่ง = ดูจาก Content-Type)',
+        'dry_run': 'true = ตรวจอย่างเดียว ไม่บันทึก',
+        'batch_size': 'จำนวนแถวต่อการ insert 1 ครั้ง',
+        'mode': 'insert | upsert',
+        'on_conflict': 'คอลัมน์ unique สำหรับ upsert (ไม่ส่ง = ค่าเริ่มต้นของตาราง)',
+    })
+    def post(self, resource):
+        """นำเข้าข้อมูลทีละมากจาก body แบบ CSV (มี header) หรือ JSON Lines (อ่านแบบ stream)"""
+        if resource not in BULK_TARGETS:
+            return {"error": f"Unknown resource: {resource}"}, 404
+        table_name, model, stats_key, default_key = BULK_TARGETS[resource]
+
+        fmt = detect_format(request.args.get('format'), request.content_type)
+        if fmt is None:
+            return {"error": "Unsupported format (use format=csv|jsonl or Content-Type text/csv / application/x-ndjson)"}, 415
+
+        dry_run = request.args.get('dry_run', 'false').lower() in ('1', 'true', 'yes')
+        mode = request.args.get('mode', 'insert')
+        on_conflict = None
+        if mode == 'upsert':
+            on_conflict = request.args.get('on_conflict') or default_key
+            if not on_conflict:
+                return {"error": f"upsert on {resource} needs on_conflict"}, 400
+        elif mode != 'insert':
+            return {"error": "mode must be insert or upsert"}, 400
+        try:
+            batch_size = int(request.args.get('batch_size', Config.IMPORT_BATCH_SIZE))
+        except ValueError:
+            return {"error": "batch_size must be an integer"}, 400
+
+        try:
+            importer = BulkImporter(supabase, table_name, model, batch_size, dry_run=dry_run, on_conflict=on_conflict)
+            report = importer.run(iter_records(request.stream, fmt))
+        except Exception as e:
+            return {"error": str(e)}, 400
+
+        if importer.written:
+            # upsert อาจเป็นการแก้แถวเดิม -> นับใหม่แทนการบวกเพิ่ม
+            stats_cache.invalidate()
+            invalidate_schedule_index()
+            if resource != 'students':
+                invalidate_problem_cache()
+        status = 200 if dry_run or importer.error_count else 201
+        return report, status
@@ -0,0 +1,167 @@
+import codecs
+import csv
+import json
+from flask_restx import fields
+
+# จำนวนแถวที่รายงาน error กลับไปสูงสุด (เกินนี้นับอย่างเดียว)
+MAX_REPORTED_ERRORS = 1000
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+FORMAT_ALIASES = {'csv': FORMAT_CSV, 'jsonl': FORMAT_JSONL, 'ndjson': FORMAT_JSONL, 'jsonlines': FORMAT_JSONL}
+CONTENT_TYPES = {
+    'text/csv': FORMAT_CSV,
+    'application/csv': FORMAT_CSV,
+    'application/x-ndjson': FORMAT_JSONL,
+    'application/jsonl': FORMAT_JSONL,
+    'application/x-jsonlines': FORMAT_JSONL,
+}
+
+def detect_format(fmt, content_type):
+    """format จาก query (?format=) หรือ Content-Type -> 'csv' | 'jsonl' | None"""
+    if fmt:
+        return FORMAT_ALIASES.get(fmt.lower())
+    return CONTENT_TYPES.get((content_type or '').split(';')[0].strip().lower())
+
+def _text_lines(stream, encoding='utf-8-sig'):
+    """อ่าน body ทีละบรรทัดแบบ stream (ไม่โหลดทั้งไฟล์)"""
+    return codecs.iterdecode(iter(lambda: stream.readline(64 * 1024), b''), encoding)
+
+def iter_records(stream, fmt):
+    """แถวจาก body -> (เลขแถว, record หรือ None, error หรือ None)
+
+    CSV: แถวแรกเป็น header, เลขแถวนับรวม header; JSON Lines: 1 object ต่อบรรทัด ข้ามบรรทัดว่าง
+    """
+    lines = _text_lines(stream)
+    if fmt == FORMAT_CSV:
+        reader = csv.DictReader(lines)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, "too many columns"
+                continue
+            yield reader.line_num, record, None
+        return
+
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip(): continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "expected a JSON object"
+            continue
+        yield line_no, record, None
+
+def validate_record(record, model):
+    """ตรวจ record ตาม api.model -> (row ที่แปลงชนิดแล้ว, list ของ error)
+
+    ช่องว่างใน CSV = ไม่ได้ส่งค่า, ช่องที่ไม่มีใน model = error (insert ทั้ง batch จะล้มถ้าส่งไป)
+    """
+    row, errors = {}, []
+    for name in record:
+        if name not in model:
+            errors.append(f"unknown field '{name}'")
+
+    for name, field in model.items():
+        value = record.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '': value = None
+        if value is None:
+            if field.required:
+                errors.append(f"'{name}' is required")
+            continue
+        try:
+            if isinstance(field, fields.Integer):
+                if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                    raise ValueError
+                value = int(value)
+            elif isinstance(field, fields.Float):
+                value = float(value)
+            elif isinstance(field, fields.Boolean):
+                if isinstance(value, str):
+                    if value.lower() not in ('true', 'false', '1', '0', 'yes', 'no'):
+                        raise ValueError
+                    value = value.lower() in ('true', '1', 'yes')
+                else:
+                    value = bool(value)
+            elif isinstance(field, fields.String):
+                value = str(value)
+        except (TypeError, ValueError):
+            errors.append(f"'{name}' must be {type(field).__name__.lower()}")
+            continue
+        row[name] = value
+    return row, errors
+
+class BulkImporter:
+    """นำเข้าแถวจำนวนมากเป็น batch (insert หรือ upsert) พร้อมรายงาน error รายแถว
+
+    ถ้า batch ล้ม (เช่น ติด constraint) จะลองทีละแถวเพื่อระบุแถวที่มีปัญหา แถวอื่นใน batch ยังเข้าได้
+    """
+
+    def __init__(self, client, table_name, model, batch_size, dry_run=False, on_conflict=None):
+        self.client = client
+        self.table_name = table_name
+        self.model = model
+        self.batch_size = max(1, int(batch_size))
+        self.dry_run = dry_run
+        self.on_conflict = on_conflict
+        self.received = 0
+        self.valid = 0
+        self.written = 0
+        self.batches = 0
+        self.error_count = 0
+        self.errors = []
+
+    def _error(self, row_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_no, "error": message})
+
+    def _write(self, rows):
+        query = self.client.table(self.table_name)
+        if self.on_conflict:
+            return query.upsert(rows, on_conflict=self.on_conflict).execute()
+        return query.insert(rows).execute()
+
+    def _flush(self, batch):
+        if not batch or self.dry_run: return
+        self.batches += 1
+        try:
+            self._write([row for _, row in batch])
+            self.written += len(batch)
+        except Exception:
+            for row_no, row in batch:
+                try:
+                    self._write([row])
+                    self.written += 1
+                except Exception as e:
+                    self._error(row_no, str(e))
+
+    def run(self, records):
+        batch = []
+        for row_no, record, error in records:
+            self.received += 1
+            if error:
+                self._error(row_no, error)
+                continue
+            row, errors = validate_record(record, self.model)
+            if errors:
+                self._error(row_no, "; ".join(errors))
+                continue
+            self.valid += 1
+            batch.append((row_no, row))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+        return self.report()
+
+    def report(self):
+        return {"table": self.table_name, "dry_run": self.dry_run,
+                "mode": "upsert" if self.on_conflict else "insert", "on_conflict": self.on_conflict,
+                "received": self.received, "valid": self.valid, "written": self.written,
+                "batches": self.batches, "error_count": self.error_count, "errors": self.errors,
+                "errors_truncated": self.error_count > len(self.errors)}
@@ -0,0 +1,245 @@
+import heapq
+import time
+from core.rules import DAYS, SLOTS_PER_DAY, SCOUT_SLOT
+from core.occupancy import Occupancy, feasible_starts, span_mask
+
+# Draft: จัดตารางแบบ constructive ไม่มีการสุ่ม (ข้อมูลชุดเดิมได้ตารางเดิมทุกครั้ง) ใช้เป็นตัวอย่างระหว่างแก้หลักสูตร
+# หรือเป็นจุดเริ่มของ GA (draft_seed)
+#   ลำดับ: DSatur - ลงวิชาที่เหลือเวลาให้เลือกน้อยที่สุดก่อน (เสมอกัน -> ใช้ครู/กลุ่มร่วมกับวิชาอื่นมาก, ยาวกว่า)
+#   ลง: ช่องว่างแรกตามลำดับที่เกลี่ยชั่วโมงของกลุ่ม/ครูให้กระจายทุกวัน ด้วยกฎเดียวกับ create_smart_individual
+#   ลงไม่ได้: เอาวิชาที่ขวางน้อยที่สุดออก (backtrack) แล้วใส่คิวใหม่; เกินจำนวนครั้งค่อยลงช่องที่ชนน้อยที่สุดตอนท้าย
+
+MAX_EJECTIONS = 3       # จำนวนครั้งที่วิชาหนึ่งถูกเอาออกได้ (กันวนไม่รู้จบ)
+BACKTRACKS_PER_COURSE = 2  # จำนวน backtrack รวมสูงสุด = จำนวนวิชา x ค่านี้
+STOP_CONSTRUCTED = 'constructed'
+
+def _popcount(mask):
+    return bin(mask).count('1')
+
+class DraftSolver:
+    """จัดตารางทั้งหมดด้วย DSatur + backtrack จำกัดจำนวนครั้ง -> list ของ [ห้อง, เวลาเริ่ม, ครู] ต่อวิชา"""
+
+    def __init__(self, table, max_ejections=MAX_EJECTIONS, backtracks_per_course=BACKTRACKS_PER_COURSE):
+        self.table = table
+        self.max_ejections = max_ejections
+        self.max_backtracks = table.n_courses * backtracks_per_course
+
+        # วิชาที่เกี่ยวข้องกัน (ใช้กลุ่มนักเรียนเดียวกัน หรือมีครูที่อาจสอนร่วมกัน) สำหรับอัปเดตลำดับ DSatur
+        self.teachers = [list(options) or [0] for options in table.teacher_options]
+        self.by_teacher = {}
+        for i, options in enumerate(self.teachers):
+            for t in options:
+                self.by_teacher.setdefault(t, []).append(i)
+        self.degree = [len(table.group_courses[int(table.group[i])]) - 1
+                       + sum(len(self.by_teacher[t]) - 1 for t in self.teachers[i]) for i in range(table.n_courses)]
+
+        # สถิติของการ solve ครั้งล่าสุด
+        self.backtracks = 0
+        self.unplaced = 0
+        self.seconds = 0.0
+
+    # --- สถานะระหว่างจัด ---
+    def _reset(self):
+        table = self.table
+        self.occ = Occupancy(table.n_rooms, len(table.instructor_ids), table.n_groups)
+        self.occ.block(table)
+        self.genes = [None] * table.n_courses
+        self.fixed = [False] * table.n_courses
+        self.ejections = [0] * table.n_courses
+        self.owner = {}   # ('r' | 't' | 'g', index, ชั่วโมง) -> set ของวิชาที่ลงอยู่
+        self.teacher_hours = [0] * len(table.instructor_ids)
+        self.group_day = [[0] * DAYS for _ in range(table.n_groups)]
+        self.teacher_day = [[0] * DAYS for _ in range(len(table.instructor_ids))]
+        self.stamp = [0] * table.n_courses
+        self.heap = []
+
+    def _keys(self, i, room_idx, start, teacher_idx):
+        g = int(self.table.group[i])
+        for h in range(start, start + int(self.table.duration[i])):
+            yield ('r', room_idx, h)
+            yield ('t', teacher_idx, h)
+            yield ('g', g, h)
+
+    def _place(self, i, room_idx, start, teacher_idx):
+        duration = int(self.table.duration[i])
+        self.occ.reserve(room_idx, teacher_idx, int(self.table.group[i]), start, duration)
+        for key in self._keys(i, room_idx, start, teacher_idx):
+            self.owner.setdefault(key, set()).add(i)
+        self.genes[i] = [room_idx, start, teacher_idx]
+        self._count(i, start, teacher_idx, duration)
+
+    def _unplace(self, i):
+        room_idx, start, teacher_idx = self.genes[i]
+        duration = int(self.table.duration[i])
+        self.occ.release(room_idx, teacher_idx, int(self.table.group[i]), start, duration)
+        for key in self._keys(i, room_idx, start, teacher_idx):
+            self.owner[key].discard(i)
+        self.genes[i] = None
+        self._count(i, start, teacher_idx, -duration)
+
+    def _count(self, i, start, teacher_idx, hours):
+        day = start // SLOTS_PER_DAY
+        self.teacher_hours[teacher_idx] += hours
+        self.group_day[int(self.table.group[i])][day] += hours
+        self.teacher_day[teacher_idx][day] += hours
+
+    # --- ลำดับ DSatur ---
+    def _push(self, i):
+        """คำนวณจำนวนเวลาเริ่มที่ยังลงได้ (ดูเฉพาะครู + กลุ่ม) ใหม่แล้วใส่คิว"""
+        duration = int(self.table.duration[i])
+        group_id = int(self.table.group[i])
+        free = max(_popcount(self.occ.free_starts(t, group_id, duration)) for t in self.teachers[i])
+        self.stamp[i] += 1
+        heapq.heappush(self.heap, (free, -self.degree[i], -duration, i, self.stamp[i]))
+
+    def _touch(self, i, teacher_idx):
+        """วิชาที่ยังไม่ได้ลงและใช้กลุ่ม/ครูเดียวกับ i -> คำนวณลำดับใหม่"""
+        for j in self.table.group_courses[int(self.table.group[i])]:
+            if self.genes[j] is None and not self.fixed[j]: self._push(j)
+        for j in self.by_teacher.get(teacher_idx, ()):
+            if self.genes[j] is None and not self.fixed[j]: self._push(j)
+
+    # --- หาช่อง ---
+    def _ordered_starts(self, i, teacher_idx, free):
+        """เวลาเริ่มที่ว่าง เรียงให้วันที่กลุ่ม/ครูมีชั่วโมงน้อยมาก่อน แล้วเช้าก่อนบ่าย"""
+        group_day = self.group_day[int(self.table.group[i])]
+        teacher_day = self.teacher_day[teacher_idx]
+        starts = [st for st in feasible_starts(int(self.table.duration[i]))[0] if free >> st & 1]
+        return sorted(starts, key=lambda st: (group_day[st // SLOTS_PER_DAY], teacher_day[st // SLOTS_PER_DAY],
+                                              st % SLOTS_PER_DAY, st))
+
+    def _free_placement(self, i):
+        """(ห้อง, เวลาเริ่ม, ครู) แรกที่ไม่ชนเลย (ครูที่สอนน้อยที่สุดก่อน) -> None ถ้าไม่มี"""
+        table = self.table
+        duration = int(table.duration[i])
+        group_id = int(table.group[i])
+        for t in sorted(self.teachers[i], key=lambda t: (self.teacher_hours[t], t)):
+            free = self.occ.free_starts(t, group_id, duration)
+            if not free: continue
+            for start in self._ordered_starts(i, t, free):
+                span = span_mask(start, duration)
+                for room_idx in table.room_options[i]:
+                    if not self.occ.room[room_idx] & span:
+                        return room_idx, start, t
+        return None
+
+    def _hard_busy(self, kind, idx):
+        """ชั่วโมงที่จองไว้ให้ส่วนอื่น (decompose) - เอาวิชาออกก็ไม่ว่าง"""
+        masks = self.table.blocked_room_masks if kind == 'r' else self.table.blocked_teacher_masks
+        return masks[idx] if masks is not None else 0
+
+    def _blockers(self, kind, idx, start, duration):
+        """วิชาที่ลงทับ (kind, idx) ในช่วงนี้ -> set หรือ None ถ้ามีวิชาที่เอาออกไม่ได้ / เป็นช่องที่จองไว้"""
+        if kind != 'g' and self._hard_busy(kind, idx) & span_mask(start, duration):
+            return None
+        found = set()
+        for h in range(start, start + duration):
+            found |= self.owner.get((kind, idx, h), set())
+        if any(self.fixed[j] or self.ejections[j] >= self.max_ejections for j in found):
+            return None
+        return found
+
+    def _ejection_placement(self, i):
+        """ช่องที่ต้องเอาวิชาอื่นออกน้อยที่สุด -> ((ห้อง, เวลาเริ่ม, ครู), วิชาที่ต้องเอาออก) หรือ None"""
+        table = self.table
+        duration = int(table.duration[i])
+        group_id = int(table.group[i])
+        best, best_cost = None, None
+        for t in self.teachers[i]:
+            for start in feasible_starts(duration)[0]:
+                base = self._blockers('g', group_id, start, duration)
+                if base is None: continue
+                teacher_blockers = self._blockers('t', t, start, duration)
+                if teacher_blockers is None: continue
+                base = base | teacher_blockers
+                if best_cost is not None and len(base) >= best_cost[0]: continue
+                span = span_mask(start, duration)
+                room_choice = None
+                for room_idx in table.room_options[i]:
+                    # ห้องที่ว่างอยู่แล้ว หรือว่างหลังเอาวิชาของครู/กลุ่มออก
+                    if self._hard_busy('r', room_idx) & span: continue
+                    blockers = self._blockers('r', room_idx, start, duration)
+                    if blockers is None: continue
+                    extra = blockers - base
+                    if room_choice is None or len(extra) < len(room_choice[1]):
+                        room_choice = (room_idx, extra)
+                        if not extra: break
+                if room_choice is None: continue
+                ejected = base | room_choice[1]
+                cost = (len(ejected), sum(int(table.duration[j]) for j in ejected), self.teacher_hours[t], start)
+                if best_cost is None or cost < best_cost:
+                    best, best_cost = ((room_choice[0], start, t), ejected), cost
+        return best
+
+    def _least_conflict_placement(self, i):
+        """ลงไม่ได้จริงๆ: ช่องที่ชนน้อยที่สุด (ยังเลี่ยงพักเที่ยง / 17.00 / ชั่วโมงที่จองไว้เหมือนเดิม)"""
+        table = self.table
+        duration = int(table.duration[i])
+        group_id = int(table.group[i])
+        t = min(self.teachers[i], key=lambda t: (self.teacher_hours[t], t))
+        starts = feasible_starts(duration)[0] or (0,)
+        best, best_cost = None, None
+        for start in starts:
+            span = span_mask(start, duration)
+            people = _popcount(self.occ.group[group_id] & span) + _popcount(self.occ.teacher[t] & span)
+            for room_idx in table.room_options[i]:
+                cost = (people + _popcount(self.occ.room[room_idx] & span), start)
+                if best_cost is None or cost < best_cost:
+                    best, best_cost = (room_idx, start, t), cost
+        return best
+
+    # --- main ---
+    def solve(self, seed_genes=None):
+        """จัดตารางทุกวิชา (gene ใน seed_genes ที่ไม่ใช่ None ใช้ตามเดิม) -> list ของ [ห้อง, เวลาเริ่ม, ครู]"""
+        started = time.perf_counter()
+        table = self.table
+        if seed_genes is None: seed_genes = table.pinned_genes
+        self._reset()
+        self.backtracks = 0
+
+        # ลงก่อนและห้ามเอาออก: gene ที่กำหนดมาแล้ว และลูกเสือ (ช่องตายตัว ข้อ 7)
+        for i in range(table.n_courses):
+            if seed_genes is not None and seed_genes[i] is not None:
+                self._place(i, *[int(v) for v in seed_genes[i]])
+                self.fixed[i] = True
+        for i in range(table.n_courses):
+            if self.fixed[i] or not table.is_scout[i]: continue
+            advisor = int(table.advisor_index[i])
+            t = advisor if advisor in self.teachers[i] else min(self.teachers[i], key=lambda t: (self.teacher_hours[t], t))
+            self._place(i, table.stadium_idx, SCOUT_SLOT, t)
+            self.fixed[i] = True
+
+        for i in range(table.n_courses):
+            if not self.fixed[i]: self._push(i)
+
+        failed = []
+        while self.heap:
+            _, _, _, i, stamp = heapq.heappop(self.heap)
+            if stamp != self.stamp[i] or self.genes[i] is not None or self.fixed[i]: continue
+            placement = self._free_placement(i)
+            if placement is None and self.backtracks < self.max_backtracks:
+                found = self._ejection_placement(i)
+                if found is not None:
+                    placement, ejected = found
+                    self.backtracks += 1
+                    for j in sorted(ejected):
+                        teacher_idx = self.genes[j][2]
+                        self._unplace(j)
+                        self.ejections[j] += 1
+                        self._touch(j, teacher_idx)
+            if placement is None:
+                failed.append(i)
+                self.fixed[i] = True  # ไม่ต้องเข้าคิวอีก
+                continue
+            self._place(i, *placement)
+            self._touch(i, placement[2])
+
+        # วิชาที่ลงไม่ได้ ลงทีหลังสุด (ไม่ถูกเอาออกแล้ว จึงจองซ้อนได้)
+        for i in failed:
+            self._place(i, *self._least_conflict_placement(i))
+        self.unplaced = len(failed)
+        self.seconds = time.perf_counter() - started
+        return [list(gene) for gene in self.genes]
+
+    def report(self):
+        return {"backtracks": self.backtracks, "unplaced": self.unplaced, "seconds": round(self.seconds, 4)}
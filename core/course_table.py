@@ -0,0 +1,232 @@
+import copy
+import numpy as np
+from core.rules import (
+    DAYS, SLOTS_PER_DAY,
+    COMP_ROOM_CODES, THEORY_ROOM_CODES, STADIUM_KEYWORDS, get_course_metadata, get_group_id, find_stadium_index,
+)
+
+def build_allowed_teachers_map(courses, instructors):
+    """Map Allowed Teachers per Course (ข้อ 15): course index -> list ของ index ครูที่สอนได้"""
+    instructor_name_map = {
+        (ins['first_name'].strip(), ins['last_name'].strip()): int(ins['id'])
+        for ins in instructors
+    }
+    instructor_db_id_to_index = {int(ins['id']): idx for idx, ins in enumerate(instructors)}
+
+    allowed_teachers_map = {}
+    for idx, course in enumerate(courses):
+        valid_indices = []
+        subj_data = course.get('subjects')
+        if isinstance(subj_data, list) and subj_data: subj_data = subj_data[0]
+
+        if subj_data:
+            for k in range(1, 6):
+                fname = subj_data.get(f'instructor_{k}_fname')
+                lname = subj_data.get(f'instructor_{k}_lname')
+                if fname and lname:
+                    key = (fname.strip(), lname.strip())
+                    if key in instructor_name_map:
+                        real_id = instructor_name_map[key]
+                        if real_id in instructor_db_id_to_index:
+                            valid_indices.append(instructor_db_id_to_index[real_id])
+
+        if not valid_indices:
+            valid_indices = list(range(len(instructors)))
+        allowed_teachers_map[idx] = valid_indices
+    return allowed_teachers_map
+
+class CourseTable:
+    """ตารางข้อมูลวิชาที่คอมไพล์ครั้งเดียวต่อการรัน ให้ operator ทุกตัวอ่านจากที่นี่แทน get_course_metadata
+
+    คอลัมน์ (index ตามลำดับ courses):
+      duration, is_scout, is_comp, is_theory   : ชั่วโมงต่อครั้งและประเภทวิชา
+      has_advisor, advisor_id, advisor_index   : ครูที่ปรึกษา (ข้อ 17), advisor_index = -1 ถ้าไม่อยู่ใน instructors
+      group                                    : group id แบบ int แทน f"{dept}_{yr}_{grp}"
+      group_nos                                : group_no ของแต่ละวิชา (str, บันทึกลง generated_schedules)
+      room_mask                                : (courses, rooms) ห้องที่วิชานี้ลงได้
+      teacher_options / room_options           : รายชื่อ index ที่เลือกได้ (list สำหรับ random.choice)
+      pinned / pinned_genes                    : วิชาที่ตรึงไว้กับ gene เดิม (ดู pin())
+      movable / same_duration                  : วิชาที่ mutation ขยับได้ และจัดกลุ่มตาม duration (สำหรับ swap)
+      group_courses                            : index วิชาของแต่ละกลุ่มนักเรียน (สำหรับ crossover แบบยกกลุ่ม)
+      blocked_rooms / blocked_teachers         : (ชั่วโมง, ห้อง/ครู) ที่จองไว้ให้ส่วนอื่นของตาราง (ดู block() / restrict_rooms(), ใช้กับ decompose)
+      workload_teachers                        : mask ราย index ใน instructor_ids ที่นับโทษภาระงาน / SD (None = ทุกคน, ดู restrict_workload())
+    """
+
+    def __init__(self, courses, room_ids, instructor_ids, allowed_teachers_map):
+        n = len(courses)
+        self.n_courses = n
+        self.n_rooms = len(room_ids)
+        self.room_ids = list(room_ids)
+        self.instructor_ids = list(instructor_ids)
+
+        # เตรียม Index ห้องสำหรับวิชาเฉพาะทาง (Fallback กันเหนียว = ห้องแรก)
+        self.stadium_idx = find_stadium_index(room_ids)
+        self.comp_rooms = [i for i, r in enumerate(room_ids) if r in COMP_ROOM_CODES] or [0]
+        self.theory_rooms = [i for i, r in enumerate(room_ids) if r in THEORY_ROOM_CODES] or [0]
+
+        id_to_index = {}
+        for idx, tid in enumerate(instructor_ids):
+            id_to_index.setdefault(int(tid), idx)
+
+        self.duration = np.ones(n, dtype=np.int16)
+        self.is_scout = np.zeros(n, dtype=bool)
+        self.is_comp = np.zeros(n, dtype=bool)
+        self.is_theory = np.zeros(n, dtype=bool)
+        self.has_advisor = np.zeros(n, dtype=bool)
+        self.advisor_id = np.zeros(n, dtype=np.int64)
+        self.advisor_index = np.full(n, -1, dtype=np.int32)
+        self.group = np.zeros(n, dtype=np.int32)
+        self.room_mask = np.zeros((n, self.n_rooms), dtype=bool)
+        self.group_keys = []
+
+        # ข้อมูลสำหรับบันทึกผล (save_to_db)
+        self.subject_codes = []
+        self.subject_names = []
+        self.departments = []
+        self.year_levels = []
+        self.group_nos = []
+
+        group_index = {}
+        # วิชาทั่วไปลงได้ทุกห้องยกเว้นสนาม (ถ้ามีห้องอื่น)
+        all_rooms = [i for i, r in enumerate(room_ids) if not any(x in r.lower() for x in STADIUM_KEYWORDS)]
+        all_rooms = all_rooms or list(range(self.n_rooms))
+        self.room_options = []
+        self.teacher_options = []
+        for i, course in enumerate(courses):
+            duration, is_scout, is_comp, is_theory, advisor_id = get_course_metadata(course)
+            self.duration[i] = duration
+            self.is_scout[i] = is_scout
+            self.is_comp[i] = is_comp
+            self.is_theory[i] = is_theory
+            if advisor_id:
+                self.has_advisor[i] = True
+                self.advisor_id[i] = int(advisor_id)
+                self.advisor_index[i] = id_to_index.get(int(advisor_id), -1)
+
+            key = get_group_id(course)
+            if key not in group_index:
+                group_index[key] = len(group_index)
+                self.group_keys.append(key)
+            self.group[i] = group_index[key]
+
+            if is_scout: rooms = [self.stadium_idx]
+            elif is_comp: rooms = self.comp_rooms
+            elif is_theory: rooms = self.theory_rooms
+            else: rooms = all_rooms
+            self.room_mask[i, rooms] = True
+            self.room_options.append(list(rooms))
+            self.teacher_options.append(list(allowed_teachers_map.get(i, [])))
+
+            subj = course.get('subjects')
+            if isinstance(subj, list) and subj: subj = subj[0]
+            self.subject_names.append(subj.get('subject_name', 'Unknown') if isinstance(subj, dict) else "Unknown")
+            self.subject_codes.append(course.get('subject_code', 'N/A'))
+            self.departments.append(course.get('department', 'General'))
+            self.year_levels.append(course.get('year_level', 'N/A'))
+            self.group_nos.append(str(course.get('group_no', '1')))
+
+        self.n_groups = len(self.group_keys)
+        self.group_courses = [[] for _ in range(self.n_groups)]
+        for i in range(n):
+            self.group_courses[self.group[i]].append(i)
+
+        # วิชาที่ถูก pin ไว้กับ gene เดิม (warm start) operator จะไม่แตะ
+        self.pinned = np.zeros(n, dtype=bool)
+        self.pinned_genes = None
+        self._refresh_movable()
+
+        # ชั่วโมงที่ห้ามใช้ (None = ไม่มีการจอง)
+        self.blocked_rooms = None
+        self.blocked_teachers = None
+        self.blocked_room_masks = None
+        self.blocked_teacher_masks = None
+        self.workload_teachers = None
+
+    def _refresh_movable(self):
+        self.movable = [i for i in range(self.n_courses) if not self.is_scout[i] and not self.pinned[i]]
+        self.same_duration = {}
+        for i in self.movable:
+            self.same_duration.setdefault(int(self.duration[i]), []).append(i)
+
+    def pin(self, genes, mask):
+        """ตรึงวิชาที่ mask เป็น True ไว้กับ genes[i] (ใช้ตอน warm start ค้นหาเฉพาะวิชาที่เปลี่ยน)"""
+        self.pinned = np.asarray(mask, dtype=bool).copy()
+        self.pinned_genes = [list(genes[i]) if self.pinned[i] and genes[i] is not None else None
+                             for i in range(self.n_courses)]
+        self.pinned &= np.array([g is not None for g in self.pinned_genes], dtype=bool)
+        if not self.pinned.any():
+            self.pinned_genes = None
+        self._refresh_movable()
+
+    def block(self, room_hours, teacher_hours):
+        """จองชั่วโมงไว้ให้ส่วนอื่นของตาราง: room_hours / teacher_hours = {index: [ชั่วโมงของสัปดาห์, ...]}
+
+        การประเมินจะนับการลงทับช่องที่จองเป็น hard violation และการสร้าง individual จะเลี่ยงช่องเหล่านี้
+        """
+        # เผื่อแถวท้ายสำหรับวิชาที่ยาวเลยวันสุดท้าย (ไม่ถูกจอง)
+        n_hours = DAYS * SLOTS_PER_DAY + int(self.duration.max() if self.n_courses else 1)
+        self.blocked_rooms = np.zeros((n_hours, self.n_rooms), dtype=bool)
+        self.blocked_teachers = np.zeros((n_hours, len(self.instructor_ids)), dtype=bool)
+        self.blocked_room_masks = [0] * self.n_rooms
+        self.blocked_teacher_masks = [0] * len(self.instructor_ids)
+        for blocked, masks, hours_by_index in ((self.blocked_rooms, self.blocked_room_masks, room_hours),
+                                               (self.blocked_teachers, self.blocked_teacher_masks, teacher_hours)):
+            for idx, hours in hours_by_index.items():
+                for h in hours:
+                    blocked[h, idx] = True
+                    masks[idx] |= 1 << h
+
+    def restrict_workload(self, teachers):
+        """นับโทษภาระงานครู (ชั่วโมง / วันสอน / SD) เฉพาะครู index ใน teachers
+
+        ใช้กับส่วนย่อยของ decompose: ครูที่ไม่ได้สอนในส่วนนี้ หรือสอนหลายส่วน (เห็นชั่วโมงแค่บางส่วน) ไม่ถูกนับ
+        """
+        self.workload_teachers = np.zeros(len(self.instructor_ids), dtype=bool)
+        self.workload_teachers[list(teachers)] = True
+
+    def restrict_rooms(self, rooms):
+        """ให้วิชาเลือกได้เฉพาะห้องใน rooms (วิชาที่ไม่เหลือห้องเลยใช้ตัวเลือกเดิม) ใช้กับ CourseTable จาก subset()"""
+        allowed = np.zeros(self.n_rooms, dtype=bool)
+        allowed[list(rooms)] = True
+        room_mask = self.room_mask & allowed
+        keep = room_mask.any(axis=1)
+        self.room_mask = np.where(keep[:, None], room_mask, self.room_mask)
+        self.room_options = [[r for r in options if allowed[r]] if keep[i] else options
+                             for i, options in enumerate(self.room_options)]
+
+    def subset(self, indices):
+        """CourseTable ของวิชาบางส่วน (ห้อง / ครูชุดเดิม index เดิม) สำหรับแก้ปัญหาย่อยใน decompose"""
+        sub = copy.copy(self)
+        indices = [int(i) for i in indices]
+        idx = np.array(indices, dtype=np.int64)
+        sub.n_courses = len(indices)
+        for name in ('duration', 'is_scout', 'is_comp', 'is_theory', 'has_advisor', 'advisor_id', 'advisor_index',
+                     'room_mask', 'pinned'):
+            setattr(sub, name, getattr(self, name)[idx].copy())
+        for name in ('room_options', 'teacher_options', 'subject_codes', 'subject_names', 'departments', 'year_levels',
+                     'group_nos'):
+            setattr(sub, name, [getattr(self, name)[i] for i in indices])
+        if self.pinned_genes is not None:
+            sub.pinned_genes = [self.pinned_genes[i] for i in indices]
+            if not sub.pinned.any(): sub.pinned_genes = None
+
+        # เรียง group ใหม่ให้เหลือเฉพาะกลุ่มที่มีในส่วนนี้
+        group_index = {}
+        for g in self.group[idx].tolist():
+            group_index.setdefault(g, len(group_index))
+        sub.group = np.array([group_index[g] for g in self.group[idx].tolist()], dtype=np.int32)
+        sub.group_keys = [self.group_keys[g] for g in group_index]
+        sub.n_groups = len(group_index)
+        sub.group_courses = [[] for _ in range(sub.n_groups)]
+        for i in range(sub.n_courses):
+            sub.group_courses[sub.group[i]].append(i)
+        sub._refresh_movable()
+        return sub
+
+    def copy(self):
+        """สำเนาแบบตื้นสำหรับการรัน 1 ครั้ง (pin() ตั้งค่าใหม่ทั้งก้อน ไม่แก้ของเดิม จึงใช้คอลัมน์อื่นร่วมกันได้)"""
+        return copy.copy(self)
+
+def compile_course_table(courses, room_ids, instructor_ids, allowed_teachers_map):
+    """คอมไพล์ curriculums เป็น CourseTable (เรียกครั้งเดียวตอนเริ่ม run)"""
+    return CourseTable(courses, room_ids, instructor_ids, allowed_teachers_map)
@@ -7,4 +7,22 @@ try:
     print("✅ Supabase connected successfully")
 except Exception as e:
     print(f"❌ Supabase connection failed: {e}")
-    supabase = None
\ No newline at end of file
+    supabase = None
+
+# Supabase คืนผลได้สูงสุด 1000 แถวต่อ request -> ดึงทีละหน้าจนครบ
+PAGE_SIZE = 1000
+
+def fetch_all(table_name, columns="*", client=None, page_size=PAGE_SIZE, where=None):
+    """ดึงทุกแถวของตาราง (แบ่งหน้าด้วย range), where = function ที่เติม filter / order ให้ query"""
+    client = client or supabase
+    rows = []
+    start = 0
+    while True:
+        query = client.table(table_name).select(columns)
+        if where is not None:
+            query = where(query)
+        page = query.range(start, start + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
@@ -0,0 +1,323 @@
+import multiprocessing
+import queue
+import random
+import time
+import numpy as np
+from deap import base, tools
+from core.rules import DAYS, SLOTS_PER_DAY, LUNCH_SLOT
+from core.fitness_engine import PopulationEvaluator, population_to_array
+from core.local_search import LocalSearch
+from core.parallel_eval import genome_dtype, make_individual
+from core.evolution import evolve, STOP_MAX_GENERATIONS, STOP_CANCELLED
+
+# Decomposition: แบ่งกลุ่ม (แผนก, ชั้นปี) ที่ใช้ครู/ห้องร่วมกันน้อยออกเป็นส่วนๆ แล้วจัดแต่ละส่วนด้วย GA ของตัวเองใน process แยก
+# ครู/ห้องที่หลายส่วนใช้ร่วมกันจะถูกแบ่งชั่วโมงกันไว้ล่วงหน้า (ส่วนอื่นเห็นเป็นช่องที่ไม่ว่าง)
+# แล้วรวมผลเป็นตารางเดียวและซ่อมจุดที่ยังชนกันด้วย local search บนทั้งตาราง
+
+# ชั่วโมงของสัปดาห์ที่แบ่งให้แต่ละส่วน เรียงสลับวัน (ส่วนที่ได้น้อยก็ยังได้ครบทุกวัน) ไม่รวมพักเที่ยง
+WEEK_HOURS = [day * SLOTS_PER_DAY + slot for slot in range(SLOTS_PER_DAY) for day in range(DAYS) if slot != LUNCH_SLOT]
+HOUR_STRIDE = 11  # ระยะเลื่อนจุดเริ่มต่อทรัพยากร (ไม่เป็นตัวประกอบของ 45 ชั่วโมง จึงวนครบทุกจุดเริ่ม)
+
+PART_SLACK = 0.1    # ขนาดส่วนเกินค่าเฉลี่ยได้เท่าไร (ให้แผนกที่ใหญ่กว่าค่าเฉลี่ยนิดหน่อยยังอยู่ส่วนเดียวกันได้)
+REPAIR_SHARE = 0.25  # สัดส่วนของเวลาที่เหลือ (ตอนมี time budget) ที่เก็บไว้ซ่อมตารางหลังรวมผล
+
+def node_of(table, i):
+    return (str(table.departments[i]), str(table.year_levels[i]))
+
+def course_resources(table, i):
+    """ครู / ห้องที่วิชา i อาจใช้ -> list ของ (('teacher' | 'room', index), ชั่วโมงที่คาดว่าใช้)
+
+    ชั่วโมงแบ่งเท่าๆ กันตามจำนวนตัวเลือก; ไม่นับครูของวิชาที่ไม่ได้ระบุครู (สอนได้ทุกคน), ห้องทั่วไป (ยกทั้งห้องให้ส่วนเดียว
+    ด้วย assign_rooms) และลูกเสือ (ช่อง/สนามตายตัว)
+    """
+    hours = int(table.duration[i])
+    resources = []
+    teachers = table.teacher_options[i]
+    if teachers and len(teachers) < len(table.instructor_ids):
+        resources += [(('teacher', t), hours / len(teachers)) for t in teachers]
+    if table.is_comp[i] or table.is_theory[i]:
+        rooms = table.room_options[i]
+        resources += [(('room', r), hours / len(rooms)) for r in rooms]
+    return resources
+
+def resource_demand(table, labels):
+    """ชั่วโมงที่แต่ละ label (เช่น กลุ่ม หรือส่วน) ต้องการจากครู/ห้องแต่ละตัว -> {resource: {label: ชั่วโมง}}"""
+    demand = {}
+    for i in range(table.n_courses):
+        for resource, hours in course_resources(table, i):
+            per_label = demand.setdefault(resource, {})
+            per_label[labels[i]] = per_label.get(labels[i], 0.0) + hours
+    return demand
+
+def coupling_graph(table):
+    """กราฟการใช้ครู/ห้องร่วมกันระหว่างกลุ่ม (แผนก, ชั้นปี) -> (ชั่วโมงเรียนของแต่ละกลุ่ม, {(a, b): น้ำหนัก})
+
+    น้ำหนัก = ผลรวมของ min(ชั่วโมงที่ a ต้องการ, ชั่วโมงที่ b ต้องการ) ของทุกครู/ห้องที่ใช้ร่วมกัน
+    """
+    nodes = [node_of(table, i) for i in range(table.n_courses)]
+    sizes = {}
+    for i, node in enumerate(nodes):
+        sizes[node] = sizes.get(node, 0) + int(table.duration[i])
+
+    edges = {}
+    for per_node in resource_demand(table, nodes).values():
+        users = sorted(per_node)
+        for a in range(len(users)):
+            for b in range(a + 1, len(users)):
+                key = (users[a], users[b])
+                edges[key] = edges.get(key, 0.0) + min(per_node[users[a]], per_node[users[b]])
+    return sizes, edges
+
+def partition_nodes(sizes, edges, n_parts):
+    """แบ่งกลุ่มเป็น n_parts ส่วนที่ขนาดใกล้กันและตัดขอบน้ำหนักน้อย -> list ของ list ของกลุ่ม
+
+    รวมคู่ที่ใช้ร่วมกันมากที่สุดก่อน (ไม่ให้ก้อนใหญ่เกินส่วนเฉลี่ยเกิน PART_SLACK) แล้วกระจายก้อนลงส่วนที่เล็กที่สุด
+    """
+    parent = {node: node for node in sizes}
+    size = dict(sizes)
+    cap = sum(sizes.values()) / max(1, n_parts) * (1 + PART_SLACK)
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for (a, b), _ in sorted(edges.items(), key=lambda kv: (-kv[1], kv[0])):
+        ra, rb = find(a), find(b)
+        if ra != rb and size[ra] + size[rb] <= cap:
+            parent[rb] = ra
+            size[ra] += size[rb]
+
+    clusters = {}
+    for node in sorted(sizes):
+        clusters.setdefault(find(node), []).append(node)
+    parts = [[] for _ in range(max(1, n_parts))]
+    loads = [0] * len(parts)
+    for root, members in sorted(clusters.items(), key=lambda kv: (-size[kv[0]], kv[0])):
+        k = loads.index(min(loads))
+        parts[k].extend(members)
+        loads[k] += size[root]
+    return [p for p in parts if p]
+
+def partition_courses(table, n_parts):
+    """-> (list ของ index วิชาของแต่ละส่วน, สัดส่วนน้ำหนักขอบที่ถูกตัด)"""
+    sizes, edges = coupling_graph(table)
+    parts = partition_nodes(sizes, edges, n_parts)
+    part_of = {node: k for k, nodes in enumerate(parts) for node in nodes}
+    courses = [[] for _ in parts]
+    for i in range(table.n_courses):
+        courses[part_of[node_of(table, i)]].append(i)
+    total = sum(edges.values())
+    cut = sum(w for (a, b), w in edges.items() if part_of[a] != part_of[b])
+    return courses, (cut / total if total else 0.0)
+
+def exclusive_instructors(table, parts):
+    """ครูที่สอนได้เฉพาะในส่วนเดียว -> list ของ index ใน instructor_ids ต่อส่วน
+
+    ครูที่อยู่หลายส่วนเห็นชั่วโมงแค่บางส่วน (min_load / SD จะผิด) ส่วนครูที่ไม่อยู่ในส่วนนั้นให้โทษคงที่
+    จึงไม่นับภาระงานของครูเหล่านี้ในส่วนย่อย ให้การซ่อมทั้งตารางหลังรวมผลเป็นคนเกลี่ยแทน
+    """
+    parts_of = {}
+    for k, courses in enumerate(parts):
+        for i in courses:
+            for t in table.teacher_options[i]:
+                parts_of.setdefault(int(table.instructor_ids[t]), set()).add(k)
+    return [[t for t, tid in enumerate(table.instructor_ids) if parts_of.get(int(tid)) == {k}]
+            for k in range(len(parts))]
+
+def assign_rooms(table, parts):
+    """ยกห้องทั้งห้องให้ส่วนเดียว แบ่งตามสัดส่วนชั่วโมงที่แต่ละส่วนต้องการจากกลุ่มห้องเดียวกัน (เช่น ห้องทั่วไป)
+
+    ไล่กลุ่มห้องจากเล็กไปใหญ่ กลุ่มที่มีห้องน้อยกว่าจำนวนส่วนที่ใช้ (เช่น ห้องคอม) ใช้ร่วมกันแบบแบ่งชั่วโมง
+    -> ({ห้อง: ส่วนเจ้าของ}, set ของห้องที่ใช้ร่วมกัน)
+    """
+    pools = {}
+    for k, courses in enumerate(parts):
+        for i in courses:
+            if table.is_scout[i]: continue
+            per_part = pools.setdefault(tuple(table.room_options[i]), {})
+            per_part[k] = per_part.get(k, 0) + int(table.duration[i])
+
+    owner, shared = {}, set()
+    for rooms, per_part in sorted(pools.items(), key=lambda kv: (len(kv[0]), kv[0])):
+        if len(per_part) < 2: continue
+        free = [r for r in rooms if r not in owner and r not in shared]
+        if len(free) < len(per_part):
+            shared.update(free)
+            continue
+        total = sum(per_part.values())
+        target = {k: len(free) * d / total for k, d in per_part.items()}
+        got = {k: 0 for k in per_part}
+        for r in free:
+            # ทุกส่วนได้อย่างน้อย 1 ห้องก่อน แล้วค่อยให้ส่วนที่ยังขาดมากที่สุด
+            k = max(sorted(per_part), key=lambda k: (got[k] == 0, target[k] - got[k]))
+            owner[r] = k
+            got[k] += 1
+    return owner, shared
+
+def reserve_hours(table, parts):
+    """แบ่งครู/ห้องที่หลายส่วนใช้ร่วมกัน: ห้องทั่วไปยกให้ส่วนเดียว (assign_rooms) นอกนั้นแบ่งชั่วโมงตามสัดส่วนความต้องการ
+
+    -> list ต่อส่วนของ (room_hours, teacher_hours, rooms) = ชั่วโมงที่ส่วนนั้นห้ามใช้ (เป็นของส่วนอื่น)
+       และห้องที่ส่วนนั้นเลือกได้
+    """
+    labels = [0] * table.n_courses
+    for k, courses in enumerate(parts):
+        for i in courses:
+            labels[i] = k
+    owner, shared = assign_rooms(table, parts)
+    blocked = [({}, {}, [r for r in range(table.n_rooms) if owner.get(r, k) == k]) for k in range(len(parts))]
+    for n, ((kind, idx), per_part) in enumerate(sorted(resource_demand(table, labels).items())):
+        if len(per_part) < 2 or (kind == 'room' and idx in owner): continue
+        total = sum(per_part.values())
+        target = {k: len(WEEK_HOURS) * d / total for k, d in per_part.items()}
+        got = {k: 0 for k in per_part}
+        # เริ่มที่ชั่วโมงต่างกันในแต่ละครู/ห้อง ไม่ให้ส่วนหนึ่งได้ช่วงเวลาเดิมของทุกทรัพยากร (กลุ่มนักเรียนจะลงไม่พอ)
+        shift = n * HOUR_STRIDE % len(WEEK_HOURS)
+        hours_order = WEEK_HOURS[shift:] + WEEK_HOURS[:shift]
+        owner_of_hour = []
+        for _ in hours_order:
+            k = max(sorted(per_part), key=lambda k: target[k] - got[k])
+            owner_of_hour.append(k)
+            got[k] += 1
+        for k in per_part:
+            hours = [h for h, o in zip(hours_order, owner_of_hour) if o != k]
+            blocked[k][0 if kind == 'room' else 1][idx] = hours
+    return blocked
+
+def _part_worker(part_idx, table, instructor_details_map, head_instructor_ids, cfg, seed, results, stop_event):
+    """process ของส่วนหนึ่ง: GA ปกติบน CourseTable ของส่วนนั้น"""
+    from core.ai_scheduler import register_operators, build_population  # import ใน process ลูก (กัน circular import)
+
+    random.seed(seed)
+    np.random.seed(seed % (2 ** 32))
+    tb = base.Toolbox()
+    evaluator = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+    register_operators(tb, table, cfg, evaluator)
+    dtype = genome_dtype(table)
+
+    refine = None
+    if cfg.get('local_search'):
+        ls = LocalSearch(table, evaluator)
+        refine = lambda population: ls.refine(population, cfg.get('local_search_top_k', 1),
+                                              cfg.get('local_search_iterations', 0), cfg.get('local_search_seconds'))
+
+    deadline = time.monotonic() + cfg['time_budget_seconds'] if cfg.get('time_budget_seconds') else None
+
+    def on_generation(gen, population, halloffame):
+        results.put(('gen', part_idx, gen, None, halloffame[0].fitness.values[0]))
+        return stop_event.is_set()
+
+    hof = tools.HallOfFame(1, similar=np.array_equal)
+    log, reason = [], STOP_CANCELLED
+    try:
+        pop = build_population(tb, cfg['pop_size'], cfg.get('seed_genes'), cfg.get('warm_ratio', 0))
+        pop, log, reason = evolve(pop, tb, cxpb=0.7, mutpb=cfg['mutation_prob'], ngen=cfg['generations'],
+                                  halloffame=hof, on_generation=on_generation, patience=cfg.get('patience'),
+                                  target_penalty=cfg.get('target_penalty'), deadline=deadline, refine=refine)
+    finally:
+        best = hof[0] if len(hof) else None
+        results.put(('done', part_idx, (max(0, len(log) - 1), reason),
+                     population_to_array([best]).astype(dtype)[0] if best is not None else None,
+                     best.fitness.values[0] if best is not None else float('inf')))
+
+def run_decomposed(table, instructor_details_map, head_instructor_ids, cfg, n_parts,
+                   progress=None, cancel_event=None, patience=None, target_penalty=None, deadline=None):
+    """แบ่งปัญหาเป็น n_parts ส่วน จัดแต่ละส่วนพร้อมกันใน process แยก แล้วรวมและซ่อมจุดที่ชนกัน
+
+    คืนค่า (best_individual, best_fitness, stop_reason, generations_run, report)
+    """
+    parts, cut_ratio = partition_courses(table, n_parts)
+    blocked = reserve_hours(table, parts)
+    scored = exclusive_instructors(table, parts)
+    seed_genes = cfg.get('seed_genes')
+
+    # เผื่อเวลาไว้ซ่อมหลังรวมผล (REPAIR_SHARE ของเวลาที่เหลือ เพราะรุ่นสุดท้ายของแต่ละส่วนอาจเลยเวลาไปบ้าง)
+    # ไม่มี time budget: ซ่อมตามจำนวนรอบ final_local_search_iterations โดยมี final_local_search_seconds เป็นเพดาน
+    budget = None
+    repair_seconds = cfg.get('final_local_search_seconds', 0)
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        repair_seconds = remaining * REPAIR_SHARE
+        budget = max(remaining - repair_seconds, 0.0)
+    part_cfg = dict(cfg, patience=patience, target_penalty=target_penalty, time_budget_seconds=budget)
+    ctx = multiprocessing.get_context()
+    results = ctx.Queue()
+    stop_event = ctx.Event()
+    procs = []
+    for k, courses in enumerate(parts):
+        room_hours, teacher_hours, rooms = blocked[k]
+        sub = table.subset(courses)
+        sub.restrict_rooms(rooms)
+        sub.block(room_hours, teacher_hours)
+        sub.restrict_workload(scored[k])
+        sub_cfg = dict(part_cfg, seed_genes=[seed_genes[i] for i in courses] if seed_genes is not None else None)
+        proc = ctx.Process(target=_part_worker, daemon=True,
+                           args=(k, sub, instructor_details_map, head_instructor_ids, sub_cfg,
+                                 random.randrange(2 ** 63), results, stop_event))
+        proc.start()
+        procs.append(proc)
+
+    genomes = [None] * len(parts)
+    part_penalty = [float('inf')] * len(parts)
+    part_gens = [0] * len(parts)
+    reasons = [None] * len(parts)
+    cancelled = False
+    try:
+        while any(r is None for r in reasons):
+            try:
+                kind, k, info, genome, fit = results.get(timeout=0.5)
+            except queue.Empty:
+                kind = None
+                dead = [k for k, p in enumerate(procs) if reasons[k] is None and p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Partition process {dead[0]} exited with code {procs[dead[0]].exitcode}")
+
+            if kind == 'gen':
+                part_gens[k], part_penalty[k] = info, fit
+            elif kind == 'done':
+                (part_gens[k], reasons[k]), genomes[k], part_penalty[k] = info, genome, fit
+            if kind is not None and progress:
+                progress({"run": 1, "runs": 1, "generation": min(part_gens), "generations": cfg['generations'],
+                          "best_penalty": sum(part_penalty)})
+
+            if not cancelled and cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                stop_event.set()
+    finally:
+        stop_event.set()
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+    report = {"partitions": len(parts), "cut_ratio": round(cut_ratio, 4),
+              "sizes": [len(c) for c in parts], "workload_instructors": [len(t) for t in scored],
+              "part_penalties": part_penalty}
+    if cancelled or any(g is None for g in genomes):
+        return None, float('inf'), STOP_CANCELLED, max(part_gens), report
+
+    # --- รวมผล แล้วซ่อมการชนข้ามส่วน (และชั่วโมงที่จองไว้ที่บางส่วนยังลงทับ) บนทั้งตาราง ---
+    genes = np.zeros((table.n_courses, 3), dtype=np.int64)
+    for courses, genome in zip(parts, genomes):
+        genes[courses] = genome
+    best = make_individual(genes, genome_dtype(table))
+    evaluator = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+    merged = float(evaluator.evaluate_population(genes[None])[0])
+    best.fitness.values = (merged,)
+
+    ls = LocalSearch(table, evaluator)
+    report["merged_penalty"] = merged
+    report["conflicts_before_repair"] = len(ls.conflicts(genes))
+    if deadline is not None:
+        repair_seconds = min(repair_seconds, deadline - time.monotonic())
+    if repair_seconds > 0:
+        # มี time budget: ซ่อมจนหมดเวลาที่กันไว้ (การรันแบบแบ่งส่วนขึ้นกับเวลาอยู่แล้ว)
+        ls.improve(best, None if deadline is not None else cfg.get('final_local_search_iterations', 0), repair_seconds)
+    report["conflicts_after_repair"] = len(ls.conflicts(np.asarray(best, dtype=np.int64)))
+    report["repair"] = ls.report()
+
+    # ทุกส่วนหยุดด้วยเหตุผลเดียวกัน -> ใช้เหตุผลนั้น, ไม่งั้นใช้ของส่วนที่ใช้เวลานานที่สุด
+    reason = reasons[0] if len(set(reasons)) == 1 else reasons[int(np.argmax(part_gens))]
+    return best, best.fitness.values[0], reason or STOP_MAX_GENERATIONS, max(part_gens), report
@@ -0,0 +1,97 @@
+import time
+from deap import tools, algorithms
+
+# เหตุผลที่หยุดวิวัฒนาการ (รายงานกลับใน response)
+STOP_MAX_GENERATIONS = 'max_generations'
+STOP_NO_IMPROVEMENT = 'no_improvement'
+STOP_TARGET_REACHED = 'target_reached'
+STOP_TIME_BUDGET = 'time_budget'
+STOP_CANCELLED = 'cancelled'
+
+def _best_fitness(population, halloffame):
+    if halloffame is not None and len(halloffame):
+        return halloffame[0].fitness.values[0]
+    return min(ind.fitness.values[0] for ind in population)
+
+def evolve(population, toolbox, cxpb, mutpb, ngen, stats=None, halloffame=None,
+           verbose=False, on_generation=None, patience=None, target_penalty=None, deadline=None,
+           refine=None):
+    """วงรอบวิวัฒนาการแบบเดียวกับ algorithms.eaSimple (ใช้ random เหมือนกันทุกขั้น) พร้อมเงื่อนไขหยุดก่อน
+
+    - patience: หยุดเมื่อ best ไม่ดีขึ้นติดต่อกัน patience รุ่น
+    - target_penalty: หยุดเมื่อ best < target_penalty (เช่น 1,000,000 = ไม่มี hard violation)
+    - deadline: เวลา (time.monotonic()) ที่ต้องหยุด
+    - on_generation(gen, population, halloffame) ถูกเรียกหลังจบแต่ละรุ่น ถ้าคืน True จะหยุด (ยกเลิก)
+    - refine(population): ขั้น local search หลังประเมินแต่ละรุ่น (แก้ individual ในที่ก่อนเข้า hall of fame)
+
+    คืนค่า (population, logbook, stop_reason)
+    """
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+
+    # ประเมินตัวที่ยังไม่มี fitness
+    invalid_ind = [ind for ind in population if not ind.fitness.valid]
+    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+    for ind, fit in zip(invalid_ind, fitnesses):
+        ind.fitness.values = fit
+    if refine:
+        refine(population)
+
+    if halloffame is not None:
+        halloffame.update(population)
+
+    record = stats.compile(population) if stats else {}
+    logbook.record(gen=0, nevals=len(invalid_ind), **record)
+    if verbose:
+        print(logbook.stream)
+
+    best = _best_fitness(population, halloffame)
+    stale = 0
+
+    def check_stop(gen):
+        if on_generation and on_generation(gen, population, halloffame):
+            return STOP_CANCELLED
+        if target_penalty is not None and best < target_penalty:
+            return STOP_TARGET_REACHED
+        if patience is not None and stale >= patience:
+            return STOP_NO_IMPROVEMENT
+        if deadline is not None and time.monotonic() >= deadline:
+            return STOP_TIME_BUDGET
+        return None
+
+    reason = check_stop(0)
+    if reason:
+        return population, logbook, reason
+
+    for gen in range(1, ngen + 1):
+        offspring = toolbox.select(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        if refine:
+            refine(offspring)
+
+        if halloffame is not None:
+            halloffame.update(offspring)
+
+        population[:] = offspring
+
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=len(invalid_ind), **record)
+        if verbose:
+            print(logbook.stream)
+
+        current = _best_fitness(population, halloffame)
+        if current < best:
+            best, stale = current, 0
+        else:
+            stale += 1
+
+        reason = check_stop(gen)
+        if reason:
+            return population, logbook, reason
+
+    return population, logbook, STOP_MAX_GENERATIONS
@@ -0,0 +1,82 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from core.fitness_engine import population_to_array
+
+class FitnessCache:
+    """LRU cache ของ fitness หน้า evaluator (key = hash ของ genome แบบ compact)
+
+    ลูกที่ได้จาก crossover/selection มักซ้ำกับตัวที่เคยประเมินแล้ว -> ไม่ต้องประเมินซ้ำ
+    """
+
+    def __init__(self, evaluator, maxsize):
+        self.evaluator = evaluator
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def genome_key(genome):
+        """hash 16 byte ของ genome (int32 แถวเดียว)"""
+        return hashlib.blake2b(np.ascontiguousarray(genome, dtype=np.int32).tobytes(), digest_size=16).digest()
+
+    def _lookup(self, key):
+        fitness = self.entries.get(key)
+        if fitness is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return fitness
+
+    def _store(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def evaluate(self, individual):
+        key = self.genome_key(population_to_array([individual])[0])
+        fitness = self._lookup(key)
+        if fitness is None:
+            self.misses += 1
+            fitness = tuple(self.evaluator.evaluate(individual))
+            self._store(key, fitness)
+        return fitness
+
+    def map(self, func, individuals):
+        """toolbox.map: ดึงตัวที่เคยประเมินจาก cache ส่วนที่เหลือส่งให้ evaluator ประเมินทั้งชุดในครั้งเดียว"""
+        if getattr(func, 'func', func) != self.evaluate:
+            return self.evaluator.map(func, individuals)
+        individuals = list(individuals)
+        if not individuals:
+            return []
+
+        genomes = population_to_array(individuals)
+        keys = [self.genome_key(g) for g in genomes]
+        results = [self._lookup(key) for key in keys]
+
+        # ตัวซ้ำกันเองในชุดเดียวกันประเมินครั้งเดียว
+        pending = {}
+        for idx, (key, fitness) in enumerate(zip(keys, results)):
+            if fitness is None:
+                pending.setdefault(key, []).append(idx)
+        if pending:
+            first = [positions[0] for positions in pending.values()]
+            if hasattr(self.evaluator, 'evaluate_population'):
+                # ส่ง genome ที่แปลงแล้วต่อเลย ไม่ต้องแปลงซ้ำ
+                fitnesses = [(p,) for p in self.evaluator.evaluate_population(genomes[first]).tolist()]
+            else:
+                fitnesses = self.evaluator.map(self.evaluator.evaluate, [individuals[i] for i in first])
+            for (key, positions), fitness in zip(pending.items(), fitnesses):
+                fitness = tuple(fitness)
+                self._store(key, fitness)
+                for i in positions:
+                    results[i] = fitness
+                self.misses += 1
+                self.hits += len(positions) - 1
+        return results
+
+    def report(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries),
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
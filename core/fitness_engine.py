@@ -0,0 +1,229 @@
+from itertools import chain
+import numpy as np
+from core.rules import (
+    DAYS, SLOTS_PER_DAY, LUNCH_SLOT, LAST_END_SLOT, SCOUT_SLOT, HARD_PENALTY,
+    SCOUT_ROOM_PENALTY, ADVISOR_PENALTY, LATE_PENALTY, METHA_PENALTY, HEAD_LOAD_PENALTY,
+    MIN_LOAD_PENALTY, COMP_DAYS_PENALTY, SD_PENALTY, COMP_ROOM_CODES, THEORY_ROOM_CODES,
+    SCOUT_ROOM_KEYWORDS, is_computer_department,
+)
+
+# ชื่อกฎใน penalty_breakdown() (ตามลำดับที่รายงาน)
+PENALTY_TERMS = ('room_clash', 'teacher_clash', 'group_clash', 'comp_room', 'theory_room', 'scout_slot',
+                 'scout_room', 'advisor', 'lunch', 'metha', 'late', 'head_load', 'min_load', 'comp_days', 'sd',
+                 'reserved')
+
+# จำนวน bin สูงสุดต่อการเรียก bincount หนึ่งครั้ง (กันหน่วยความจำพุ่งตอน pop ใหญ่)
+MAX_BINCOUNT_BINS = 1 << 22
+
+def population_to_array(population):
+    """แปลงประชากร (list ของ individual แบบ array หรือ list ของ [room, start, teacher]) เป็น array ขนาด (N, courses, 3)"""
+    if isinstance(population, np.ndarray):
+        return population.astype(np.int64, copy=False).reshape(len(population), -1, 3)
+    if len(population) and isinstance(population[0], np.ndarray):
+        out = np.empty((len(population),) + population[0].shape, dtype=np.int64)
+        for k, ind in enumerate(population):
+            out[k] = ind
+        return out.reshape(len(population), -1, 3)
+    # fromiter บน list ที่แบนแล้วเร็วกว่า np.asarray กับ list ซ้อน 3 ชั้นราว 2 เท่า
+    n_values = sum(len(ind) for ind in population) * 3
+    flat = chain.from_iterable(chain.from_iterable(population))
+    return np.fromiter(flat, dtype=np.int64, count=n_values).reshape(len(population), -1, 3)
+
+def count_collisions(abs_slots, resources, n_resources):
+    """นับจำนวนครั้งที่ (slot, resource) ถูกใช้ซ้ำ ต่อ individual ด้วย bincount"""
+    n, width = abs_slots.shape
+    if width == 0:
+        return np.zeros(n, dtype=np.int64)
+    base_slot = abs_slots.min()
+    span = int(abs_slots.max() - base_slot) + 1
+    keys = (abs_slots - base_slot) * n_resources + resources
+    bins = span * n_resources
+    rows_per_chunk = max(1, MAX_BINCOUNT_BINS // bins)
+
+    collisions = np.empty(n, dtype=np.int64)
+    for lo in range(0, n, rows_per_chunk):
+        hi = min(n, lo + rows_per_chunk)
+        chunk = keys[lo:hi] + (np.arange(hi - lo, dtype=np.int64) * bins)[:, None]
+        counts = np.bincount(chunk.ravel(), minlength=(hi - lo) * bins).reshape(hi - lo, bins)
+        # ช่องที่ถูกใช้ k ครั้ง = ชน k-1 ครั้ง -> รวมแล้วเท่ากับ width - จำนวนช่องที่ถูกใช้
+        collisions[lo:hi] = width - np.count_nonzero(counts, axis=1)
+    return collisions
+
+def row_std(values, counts):
+    """np.std ของ values[i, :counts[i]] ทีละแถว (จัดกลุ่มตามความยาวเพื่อให้ผลตรงกับ np.std เดิมทุกบิต)"""
+    out = np.zeros(values.shape[0], dtype=np.float64)
+    for k in np.unique(counts):
+        if k == 0: continue
+        rows = np.flatnonzero(counts == k)
+        out[rows] = np.std(np.ascontiguousarray(values[rows, :k]), axis=1)
+    return out
+
+class PopulationEvaluator:
+    """ประเมิน fitness ของประชากรทั้งชุดในครั้งเดียว ผลลัพธ์ต้องตรงกับ evaluate() ทุกกฎ"""
+
+    def __init__(self, table, instructor_details_map, head_instructor_ids):
+        room_ids = table.room_ids
+        instructor_ids = table.instructor_ids
+
+        # --- ข้อมูลรายวิชา (จาก CourseTable) ---
+        self.duration = table.duration.astype(np.int64)
+        self.is_scout = table.is_scout
+        self.is_comp = table.is_comp
+        self.is_theory = table.is_theory
+        self.has_advisor = table.is_scout & table.has_advisor  # ข้อ 17 ใช้เฉพาะวิชาลูกเสือ
+        self.advisor_id = table.advisor_id
+        self.group = table.group.astype(np.int64)
+        self.n_groups = max(1, table.n_groups)
+        n_courses = table.n_courses
+
+        # --- ข้อมูลห้อง ---
+        self.n_rooms = len(room_ids)
+        self.room_is_comp = np.array([r in COMP_ROOM_CODES for r in room_ids], dtype=bool)
+        self.room_is_theory = np.array([r in THEORY_ROOM_CODES for r in room_ids], dtype=bool)
+        self.room_is_field = np.array(
+            [any(x in r.lower() for x in SCOUT_ROOM_KEYWORDS) for r in room_ids], dtype=bool)
+
+        # --- ข้อมูลครู (index ใน instructor_ids -> ครูจริง) ---
+        unique_ids = {}
+        self.teacher_key = np.array(
+            [unique_ids.setdefault(tid, len(unique_ids)) for tid in instructor_ids], dtype=np.int64)
+        self.n_teachers = max(1, len(unique_ids))
+        self.teacher_int_id = np.array([int(tid) for tid in instructor_ids], dtype=np.int64)
+        self.teacher_is_metha = np.array(
+            ['เมธา' in (instructor_details_map.get(tid, {}).get('first_name', '') or '')
+             for tid in instructor_ids], dtype=bool)
+        self.teacher_is_head = np.array([tid in head_instructor_ids for tid in instructor_ids], dtype=bool)
+        self.teacher_is_comp_dept = np.array(
+            [is_computer_department(instructor_details_map.get(tid, {}).get('department', ''))
+             for tid in instructor_ids], dtype=bool)
+
+        # --- ตารางขยาย gene -> slot ที่ใช้ (course index, offset) ---
+        self.slot_course = np.repeat(np.arange(n_courses), self.duration)
+        starts = np.cumsum(self.duration) - self.duration
+        self.slot_offset = np.arange(self.slot_course.size) - np.repeat(starts, self.duration)
+
+        # --- ชั่วโมงที่จองไว้ให้ส่วนอื่นของตาราง (decompose) ---
+        self.blocked_rooms = table.blocked_rooms
+        self.blocked_teachers = table.blocked_teachers
+
+        # --- ครูที่นับโทษภาระงาน / SD (None = ทุกคน, decompose นับเฉพาะครูของส่วนนั้น) ---
+        self.workload_teachers = table.workload_teachers
+
+    def reserved_hits(self, abs_slots, rooms, teachers):
+        """ชั่วโมงที่ลงทับช่องที่จองไว้ (ห้องหรือครู) -> bool shape เดียวกับ abs_slots"""
+        if self.blocked_rooms is None:
+            return np.zeros(abs_slots.shape, dtype=bool)
+        hours = np.clip(abs_slots, 0, self.blocked_rooms.shape[0] - 1)
+        return self.blocked_rooms[hours, rooms] | self.blocked_teachers[hours, teachers]
+
+    def gene_penalty_terms(self, room, start, teacher, courses=slice(None)):
+        """โทษราย gene แยกตามกฎ -> dict ชื่อกฎ -> array (shape เดียวกับ room/start/teacher)"""
+        duration = self.duration[courses]
+        is_scout = self.is_scout[courses]
+        day = start // SLOTS_PER_DAY
+        slot = start % SLOTS_PER_DAY
+        end_slot = slot + duration
+        scout_day, scout_slot = divmod(SCOUT_SLOT, SLOTS_PER_DAY)
+        metha = self.teacher_is_metha[teacher]
+        terms = {
+            # --- Hard Constraints รายวิชา ---
+            'comp_room': (self.is_comp[courses] & ~self.room_is_comp[room]) * HARD_PENALTY,
+            'theory_room': (self.is_theory[courses] & ~self.room_is_theory[room]) * HARD_PENALTY,
+            'scout_slot': (is_scout & ((day != scout_day) | (slot != scout_slot))) * HARD_PENALTY,
+            'scout_room': (is_scout & ~self.room_is_field[room]) * SCOUT_ROOM_PENALTY,
+            'advisor': (self.has_advisor[courses] & (self.advisor_id[courses] != self.teacher_int_id[teacher])) * ADVISOR_PENALTY,
+            'lunch': ((slot <= LUNCH_SLOT) & (LUNCH_SLOT < end_slot)) * HARD_PENALTY,
+            # --- Soft Constraints รายวิชา ---
+            'metha': (metha & (((day == 0) & (slot < 4)) | ((day == DAYS - 1) & (slot >= 5)))) * METHA_PENALTY,
+            'late': (end_slot > LAST_END_SLOT) * LATE_PENALTY,
+        }
+        if self.blocked_rooms is not None:
+            # ทุกชั่วโมงของวิชาที่ลงทับช่องที่จองไว้ (รวมในโทษราย gene เพื่อให้ DeltaEvaluator นับด้วย)
+            offsets = np.arange(int(self.duration.max()))
+            hits = self.reserved_hits(start[..., None] + offsets, room[..., None], teacher[..., None])
+            terms['reserved'] = (hits & (offsets < duration[..., None])).sum(axis=-1) * HARD_PENALTY
+        return terms
+
+    def gene_penalties(self, room, start, teacher, courses=slice(None)):
+        """โทษราย gene (กฎที่ไม่ขึ้นกับวิชาอื่น) ของวิชา courses, shape เดียวกับ room/start/teacher"""
+        return sum(self.gene_penalty_terms(room, start, teacher, courses).values()).astype(np.int64)
+
+    def workload_penalty_terms(self, h, d, positions=slice(None)):
+        """โทษภาระงานครูแยกตามกฎ (h = ชั่วโมง, d = จำนวนวันที่สอน)"""
+        head = self.teacher_is_head[positions]
+        return {
+            'head_load': np.where(head & ((h < 18) | (h > 24)), HEAD_LOAD_PENALTY * np.abs(h - 21), 0),
+            'min_load': np.where(~head & (h < 18), MIN_LOAD_PENALTY * (18 - h), 0),
+            'comp_days': np.where(self.teacher_is_comp_dept[positions] & (d < 5), COMP_DAYS_PENALTY * (5 - d), 0),
+        }
+
+    def workload_penalties(self, h, d, positions=slice(None)):
+        """โทษภาระงานครูราย index ใน instructor_ids (h = ชั่วโมง, d = จำนวนวันที่สอน)"""
+        return sum(self.workload_penalty_terms(h, d, positions).values())
+
+    def evaluate_population(self, population, breakdown=False):
+        """คืน penalty ของทุก individual เป็น array ขนาด (N,)
+
+        breakdown=True -> (penalty, dict ชื่อกฎ -> array ขนาด (N,)) ผลรวมของทุกกฎเท่ากับ penalty
+        """
+        if len(population) == 0:
+            empty = np.zeros(0, dtype=np.float64)
+            return (empty, {}) if breakdown else empty
+        pop = population if isinstance(population, np.ndarray) else population_to_array(population)
+        n = pop.shape[0]
+        room, start, teacher = pop[:, :, 0], pop[:, :, 1], pop[:, :, 2]
+        day = start // SLOTS_PER_DAY
+        terms = {name: t.sum(axis=1) for name, t in self.gene_penalty_terms(room, start, teacher).items()}
+
+        # --- การชนกัน (ห้อง / ครู / กลุ่มนักเรียน) ---
+        abs_slots = start[:, self.slot_course] + self.slot_offset
+        teacher_key = self.teacher_key[teacher]
+        terms['room_clash'] = count_collisions(abs_slots, room[:, self.slot_course], self.n_rooms) * HARD_PENALTY
+        terms['teacher_clash'] = count_collisions(abs_slots, teacher_key[:, self.slot_course], self.n_teachers) * HARD_PENALTY
+        group = np.broadcast_to(self.group[self.slot_course], abs_slots.shape)
+        terms['group_clash'] = count_collisions(abs_slots, group, self.n_groups) * HARD_PENALTY
+
+        # --- Workload ครู ---
+        row_offset = (np.arange(n, dtype=np.int64) * self.n_teachers)[:, None]
+        hours = np.bincount((teacher_key + row_offset).ravel(),
+                            weights=np.broadcast_to(self.duration, teacher_key.shape).ravel(),
+                            minlength=n * self.n_teachers).astype(np.int64).reshape(n, self.n_teachers)
+
+        day_base = int(day.min())
+        day_span = int(day.max()) - day_base + 1
+        active = np.zeros(n * self.n_teachers * day_span, dtype=bool)
+        active[((teacher_key + row_offset) * day_span + (day - day_base)).ravel()] = True
+        days_active = active.reshape(n, self.n_teachers, day_span).sum(axis=2)
+
+        h = hours[:, self.teacher_key]
+        for name, t in self.workload_penalty_terms(h, days_active[:, self.teacher_key]).items():
+            if self.workload_teachers is not None: t = t * self.workload_teachers
+            terms[name] = t.sum(axis=1)
+
+        # ข้อ 14: เกลี่ยชั่วโมง (SD) เฉพาะครูที่มีชั่วโมงสอน ตามลำดับ instructor_ids
+        teaching = h > 0
+        if self.workload_teachers is not None: teaching &= self.workload_teachers
+        order = np.argsort(~teaching, axis=1, kind='stable')
+        packed = np.take_along_axis(h, order, axis=1)
+        sd = row_std(packed, teaching.sum(axis=1)) * SD_PENALTY
+        penalty = sum(terms.values()).astype(np.float64) + sd
+        if breakdown:
+            terms['sd'] = sd
+            return penalty, terms
+        return penalty
+
+    def penalty_breakdown(self, individual):
+        """penalty ของ individual เดียวแยกตามกฎ -> dict ชื่อกฎ -> float (ตามลำดับ PENALTY_TERMS)"""
+        _, terms = self.evaluate_population([individual], breakdown=True)
+        return {name: float(terms[name][0]) if name in terms else 0.0 for name in PENALTY_TERMS}
+
+    def evaluate(self, individual):
+        """ใช้แทน evaluate() รายตัวได้ (คืน tuple แบบ DEAP)"""
+        return (float(self.evaluate_population([individual])[0]),)
+
+    def map(self, func, individuals):
+        """toolbox.map: ถ้าเป็นการประเมิน fitness ให้ประเมินทั้งรุ่นในครั้งเดียว"""
+        if getattr(func, 'func', func) == self.evaluate:
+            individuals = list(individuals)
+            return [(p,) for p in self.evaluate_population(individuals).tolist()]
+        return list(map(func, individuals))
@@ -0,0 +1,169 @@
+import multiprocessing
+import queue
+import random
+import time
+import numpy as np
+from deap import base, tools
+from core.fitness_engine import PopulationEvaluator, population_to_array
+from core.local_search import LocalSearch
+from core.parallel_eval import genome_dtype, make_individual
+from core.evolution import (
+    evolve, STOP_MAX_GENERATIONS, STOP_NO_IMPROVEMENT, STOP_TARGET_REACHED,
+    STOP_TIME_BUDGET, STOP_CANCELLED,
+)
+
+TOPOLOGIES = ('ring', 'complete', 'none')
+
+def migration_targets(island_idx, n_islands, topology):
+    """index ของเกาะที่เกาะนี้ส่ง migrant ไปให้"""
+    if topology == 'ring':
+        return [(island_idx + 1) % n_islands] if n_islands > 1 else []
+    if topology == 'complete':
+        return [j for j in range(n_islands) if j != island_idx]
+    return []
+
+def _to_individuals(genomes, fitnesses):
+    individuals = []
+    for genome, fit in zip(genomes, fitnesses):
+        ind = make_individual(genome, genomes.dtype)
+        ind.fitness.values = (fit,)
+        individuals.append(ind)
+    return individuals
+
+def _island_worker(island_idx, table, instructor_details_map, head_instructor_ids, cfg, seed,
+                   inbox, outboxes, results, stop_event):
+    """process ของเกาะหนึ่ง: วิวัฒนาการทีละ epoch แล้วแลก migrant กับเกาะข้างเคียง"""
+    from core.ai_scheduler import register_operators, build_population  # import ใน process ลูก (กัน circular import)
+
+    random.seed(seed)
+    np.random.seed(seed % (2 ** 32))
+    tb = base.Toolbox()
+    evaluator = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+    register_operators(tb, table, cfg, evaluator)
+    dtype = genome_dtype(table)
+
+    refine = None
+    if cfg.get('local_search'):
+        ls = LocalSearch(table, evaluator)
+        refine = lambda population: ls.refine(population, cfg.get('local_search_top_k', 1),
+                                              cfg.get('local_search_iterations', 0), cfg.get('local_search_seconds'))
+
+    pop = build_population(tb, cfg['island_pop_size'], cfg.get('seed_genes'), cfg.get('warm_ratio', 0))
+    hof = tools.HallOfFame(1, similar=np.array_equal)
+    gens_done = 0
+    try:
+        while gens_done < cfg['generations'] and not stop_event.is_set():
+            ngen = min(cfg['migration_interval'], cfg['generations'] - gens_done)
+            pop, log, _ = evolve(pop, tb, cxpb=0.7, mutpb=cfg['mutation_prob'], ngen=ngen, halloffame=hof,
+                                 on_generation=lambda *args: stop_event.is_set(), refine=refine)
+            gens_done += len(log) - 1
+
+            # ส่งตัวที่ดีที่สุด k ตัวไปยังเกาะปลายทาง
+            migrants = tools.selBest(pop, cfg['migration_size'])
+            payload = (population_to_array(migrants).astype(dtype), [m.fitness.values[0] for m in migrants])
+            for out in outboxes:
+                out.put(payload)
+
+            # รับ migrant ที่มาถึงแล้ว (ไม่รอ) แทนที่ตัวที่แย่ที่สุด
+            incoming = []
+            while True:
+                try:
+                    genomes, fits = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                incoming.extend(_to_individuals(genomes, fits))
+            if incoming:
+                incoming = incoming[:len(pop)]
+                pop.sort(key=lambda ind: ind.fitness.values[0])
+                pop[len(pop) - len(incoming):] = incoming
+
+            best = hof[0]
+            results.put(('epoch', island_idx, gens_done,
+                         population_to_array([best]).astype(dtype)[0], best.fitness.values[0]))
+    finally:
+        best = hof[0] if len(hof) else None
+        results.put(('done', island_idx, gens_done,
+                     population_to_array([best]).astype(dtype)[0] if best is not None else None,
+                     best.fitness.values[0] if best is not None else float('inf')))
+        # ไม่ต้องรอส่ง migrant ที่ค้างในคิว (ปลายทางอาจจบไปแล้ว)
+        for out in outboxes:
+            out.cancel_join_thread()
+
+def run_islands(table, instructor_details_map, head_instructor_ids, cfg, n_islands,
+                topology='ring', progress=None, cancel_event=None,
+                patience=None, target_penalty=None, deadline=None):
+    """รัน M เกาะใน process แยกกัน แลก migrant ทุก migration_interval รุ่น และติดตาม best รวมทุกเกาะ
+
+    คืนค่า (best_individual, best_fitness, stop_reason, generations_run)
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown island topology: {topology}")
+
+    island_cfg = dict(cfg)
+    island_cfg['island_pop_size'] = max(2, cfg['pop_size'] // n_islands)
+    island_cfg['migration_size'] = min(cfg.get('migration_size', 2), island_cfg['island_pop_size'])
+    island_cfg['migration_interval'] = max(1, cfg.get('migration_interval', 10))
+
+    ctx = multiprocessing.get_context()
+    inboxes = [ctx.Queue() for _ in range(n_islands)]
+    results = ctx.Queue()
+    stop_event = ctx.Event()
+    procs = []
+    for i in range(n_islands):
+        outboxes = [inboxes[j] for j in migration_targets(i, n_islands, topology)]
+        proc = ctx.Process(target=_island_worker, daemon=True,
+                           args=(i, table, instructor_details_map, head_instructor_ids, island_cfg,
+                                 random.randrange(2 ** 63), inboxes[i], outboxes, results, stop_event))
+        proc.start()
+        procs.append(proc)
+
+    best_genome, best_fitness = None, float('inf')
+    island_gens = [0] * n_islands
+    improved_at = 0
+    done = set()
+    stop_reason = None
+    try:
+        while len(done) < n_islands:
+            try:
+                kind, idx, gens, genome, fit = results.get(timeout=0.5)
+            except queue.Empty:
+                kind = None
+                dead = [i for i, p in enumerate(procs) if i not in done and p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Island process {dead[0]} exited with code {procs[dead[0]].exitcode}")
+
+            if kind is not None:
+                island_gens[idx] = gens
+                if genome is not None and fit < best_fitness:
+                    best_genome, best_fitness = genome, fit
+                    improved_at = max(island_gens)
+                if kind == 'done':
+                    done.add(idx)
+                if progress:
+                    progress({"run": 1, "runs": 1, "generation": min(island_gens),
+                              "generations": cfg['generations'], "best_penalty": best_fitness})
+
+            # เงื่อนไขหยุดรวมทุกเกาะ
+            if stop_reason is None:
+                if cancel_event is not None and cancel_event.is_set():
+                    stop_reason = STOP_CANCELLED
+                elif target_penalty is not None and best_fitness < target_penalty:
+                    stop_reason = STOP_TARGET_REACHED
+                elif patience is not None and max(island_gens) - improved_at >= patience:
+                    stop_reason = STOP_NO_IMPROVEMENT
+                elif deadline is not None and time.monotonic() >= deadline:
+                    stop_reason = STOP_TIME_BUDGET
+                if stop_reason:
+                    stop_event.set()
+    finally:
+        stop_event.set()
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+    best = None
+    if best_genome is not None:
+        best = make_individual(best_genome, genome_dtype(table))
+        best.fitness.values = (best_fitness,)
+    return best, best_fitness, stop_reason or STOP_MAX_GENERATIONS, max(island_gens)
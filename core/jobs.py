@@ -0,0 +1,168 @@
+import hashlib
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from core.ai_scheduler import run_genetic_algorithm
+
+# จำนวนงานที่จบแล้วที่เก็บไว้ให้ดูสถานะย้อนหลัง
+MAX_FINISHED_JOBS = 100
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+def fingerprint(params):
+    """fingerprint ของ input (งานที่ input เหมือนกันจะใช้ job เดียวกัน)"""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class Job:
+    """สถานะของงานจัดตาราง 1 งาน"""
+
+    def __init__(self, params, fp):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.fingerprint = fp
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.generation = 0
+        self.total_generations = 0
+        self.run = 0
+        self.runs = 0
+        self.best_penalty = None
+        self.eta_seconds = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+
+    def update_progress(self, info):
+        """callback จาก GA หลังจบแต่ละรุ่น"""
+        self.run, self.runs = info['run'], info['runs']
+        self.generation, self.total_generations = info['generation'], info['generations']
+        self.best_penalty = info['best_penalty']
+
+        total = self.runs * self.total_generations
+        done = (self.run - 1) * self.total_generations + self.generation
+        elapsed = time.time() - self.started_at
+        if done > 0 and total > 0:
+            self.eta_seconds = round(elapsed / done * max(total - done, 0), 1)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "run": self.run,
+            "runs": self.runs,
+            "generation": self.generation,
+            "total_generations": self.total_generations,
+            "best_penalty": self.best_penalty,
+            "eta_seconds": self.eta_seconds,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class JobManager:
+    """คิวงานจัดตารางที่รันใน background executor (1 fingerprint = 1 งานที่กำลังทำ)
+
+    งานเก็บอยู่ใน memory ของ process นี้เท่านั้น: ต้องรัน gunicorn worker เดียว (Procfile) ให้ทุก request เห็น job เดียวกัน
+    """
+
+    def __init__(self, runner, max_workers=1):
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ga-job')
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.active_by_fingerprint = {}
+
+    def submit(self, params, fp=None):
+        """สร้างงานใหม่ หรือคืนงานเดิมที่ input เหมือนกันและยังไม่จบ -> (job, created)"""
+        fp = fp or fingerprint(params)
+        with self.lock:
+            existing = self.active_by_fingerprint.get(fp)
+            if existing is not None and existing.status in ACTIVE_STATUSES:
+                return existing, False
+            job = Job(params, fp)
+            self.jobs[job.id] = job
+            self.active_by_fingerprint[fp] = job
+            self._prune()
+        self.executor.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job_id):
+        """ส่งสัญญาณยกเลิก (GA จะหยุดหลังจบรุ่นปัจจุบัน)"""
+        # เช็คและเปลี่ยนสถานะใน lock เดียวกับที่ _run ใช้เริ่มงาน (กันงานเริ่มรันระหว่างที่กำลังยกเลิก)
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in ACTIVE_STATUSES:
+                job.cancel_event.set()
+                if job.status == 'queued':
+                    self._finish_locked(job, 'cancelled')
+        return job
+
+    def _run(self, job):
+        with self.lock:
+            # ถูกยกเลิกไปแล้วตอนยังอยู่ในคิว
+            if job.status != 'queued':
+                return
+            job.status = 'running'
+            job.started_at = time.time()
+        try:
+            result = self.runner(progress=job.update_progress, cancel_event=job.cancel_event, **job.params)
+            job.result = result
+            status = result.get('status') if isinstance(result, dict) else 'success'
+            if status == 'cancelled':
+                self._finish(job, 'cancelled')
+            elif status == 'error':
+                job.error = result.get('message')
+                self._finish(job, 'failed')
+            else:
+                self._finish(job, 'succeeded')
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            self._finish(job, 'failed')
+
+    def _finish(self, job, status):
+        with self.lock:
+            self._finish_locked(job, status)
+
+    def _finish_locked(self, job, status):
+        """เหมือน _finish แต่ผู้เรียกถือ self.lock อยู่แล้ว"""
+        job.status = status
+        job.finished_at = time.time()
+        job.eta_seconds = 0 if status == 'succeeded' else None
+        if self.active_by_fingerprint.get(job.fingerprint) is job:
+            del self.active_by_fingerprint[job.fingerprint]
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.status not in ACTIVE_STATUSES]
+        finished.sort(key=lambda j: j.created_at)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """JobManager ของ process นี้ (สร้างเมื่อใช้ครั้งแรก)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(run_genetic_algorithm, max_workers=Config.GA_JOB_WORKERS)
+        return _manager
@@ -0,0 +1,174 @@
+import random
+import time
+import numpy as np
+from deap import tools
+from core.rules import HARD_PENALTY
+from core.occupancy import Occupancy, feasible_starts
+
+TABU_TENURE = 10        # จำนวนรอบที่ห้ามย้ายวิชากลับไปช่องที่เพิ่งย้ายออก
+MAX_CANDIDATES = 48     # จำนวน move ย้ายห้อง/เวลาสูงสุดที่ประเมินต่อรอบ
+MAX_SWAPS = 12          # จำนวน swap move สูงสุดต่อรอบ
+RANDOM_MOVES = 6        # move สุ่มใน domain (ใช้ตอนไม่มีช่องว่างเลย ให้ย้ายไปที่ที่ชนน้อยกว่าได้)
+EXTRA_TEACHERS = 2      # จำนวนครูอื่นที่ลองเปลี่ยนให้ต่อรอบ
+
+class LocalSearch:
+    """Tabu search บน individual ตัวเดียว: เลือกวิชาที่ติด hard constraint แล้วใช้ move ที่ดีที่สุดจาก
+    การย้าย (ห้อง, เวลา, ครู) ไปช่องที่ว่าง หรือสลับเวลากับวิชาที่ยาวเท่ากัน (ประเมิน move ทั้งชุดในครั้งเดียว)
+    """
+
+    def __init__(self, table, evaluator, tabu_tenure=TABU_TENURE, max_candidates=MAX_CANDIDATES):
+        self.table = table
+        self.ev = evaluator
+        self.tabu_tenure = tabu_tenure
+        self.max_candidates = max_candidates
+        self.movable = ~table.is_scout & ~table.pinned
+
+        # สถิติสะสม (รายงานกลับใน response)
+        self.calls = 0
+        self.moves = 0
+        self.penalty_removed = 0.0
+        self.seconds = 0.0
+        self.capped = 0  # จำนวนครั้งที่หยุดเพราะชนเพดานเวลาก่อนครบจำนวนรอบ
+
+    def conflicts(self, genes):
+        """index ของวิชาที่ขยับได้และติด hard constraint (ชนห้อง/ครู/กลุ่ม หรือผิดกฎรายวิชา)"""
+        ev = self.ev
+        room, start, teacher = genes[:, 0], genes[:, 1], genes[:, 2]
+        abs_slots = start[ev.slot_course] + ev.slot_offset
+        abs_slots = abs_slots - abs_slots.min()
+        clashing = np.zeros(len(ev.slot_course), dtype=bool)
+        for resource, n_resources in ((room[ev.slot_course], ev.n_rooms),
+                                      (ev.teacher_key[teacher][ev.slot_course], ev.n_teachers),
+                                      (ev.group[ev.slot_course], ev.n_groups)):
+            keys = abs_slots * n_resources + resource
+            clashing |= np.bincount(keys)[keys] > 1
+        clashing |= ev.reserved_hits(start[ev.slot_course] + ev.slot_offset, room[ev.slot_course],
+                                     teacher[ev.slot_course])
+
+        bad = np.zeros(len(genes), dtype=bool)
+        bad[ev.slot_course[clashing]] = True
+        bad |= ev.gene_penalties(room, start, teacher) >= HARD_PENALTY
+        return np.flatnonzero(bad & self.movable)
+
+    def candidates(self, genes, i):
+        """move ของวิชา i: list ของ ((course, room, start, teacher), ...)"""
+        table = self.table
+        rows = genes.tolist()
+        duration = int(table.duration[i])
+        group_id = int(table.group[i])
+        starts, _ = feasible_starts(duration)
+
+        occ = Occupancy(table.n_rooms, len(table.instructor_ids), table.n_groups)
+        occ.block(table)
+        for c, (room_idx, start_slot, teacher_idx) in enumerate(rows):
+            if c != i:
+                occ.reserve(room_idx, teacher_idx, int(table.group[c]), start_slot, int(table.duration[c]))
+
+        # ย้ายไปช่องที่ว่าง (ครูเดิม + ครูอื่นที่สอนได้อีกไม่กี่คน)
+        current_teacher = rows[i][2]
+        others = [t for t in table.teacher_options[i] if t != current_teacher]
+        teachers = [current_teacher] + random.sample(others, min(EXTRA_TEACHERS, len(others)))
+        moves = []
+        for teacher_idx in teachers:
+            teacher_group_free = occ.free_starts(teacher_idx, group_id, duration)
+            if not teacher_group_free: continue
+            for room_idx in table.room_options[i]:
+                free = occ.free_in_room(teacher_group_free, room_idx, duration)
+                if not free: continue
+                moves.extend(((i, room_idx, st, teacher_idx),) for st in starts if free >> st & 1)
+        if len(moves) > self.max_candidates:
+            moves = random.sample(moves, self.max_candidates)
+
+        # ย้ายแบบสุ่มใน domain
+        if starts:
+            for _ in range(RANDOM_MOVES):
+                moves.append(((i, random.choice(table.room_options[i]), random.choice(starts), current_teacher),))
+
+        # สลับเวลากับวิชาที่ยาวเท่ากัน (สลับห้องด้วยถ้าลงได้ทั้งคู่)
+        partners = table.same_duration.get(duration, [])
+        ri, si, ti = rows[i]
+        for j in random.sample(partners, min(MAX_SWAPS, len(partners))):
+            if j == i: continue
+            rj, sj, tj = rows[j]
+            if table.room_mask[i, rj] and table.room_mask[j, ri]:
+                moves.append(((i, rj, sj, ti), (j, ri, si, tj)))
+            else:
+                moves.append(((i, ri, sj, ti), (j, rj, si, tj)))
+        return moves
+
+    def improve(self, individual, iterations, time_limit=None):
+        """ปรับ individual ในที่ (เฉพาะเมื่อดีขึ้น) ไม่เกิน iterations รอบ -> penalty ที่ลดได้
+
+        จำนวนรอบเป็นตัวกำหนดผล (seed เดียวกันได้ผลเดิม) ส่วน time_limit เป็นแค่เพดานกันค้าง
+        ถ้าหยุดเพราะชนเพดานเวลา ผลจะขึ้นกับความเร็วเครื่อง (นับไว้ใน capped)
+        iterations = None คือไม่จำกัดรอบ ใช้เวลาจนครบ time_limit
+        """
+        started = time.monotonic()
+        deadline = started + time_limit if time_limit is not None else None
+        genes = np.asarray(individual, dtype=np.int64).reshape(-1, 3).copy()
+        if individual.fitness.valid:
+            initial = individual.fitness.values[0]
+        else:
+            initial = float(self.ev.evaluate_population(genes[None])[0])
+        best, best_genes = initial, genes.copy()
+        tabu = {}  # (course, room, start) -> รอบที่หมดอายุ
+        iteration = 0
+
+        while iterations is None or iteration < iterations:
+            if deadline is not None and time.monotonic() >= deadline:
+                if iterations is not None: self.capped += 1
+                break
+            conflicts = self.conflicts(genes)
+            if len(conflicts) == 0: break
+            i = int(random.choice(conflicts))
+            moves = self.candidates(genes, i)
+            iteration += 1
+            if not moves: continue
+
+            variants = np.repeat(genes[None], len(moves), axis=0)
+            for k, move in enumerate(moves):
+                for c, room_idx, start_slot, teacher_idx in move:
+                    variants[k, c] = (room_idx, start_slot, teacher_idx)
+            scores = self.ev.evaluate_population(variants)
+
+            # move ที่ดีที่สุดที่ไม่ติด tabu (ยกเว้นดีกว่า best ที่เคยเจอ = aspiration)
+            chosen = None
+            for k in np.argsort(scores, kind='stable').tolist():
+                if scores[k] < best or all(tabu.get((c, r, s), 0) <= iteration for c, r, s, _ in moves[k]):
+                    chosen = k
+                    break
+            if chosen is None: continue
+
+            for c, room_idx, start_slot, teacher_idx in moves[chosen]:
+                tabu[(c, int(genes[c, 0]), int(genes[c, 1]))] = iteration + self.tabu_tenure
+                genes[c] = (room_idx, start_slot, teacher_idx)
+            self.moves += 1
+            if scores[chosen] < best:
+                best, best_genes = float(scores[chosen]), genes.copy()
+
+        removed = initial - best
+        if removed > 0:
+            changed = np.flatnonzero((best_genes != individual).any(axis=1))
+            individual[changed] = best_genes[changed]
+            individual.fitness.values = (best,)
+            self.penalty_removed += removed
+
+        self.calls += 1
+        self.seconds += time.monotonic() - started
+        return removed
+
+    def refine(self, population, top_k, iterations, time_limit=None, deadline=None):
+        """รันกับ top_k ตัวที่ดีที่สุดของรุ่น (แบ่ง iterations และเพดานเวลา time_limit เท่าๆ กัน)"""
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            time_limit = remaining if time_limit is None else min(time_limit, remaining)
+        if (time_limit is not None and time_limit <= 0) or top_k <= 0 or iterations <= 0:
+            return 0.0
+        elite = tools.selBest(population, min(top_k, len(population)))
+        share = max(1, iterations // len(elite))
+        return sum(self.improve(ind, share, time_limit / len(elite) if time_limit is not None else None)
+                   for ind in elite)
+
+    def report(self):
+        return {"calls": self.calls, "moves": self.moves, "capped": self.capped,
+                "penalty_removed": self.penalty_removed, "seconds": round(self.seconds, 2)}
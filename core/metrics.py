@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import numpy as np
+from config import Config
+from core.fitness_engine import PENALTY_TERMS, population_to_array
+
+# จำนวนการรันล่าสุดที่เก็บ metrics ไว้ดูย้อนหลัง (/ai/runs)
+MAX_RECORDED_RUNS = 20
+# จำนวน individual สูงสุดที่ใช้คิด diversity ต่อรุ่น (กันรุ่นใหญ่ช้า)
+DIVERSITY_SAMPLE = 256
+
+def population_diversity(population, best):
+    """สัดส่วน gene ที่ต่างจากตัวที่ดีที่สุดโดยเฉลี่ย (0 = ทั้งรุ่นเหมือนกันหมด)"""
+    sample = population[:DIVERSITY_SAMPLE]
+    if not sample: return 0.0
+    genes = population_to_array(sample)
+    best_genes = population_to_array([best])[0]
+    return float((genes != best_genes).any(axis=2).mean())
+
+class RunMetrics:
+    """เวลาแต่ละช่วงและสถิติรายรุ่นของการจัดตาราง 1 ครั้ง
+
+    enabled=False: span() / generation() ไม่ทำอะไรเลย (ใช้ตอนปิด GA_METRICS)
+    """
+
+    def __init__(self, mode, enabled=None):
+        self.enabled = Config.GA_METRICS if enabled is None else enabled
+        self.mode = mode
+        self.started_at = time.time()
+        self.phases = {}
+        self.generations = []
+        self.status = None
+        self.penalty = None
+        self.breakdown = None
+        self._last_tick = None
+
+    def span(self, name):
+        """with metrics.span('evolve'): ... -> เวลารวมของช่วงนั้น (วินาที)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+            self._last_tick = time.perf_counter()
+
+    def generation(self, run_idx, gen, population):
+        """เรียกจาก on_generation หลังจบแต่ละรุ่น"""
+        if not self.enabled: return
+        now = time.perf_counter()
+        seconds = now - self._last_tick if self._last_tick is not None else None
+        self._last_tick = now
+        fits = np.fromiter((ind.fitness.values[0] for ind in population), dtype=np.float64, count=len(population))
+        best = population[int(fits.argmin())]
+        self.generations.append({"run": run_idx + 1, "gen": gen, "seconds": seconds, "nevals": None,
+                                 "evals_per_sec": None, "best": float(fits.min()), "mean": float(fits.mean()),
+                                 "diversity": population_diversity(population, best)})
+
+    def add_logbook(self, run_idx, logbook):
+        """เติมจำนวนการประเมินต่อรุ่นจาก logbook ของ evolve()"""
+        if not self.enabled: return
+        nevals = {rec['gen']: rec['nevals'] for rec in logbook}
+        for rec in self.generations:
+            if rec['run'] == run_idx + 1 and rec['gen'] in nevals:
+                rec['nevals'] = nevals[rec['gen']]
+                if rec['seconds']:
+                    rec['evals_per_sec'] = round(rec['nevals'] / rec['seconds'], 1)
+
+    def finish(self, status, penalty=None, breakdown=None):
+        self.status = status
+        self.penalty = penalty
+        self.breakdown = breakdown
+
+    def report(self):
+        if not self.enabled: return None
+        timed = [g for g in self.generations if g['seconds'] and g['nevals'] is not None]
+        evals = sum(g['nevals'] for g in timed)
+        seconds = sum(g['seconds'] for g in timed)
+        return {"mode": self.mode, "status": self.status, "started_at": self.started_at,
+                "penalty": self.penalty, "breakdown": self.breakdown,
+                "phases": {k: round(v, 4) for k, v in self.phases.items()},
+                "evals_per_sec": round(evals / seconds, 1) if seconds else None,
+                "generations": self.generations}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    if not labels: return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+class MetricsRegistry:
+    """metrics ของทุกการรันใน process นี้: ตัวนับสะสม + รายละเอียดของการรันล่าสุด"""
+
+    def __init__(self, max_runs=MAX_RECORDED_RUNS):
+        self.lock = threading.Lock()
+        self.runs = deque(maxlen=max_runs)
+        self.runs_total = {}       # (mode, status) -> จำนวนครั้ง
+        self.phase_seconds = {}    # phase -> เวลารวม
+        self.evaluations = 0
+        self.evaluation_seconds = 0.0
+
+    def record(self, metrics):
+        report = metrics.report()
+        if report is None: return
+        with self.lock:
+            key = (metrics.mode, metrics.status)
+            self.runs_total[key] = self.runs_total.get(key, 0) + 1
+            for name, seconds in metrics.phases.items():
+                self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+            for g in report['generations']:
+                if g['seconds'] and g['nevals'] is not None:
+                    self.evaluations += g['nevals']
+                    self.evaluation_seconds += g['seconds']
+            self.runs.append(report)
+
+    def recent(self):
+        with self.lock:
+            return list(self.runs)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self.lock:
+            last = self.runs[-1] if self.runs else None
+            lines = ["# HELP timetable_ga_runs_total Finished scheduler runs.",
+                     "# TYPE timetable_ga_runs_total counter"]
+            for (mode, status), n in sorted(self.runs_total.items(), key=lambda kv: tuple(map(str, kv[0]))):
+                lines.append(f"timetable_ga_runs_total{_labels(mode=mode, status=status)} {n}")
+            lines += ["# HELP timetable_ga_phase_seconds_total Time spent in each phase of the scheduler.",
+                      "# TYPE timetable_ga_phase_seconds_total counter"]
+            for name, seconds in sorted(self.phase_seconds.items()):
+                lines.append(f"timetable_ga_phase_seconds_total{_labels(phase=name)} {seconds:.6f}")
+            lines += ["# HELP timetable_ga_evaluations_total Fitness evaluations in timed generations.",
+                      "# TYPE timetable_ga_evaluations_total counter",
+                      f"timetable_ga_evaluations_total {self.evaluations}",
+                      "# HELP timetable_ga_generation_seconds_total Wall time of timed generations.",
+                      "# TYPE timetable_ga_generation_seconds_total counter",
+                      f"timetable_ga_generation_seconds_total {self.evaluation_seconds:.6f}"]
+            if last is not None:
+                mode = last['mode']
+                lines += ["# HELP timetable_ga_last_penalty Penalty of the last finished run.",
+                          "# TYPE timetable_ga_last_penalty gauge"]
+                if last['penalty'] is not None:
+                    lines.append(f"timetable_ga_last_penalty{_labels(mode=mode)} {last['penalty']}")
+                lines += ["# HELP timetable_ga_last_penalty_term Penalty of the last run per constraint.",
+                          "# TYPE timetable_ga_last_penalty_term gauge"]
+                for name in PENALTY_TERMS:
+                    if last['breakdown'] and name in last['breakdown']:
+                        lines.append(f"timetable_ga_last_penalty_term{_labels(mode=mode, constraint=name)} "
+                                     f"{last['breakdown'][name]}")
+                lines += ["# HELP timetable_ga_last_phase_seconds Time per phase of the last run.",
+                          "# TYPE timetable_ga_last_phase_seconds gauge"]
+                for name, seconds in last['phases'].items():
+                    lines.append(f"timetable_ga_last_phase_seconds{_labels(mode=mode, phase=name)} {seconds}")
+                if last['generations']:
+                    g = last['generations'][-1]
+                    lines += ["# HELP timetable_ga_last_generation Statistics of the last generation of the last run.",
+                              "# TYPE timetable_ga_last_generation gauge"]
+                    for stat in ('best', 'mean', 'diversity', 'evals_per_sec'):
+                        if g[stat] is not None:
+                            lines.append(f"timetable_ga_last_generation{_labels(mode=mode, stat=stat)} {g[stat]}")
+        return '\n'.join(lines) + '\n'
+
+metrics_registry = MetricsRegistry()
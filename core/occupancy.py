@@ -0,0 +1,75 @@
+from functools import lru_cache
+from core.rules import DAYS, SLOTS_PER_DAY, LUNCH_SLOT, LAST_END_SLOT
+
+# การจองช่องเวลาแบบ bitmask: บิตที่ k = ชั่วโมงที่ k ของสัปดาห์ (day * SLOTS_PER_DAY + slot)
+
+@lru_cache(maxsize=None)
+def feasible_starts(duration):
+    """จุดเริ่มที่ลงได้สำหรับวิชายาว duration ชั่วโมง -> (list ของ start, bitmask ของ start)
+
+    ข้อ 10: ห้ามทับพักเที่ยง, ข้อ 9: ต้องเลิกไม่เกิน 17.00
+    """
+    starts = []
+    for d in range(DAYS):
+        for s in range(SLOTS_PER_DAY - duration + 1):
+            if s <= LUNCH_SLOT < s + duration: continue
+            if s + duration > LAST_END_SLOT: continue
+            starts.append(d * SLOTS_PER_DAY + s)
+    mask = 0
+    for start in starts:
+        mask |= 1 << start
+    return tuple(starts), mask
+
+def span_mask(start, duration):
+    """bitmask ของชั่วโมง start .. start + duration - 1"""
+    return ((1 << duration) - 1) << start
+
+def blocked_starts(busy, duration):
+    """bitmask ของ start ที่ถ้าลงแล้วจะชนกับชั่วโมงใน busy"""
+    blocked = busy
+    for k in range(1, duration):
+        blocked |= busy >> k
+    return blocked
+
+class Occupancy:
+    """ชั่วโมงที่ถูกจองแล้วของแต่ละห้อง / ครู / กลุ่มนักเรียน (int bitmask ต่อ resource)"""
+
+    def __init__(self, n_rooms, n_teachers, n_groups):
+        self.room = [0] * n_rooms
+        self.teacher = [0] * n_teachers
+        self.group = [0] * n_groups
+
+    def block(self, table):
+        """ชั่วโมงที่จองไว้ให้ส่วนอื่นของตาราง (table.block(), ใช้กับ decompose) ถือว่าไม่ว่าง"""
+        if table.blocked_room_masks is None: return
+        for idx, mask in enumerate(table.blocked_room_masks):
+            self.room[idx] |= mask
+        for idx, mask in enumerate(table.blocked_teacher_masks):
+            self.teacher[idx] |= mask
+
+    def reserve(self, room_idx, teacher_idx, group_id, start, duration):
+        mask = span_mask(start, duration)
+        self.room[room_idx] |= mask
+        self.teacher[teacher_idx] |= mask
+        self.group[group_id] |= mask
+
+    def release(self, room_idx, teacher_idx, group_id, start, duration):
+        """คืนช่องที่ reserve ไว้ (ใช้ได้เมื่อช่องนั้นไม่มีวิชาอื่นจองซ้อนอยู่)"""
+        mask = ~span_mask(start, duration)
+        self.room[room_idx] &= mask
+        self.teacher[teacher_idx] &= mask
+        self.group[group_id] &= mask
+
+    def free_starts(self, teacher_idx, group_id, duration):
+        """bitmask ของ start ที่ครูและนักเรียนว่าง (ยังไม่รวมห้อง)"""
+        busy = self.teacher[teacher_idx] | self.group[group_id]
+        return feasible_starts(duration)[1] & ~blocked_starts(busy, duration)
+
+    def free_in_room(self, free, room_idx, duration):
+        """ตัด start ที่ห้องไม่ว่างออกจาก free (ผลของ free_starts)"""
+        return free & ~blocked_starts(self.room[room_idx], duration)
+
+    def is_free(self, room_idx, teacher_idx, group_id, start, duration):
+        """ลงที่ start ได้โดยไม่ชนห้อง ครู และนักเรียนหรือไม่"""
+        busy = self.room[room_idx] | self.teacher[teacher_idx] | self.group[group_id]
+        return not busy & span_mask(start, duration)
@@ -0,0 +1,98 @@
+import multiprocessing
+import random
+import numpy as np
+from deap import creator
+from core.fitness_engine import PopulationEvaluator, population_to_array
+
+# ขนาด chunk ขั้นต่ำต่อ task (เล็กกว่านี้ค่าส่งข้อมูลข้าม process ไม่คุ้ม)
+MIN_CHUNK_SIZE = 25
+
+# evaluator / table ประจำ worker (สร้างครั้งเดียวตอนเริ่ม pool)
+_worker_evaluator = None
+_worker_table = None
+
+def _init_worker(table, instructor_details_map, head_instructor_ids):
+    """รับข้อมูลปัญหาแบบ read-only ครั้งเดียวต่อ worker แทนการ pickle ไปกับทุก task"""
+    global _worker_evaluator, _worker_table
+    _worker_evaluator = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+    _worker_table = table
+
+def _evaluate_chunk(genomes):
+    return _worker_evaluator.evaluate_population(genomes.astype(np.int64))
+
+# จำนวน individual ต่อ chunk ตอนสร้างประชากร: คงที่ไม่ขึ้นกับจำนวน worker และ seed ของแต่ละ chunk
+# สุ่มจาก random ของ process หลัก ประชากรจึงเหมือนกันทุกตัวทั้งแบบ serial และแบบขนาน (seed เดียวกัน)
+POPULATION_CHUNK_SIZE = 25
+
+def population_tasks(n):
+    """แบ่ง n ตัวเป็น chunk ละ POPULATION_CHUNK_SIZE -> list ของ (จำนวน, seed)"""
+    return [(min(POPULATION_CHUNK_SIZE, n - k), random.randrange(2 ** 63))
+            for k in range(0, n, POPULATION_CHUNK_SIZE)]
+
+def build_chunk(table, n, seed):
+    """สร้าง individual n ตัวด้วย seed ของ chunk ส่งกลับเป็น array (คืนสถานะ random เดิมหลังสร้างเสร็จ)"""
+    from core.ai_scheduler import create_smart_individual  # import ตอนเรียก (กัน circular import)
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        return population_to_array([create_smart_individual(table) for _ in range(n)]).astype(genome_dtype(table))
+    finally:
+        random.setstate(state)
+
+def _build_chunk(task):
+    n, seed = task
+    return build_chunk(_worker_table, n, seed)
+
+def chunked_population(table, n):
+    """toolbox.population แบบ serial: สร้างทีละ chunk แบบเดียวกับ ParallelEvaluator.population (ผลเหมือนกัน)"""
+    dtype = genome_dtype(table)
+    return [make_individual(genome, dtype) for size, seed in population_tasks(n)
+            for genome in build_chunk(table, size, seed)]
+
+def genome_dtype(table):
+    """dtype ที่เล็กที่สุดที่เก็บ room / start slot / teacher index ได้"""
+    largest = max(table.n_rooms, len(table.instructor_ids), 64)
+    return np.int16 if largest < np.iinfo(np.int16).max else np.int32
+
+def make_individual(genes, dtype):
+    """gene ทั้งตัว (list หรือ array) -> creator.Individual: array (วิชา, 3) ของตัวเอง โดยมี fitness เป็น attribute"""
+    ind = np.array(genes, dtype=dtype).reshape(-1, 3).view(creator.Individual)
+    ind.fitness = creator.FitnessMin()
+    return ind
+
+class ParallelEvaluator:
+    """กระจายการประเมิน fitness ของทั้งรุ่นไปยัง process pool (ผลเหมือน PopulationEvaluator ทุกค่า)"""
+
+    def __init__(self, table, instructor_details_map, head_instructor_ids, workers):
+        self.workers = workers
+        self.dtype = genome_dtype(table)
+        self.pool = multiprocessing.get_context().Pool(
+            processes=workers, initializer=_init_worker,
+            initargs=(table, instructor_details_map, head_instructor_ids))
+
+    def evaluate_population(self, population):
+        if len(population) == 0:
+            return np.zeros(0, dtype=np.float64)
+        genomes = population_to_array(population).astype(self.dtype)
+        n_chunks = max(1, min(self.workers, len(genomes) // MIN_CHUNK_SIZE))
+        chunks = np.array_split(genomes, n_chunks)
+        return np.concatenate(self.pool.map(_evaluate_chunk, chunks))
+
+    def evaluate(self, individual):
+        return (float(self.evaluate_population([individual])[0]),)
+
+    def population(self, n):
+        """toolbox.population: สร้างประชากรเริ่มต้นแบบขนานใน pool เดียวกัน (chunk / seed เดียวกับ chunked_population)"""
+        return [make_individual(genome, self.dtype) for chunk in self.pool.map(_build_chunk, population_tasks(n))
+                for genome in chunk]
+
+    def map(self, func, individuals):
+        """toolbox.map: ประเมินทั้งรุ่นแบบขนาน, งานอื่นทำแบบปกติ"""
+        if getattr(func, 'func', func) == self.evaluate:
+            individuals = list(individuals)
+            return [(p,) for p in self.evaluate_population(individuals).tolist()]
+        return list(map(func, individuals))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
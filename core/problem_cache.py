@@ -0,0 +1,106 @@
+import hashlib
+import json
+import threading
+import time
+from config import Config
+from core.database import supabase, fetch_all
+from core.rules import is_head_instructor
+from core.course_table import build_allowed_teachers_map, compile_course_table
+
+def fingerprint_rows(*tables):
+    """fingerprint ของข้อมูลทั้งชุด (ไม่ขึ้นกับลำดับ key ใน dict)"""
+    digest = hashlib.sha256()
+    for rows in tables:
+        digest.update(json.dumps(rows, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+class ProblemSnapshot:
+    """ข้อมูลปัญหาที่โหลดและคอมไพล์แล้ว: แถวดิบ + map ที่สร้างจากแถว + CourseTable"""
+
+    def __init__(self, courses, rooms, instructors, fingerprint):
+        self.courses = courses
+        self.rooms = rooms
+        self.instructors = instructors
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+
+        self.room_ids = [r['room_code'] for r in rooms]
+        self.instructor_ids = [i['id'] for i in instructors]
+        self.instructor_details_map = {i['id']: i for i in instructors}
+        self.head_instructor_ids = {i['id'] for i in instructors if is_head_instructor(i)}
+        self.allowed_teachers_map = build_allowed_teachers_map(courses, instructors)
+        self.table = compile_course_table(courses, self.room_ids, self.instructor_ids, self.allowed_teachers_map)
+
+    def problem(self):
+        """(table, instructor_details_map, head_instructor_ids) สำหรับการรัน 1 ครั้ง
+
+        table เป็นสำเนา (pin() ของ warm start จะไม่ไปแก้ snapshot ที่ใช้ร่วมกัน)
+        """
+        return self.table.copy(), self.instructor_details_map, self.head_instructor_ids
+
+class ProblemCache:
+    """cache ระดับ process ของ ProblemSnapshot (1 ชุดต่อ client)
+
+    หมดอายุเมื่อ invalidate() (POST ใน ns_data) หรือครบ ttl วินาที
+    ถ้าโหลดใหม่แล้ว fingerprint เท่าเดิมจะใช้ snapshot เดิมต่อ ไม่ต้องคอมไพล์ซ้ำ
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.PROBLEM_CACHE_TTL if ttl is None else ttl
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.client = None
+        self.expires_at = 0.0
+        self.hits = 0
+        self.loads = 0
+
+    def _load(self, client):
+        # ดึงทีละหน้า กันผลถูกตัดที่ 1000 แถว
+        courses = fetch_all('curriculums', "*, subjects(*)", client=client)
+        rooms = fetch_all('classrooms', client=client)
+        instructors = fetch_all('instructors', client=client)
+        if not courses or not rooms or not instructors:
+            return None
+
+        fp = fingerprint_rows(courses, rooms, instructors)
+        if self.snapshot is not None and self.client is client and self.snapshot.fingerprint == fp:
+            self.snapshot.loaded_at = time.time()
+            return self.snapshot
+        return ProblemSnapshot(courses, rooms, instructors, fp)
+
+    def get(self, client=None, refresh=False):
+        """snapshot ปัจจุบัน (โหลดใหม่ถ้าหมดอายุ / เปลี่ยน client / refresh=True) -> None ถ้าข้อมูลไม่ครบ"""
+        client = client or supabase
+        with self.lock:
+            fresh = self.snapshot is not None and self.client is client and time.monotonic() < self.expires_at
+            if fresh and not refresh:
+                self.hits += 1
+                return self.snapshot
+
+            snapshot = self._load(client)
+            self.loads += 1
+            if snapshot is None:
+                self.snapshot, self.client = None, None
+                return None
+            self.snapshot, self.client = snapshot, client
+            self.expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+            return snapshot
+
+    def invalidate(self):
+        with self.lock:
+            self.expires_at = 0.0
+
+    def report(self):
+        snapshot = self.snapshot
+        return {"fingerprint": snapshot.fingerprint if snapshot else None,
+                "loaded_at": snapshot.loaded_at if snapshot else None,
+                "hits": self.hits, "loads": self.loads, "ttl_seconds": self.ttl}
+
+problem_cache = ProblemCache()
+
+def get_problem_snapshot(client=None, refresh=False):
+    return problem_cache.get(client, refresh)
+
+def invalidate_problem_cache():
+    """เรียกหลังแก้ข้อมูลที่ใช้จัดตาราง (วิชา / ห้อง / ครู)"""
+    problem_cache.invalidate()
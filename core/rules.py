@@ -0,0 +1,86 @@
+# --- กฎและค่าคงที่ของตารางเรียน (ใช้ร่วมกันทุกโมดูลของ Scheduler) ---
+
+DAYS = 5
+SLOTS_PER_DAY = 10  # 08:00 - 17:00 (รวมพักเที่ยง)
+LUNCH_SLOT = 4      # Slot 4 = 12:00 - 13:00
+LAST_END_SLOT = 9   # ข้อ 9: ต้องเลิกไม่เกิน 17.00
+SCOUT_SLOT = 27     # ข้อ 7: พุธ 15.00-17.00 (Day 2, Slot 7)
+DAY_START_HOUR = 8  # Slot 0 เริ่ม 08:00 (slot ละ 1 ชั่วโมง)
+DAY_NAMES = ['จันทร์', 'อังคาร', 'พุธ', 'พฤหัสบดี', 'ศุกร์']
+
+COMP_ROOM_CODES = ['LB101', 'LB102']
+THEORY_ROOM_CODES = ['TH201', 'TH202']
+STADIUM_KEYWORDS = ['สนาม', 'stadium', 'field', 'sport', 'foot', 'ball']
+SCOUT_ROOM_KEYWORDS = ['สนาม', 'stadium', 'field']
+
+# น้ำหนักโทษ (ต้องตรงกับ evaluate ทุกตัว)
+HARD_PENALTY = 1_000_000
+SCOUT_ROOM_PENALTY = 500_000
+ADVISOR_PENALTY = 200_000
+LATE_PENALTY = 100_000
+METHA_PENALTY = 50_000
+HEAD_LOAD_PENALTY = 50_000
+MIN_LOAD_PENALTY = 20_000
+COMP_DAYS_PENALTY = 10_000
+SD_PENALTY = 5000
+
+def get_course_metadata(course):
+    """วิเคราะห์ข้อมูลวิชา เพื่อระบุเงื่อนไขพิเศษ"""
+    subj = course.get('subjects', {}) or {}
+    if isinstance(subj, list): subj = subj[0]
+
+    t_hrs = int(subj.get('theory_hours') or 0)
+    p_hrs = int(subj.get('practice_hours') or 0)
+    total_hours = t_hrs + p_hrs
+    duration = total_hours if total_hours > 0 else 1
+
+    subj_name = str(subj.get('subject_name', '')).strip()
+
+    # 1. เงื่อนไขข้อ 7: วิชาลูกเสือ
+    is_scout = 'ลูกเสือ' in subj_name or 'scout' in subj_name.lower()
+
+    # 2. เงื่อนไขข้อ 16: วิชาคอมพิวเตอร์ (บังคับห้อง LB)
+    comp_targets = [
+        "การเขียนโปรแกรมคอมพิวเตอร์",
+        "การพัฒนาโปรแกรมบนอุปกรณ์พกพา",
+        "ไมโครคอนโทรลเลอร์",
+        "วงจรพัลส์และดิจิทัล",
+        "อุปกรณ์อิเล็กทรอนิกส์และวงจร",
+        "การใช้โปรแกรมคอมพิวเตอร์กราฟิก"
+    ]
+    is_computer_subj = any(target in subj_name for target in comp_targets)
+
+    # 3. วิชาทฤษฎีบังคับ (บังคับห้อง TH) - เพิ่มเติมเพื่อความเป็นระเบียบ
+    theory_targets = [
+        "ภาษาไทย", "ภาษาอังกฤษ", "วิทยาศาสตร์", "คณิตศาสตร์คอมพิวเตอร์"
+    ]
+    is_theory_subj = any(target in subj_name for target in theory_targets)
+
+    # เงื่อนไขข้อ 17: ครูที่ปรึกษา (ถ้าใน DB มีข้อมูล advisor_id ให้ return ค่ามาใช้)
+    advisor_id = course.get('advisor_id')
+
+    return duration, is_scout, is_computer_subj, is_theory_subj, advisor_id
+
+def get_group_id(course):
+    """Group ID สำหรับเช็คนักเรียนชนกัน (ข้อ 3)"""
+    dept = course.get('department')
+    yr = course.get('year_level')
+    grp = course.get('group_no', '1')
+    return f"{dept}_{yr}_{grp}"
+
+def find_stadium_index(room_ids):
+    """ค้นหาห้องที่เป็นสนาม (สำหรับลูกเสือ)"""
+    for idx, r_code in enumerate(room_ids):
+        code_lower = r_code.lower()
+        if any(x in code_lower for x in STADIUM_KEYWORDS):
+            return idx
+    return len(room_ids) - 1 # Fallback ไปห้องสุดท้ายถ้าหาไม่เจอ
+
+def is_head_instructor(ins):
+    """หัวหน้าแผนก (ข้อ 1)"""
+    pos = str(ins.get('position_role', '')).lower()
+    return 'head' in pos or 'หัวหน้า' in pos
+
+def is_computer_department(dept):
+    """ครูแผนกคอม (ข้อ 12)"""
+    return 'คอม' in str(dept) or 'computer' in str(dept).lower()
@@ -0,0 +1,305 @@
+import threading
+import time
+import numpy as np
+from config import Config
+from core.database import supabase
+from core.rules import DAYS, SLOTS_PER_DAY, HARD_PENALTY
+from core.fitness_engine import PopulationEvaluator
+from core.delta_eval import DeltaEvaluator
+from core.problem_cache import get_problem_snapshot
+from core.schedule_store import (
+    get_active_version, load_active_rows, row_key, save_schedule_edit, save_schedule_version,
+)
+from core.warm_start import rebuild_individual, gene_records
+
+# แก้ตารางเรียนด้วยมือ: ตรวจ move / swap ทีละไม่กี่วิชาจาก index ในหน่วยความจำของตารางที่ active
+#   occupancy : (ชั่วโมง, ห้อง) / (ชั่วโมง, ครู) / (ชั่วโมง, กลุ่ม) -> วิชาที่ใช้ช่องนั้น (ไว้บอกว่าชนกับวิชาไหน)
+#   penalty   : DeltaEvaluator (กฎชุดเดียวกับ evaluate) คิดเฉพาะวิชาที่ขยับ
+
+class EditError(ValueError):
+    """move ที่ส่งมาไม่ถูกต้อง (อ้างวิชา / ห้อง / ครูที่ไม่มี)"""
+
+class ScheduleEditor:
+    """ตารางเรียนที่ active ในรูป gene + occupancy index สำหรับตรวจ/บันทึกการแก้ไขแบบ incremental"""
+
+    def __init__(self, snapshot, rows, version_id):
+        table = snapshot.table
+        self.table = table
+        self.version_id = version_id
+        self.fingerprint = snapshot.fingerprint
+        self.built_at = time.time()
+
+        genes = rebuild_individual(rows, table)
+        missing = sum(g is None for g in genes)
+        if missing:
+            raise EditError(f"{missing} courses are not in the current schedule, generate a new schedule first")
+        self.genes = np.array(genes, dtype=np.int64).reshape(-1, 3)
+
+        self.scorer = PopulationEvaluator(table, snapshot.instructor_details_map, snapshot.head_instructor_ids)
+        self.delta = DeltaEvaluator(self.scorer)
+        self.state = self.delta.build(self.genes)
+
+        self.room_index = {code: idx for idx, code in enumerate(table.room_ids)}
+        self.teacher_index = {}
+        for idx, tid in enumerate(table.instructor_ids):
+            self.teacher_index.setdefault(int(tid), idx)
+        self.courses_by_key = {}
+        for i in range(table.n_courses):
+            key = (str(table.subject_codes[i]), str(table.departments[i]), str(table.year_levels[i]))
+            self.courses_by_key.setdefault(key, []).append(i)
+
+        # --- occupancy index ---
+        self.room_at, self.teacher_at, self.group_at = {}, {}, {}
+        for i in range(table.n_courses):
+            self._occupy(i, self.genes[i], add=True)
+
+        # --- id ของแถวใน generated_schedules ของแต่ละวิชา (ไว้ปิดแถวเดิมตอนบันทึก) ---
+        # แถวก่อน migrations/002 ไม่มี group_no -> ลองจับคู่แบบไม่มีกลุ่มถ้าไม่เจอ
+        ids_by_key = {}
+        for row in rows:
+            ids_by_key.setdefault(row_key(row), []).append(row['id'])
+        self.row_ids = []
+        for i in range(table.n_courses):
+            ids = []
+            for record in gene_records(table, i, self.genes[i].tolist()):
+                found = ids_by_key.get(row_key(record)) or ids_by_key.get(row_key(dict(record, group_no=None)))
+                if found: ids.append(found.pop())
+            self.row_ids.append(ids)
+        # แถวที่ถูกปิดไปแล้ว (หลัง rollback) จะหายจากเวอร์ชันใหม่ -> ต้องบันทึกแบบเทียบทั้งตาราง
+        self.has_closed_rows = any(row.get('valid_to') is not None for row in rows)
+
+    # --- occupancy ---
+    def _cells(self, i, gene):
+        room, start, teacher = (int(x) for x in gene)
+        tkey = int(self.scorer.teacher_key[teacher])
+        group = int(self.table.group[i])
+        for slot in range(start, start + int(self.table.duration[i])):
+            yield (self.room_at, (slot, room)), (self.teacher_at, (slot, tkey)), (self.group_at, (slot, group))
+
+    def _occupy(self, i, gene, add):
+        for cells in self._cells(i, gene):
+            for index, key in cells:
+                courses = index.setdefault(key, set())
+                if add:
+                    courses.add(i)
+                else:
+                    courses.discard(i)
+                    if not courses: del index[key]
+
+    def conflicts(self, i):
+        """วิชาอื่นที่ใช้ห้อง / ครู / กลุ่มเดียวกับวิชา i ในชั่วโมงเดียวกัน"""
+        found = []
+        for cells in self._cells(i, self.genes[i]):
+            for kind, (index, key) in zip(('room', 'instructor', 'group'), cells):
+                others = sorted(index.get(key, set()) - {i})
+                if others:
+                    day, slot = divmod(key[0], SLOTS_PER_DAY)
+                    found.append({"type": kind, "course": i, "with": others, "day_of_week": day, "start_slot": slot})
+        return found
+
+    # --- อ่าน request ---
+    def resolve(self, ref):
+        """วิชาที่อ้างถึง: {"course": index} หรือ {subject_code, department, year_level[, group_no, day_of_week, start_slot]}"""
+        if not isinstance(ref, dict):
+            raise EditError("course reference must be an object")
+        if ref.get('course') is not None:
+            i = int(ref['course'])
+            if not 0 <= i < self.table.n_courses:
+                raise EditError(f"course {i} does not exist")
+            return i
+        key = (str(ref.get('subject_code')), str(ref.get('department')), str(ref.get('year_level')))
+        candidates = self.courses_by_key.get(key, [])
+        if ref.get('group_no') is not None:
+            candidates = [i for i in candidates if self.table.group_nos[i] == str(ref['group_no'])]
+        if ref.get('day_of_week') is not None and ref.get('start_slot') is not None:
+            slot = int(ref['day_of_week']) * SLOTS_PER_DAY + int(ref['start_slot'])
+            candidates = [i for i in candidates
+                          if self.genes[i, 1] <= slot < self.genes[i, 1] + self.table.duration[i]]
+        if not candidates:
+            raise EditError(f"no course matches {ref}")
+        if len(candidates) > 1:
+            raise EditError(f"{len(candidates)} courses match {ref}, add group_no, day_of_week/start_slot or use 'course'")
+        return candidates[0]
+
+    def parse(self, body):
+        """body -> {course: gene ใหม่}
+
+        {"moves": [{<อ้างวิชา>, "room_code"?, "day_of_week"?, "start_slot"?, "instructor_id"?}],
+         "swaps": [[<อ้างวิชา>, <อ้างวิชา>]]}   swap = สลับห้องและเวลากัน (ครูคงเดิม)
+        ใน move วัน/คาบคือตำแหน่งใหม่ ไม่ใช้หาวิชา (วิชาที่ซ้ำกันให้อ้างด้วย group_no หรือ course)
+        """
+        changes = {}
+        for move in body.get('moves') or []:
+            i = self.resolve({k: v for k, v in move.items() if k not in ('day_of_week', 'start_slot')})
+            room, start, teacher = (int(x) for x in changes.get(i, self.genes[i]))
+            day, slot = divmod(start, SLOTS_PER_DAY)
+            if move.get('room_code') is not None:
+                if move['room_code'] not in self.room_index:
+                    raise EditError(f"unknown room_code '{move['room_code']}'")
+                room = self.room_index[move['room_code']]
+            if move.get('day_of_week') is not None:
+                day = int(move['day_of_week'])
+            if move.get('start_slot') is not None:
+                slot = int(move['start_slot'])
+            if not (0 <= day < DAYS and 0 <= slot < SLOTS_PER_DAY):
+                raise EditError(f"day_of_week must be 0-{DAYS - 1} and start_slot 0-{SLOTS_PER_DAY - 1}")
+            if move.get('instructor_id') is not None:
+                if int(move['instructor_id']) not in self.teacher_index:
+                    raise EditError(f"unknown instructor_id {move['instructor_id']}")
+                teacher = self.teacher_index[int(move['instructor_id'])]
+            changes[i] = [room, day * SLOTS_PER_DAY + slot, teacher]
+
+        for pair in body.get('swaps') or []:
+            if not isinstance(pair, list) or len(pair) != 2:
+                raise EditError("swap must be a list of 2 course references")
+            a, b = self.resolve(pair[0]), self.resolve(pair[1])
+            gene_a = [int(x) for x in changes.get(a, self.genes[a])]
+            gene_b = [int(x) for x in changes.get(b, self.genes[b])]
+            changes[a] = [gene_b[0], gene_b[1], gene_a[2]]
+            changes[b] = [gene_a[0], gene_a[1], gene_b[2]]
+
+        if not changes:
+            raise EditError("nothing to change: send 'moves' and/or 'swaps'")
+        return changes
+
+    def describe(self, i, gene=None):
+        room, start, teacher = (int(x) for x in (self.genes[i] if gene is None else gene))
+        day, slot = divmod(start, SLOTS_PER_DAY)
+        return {"course": i, "subject_code": self.table.subject_codes[i], "department": self.table.departments[i],
+                "year_level": self.table.year_levels[i], "group_no": self.table.group_nos[i],
+                "group": self.table.group_keys[self.table.group[i]],
+                "duration": int(self.table.duration[i]), "room_code": self.table.room_ids[room],
+                "instructor_id": int(self.table.instructor_ids[teacher]), "day_of_week": day, "start_slot": slot}
+
+    # --- ตรวจ / บันทึก ---
+    def _swap_genes(self, idx, genes):
+        for i in idx.tolist():
+            self._occupy(i, self.genes[i], add=False)
+        self.genes[idx] = genes
+        for i in idx.tolist():
+            self._occupy(i, self.genes[i], add=True)
+        self.delta.apply(self.state, self.genes, idx)
+
+    def check(self, changes):
+        """ลองขยับตาม changes แล้วคืนสถานะเดิม -> ผลตรวจ (ต้องถือ lock ของ editor)"""
+        idx = np.array(sorted(changes), dtype=np.int64)
+        old = self.genes[idx].copy()
+        before = self.state.penalty()
+        self._swap_genes(idx, np.array([changes[i] for i in idx.tolist()], dtype=np.int64))
+        try:
+            return self._report(idx, old, before)
+        finally:
+            self._swap_genes(idx, old)
+
+    def _report(self, idx, old, before):
+        after = self.state.penalty()
+        courses = idx.tolist()
+        conflicts = [c for i in courses for c in self.conflicts(i)]
+
+        terms = self.scorer.gene_penalty_terms(self.genes[idx, 0], self.genes[idx, 1], self.genes[idx, 2], idx)
+        violations = [{"course": i, "rule": rule, "penalty": int(values[k])}
+                      for rule, values in terms.items() for k, i in enumerate(courses) if values[k]]
+        warnings = []
+        for k, i in enumerate(courses):
+            room, _, teacher = (int(x) for x in self.genes[i])
+            if not self.table.room_mask[i, room]:
+                warnings.append({"course": i, "warning": "room type does not match subject"})
+            if teacher not in self.table.teacher_options[i]:
+                warnings.append({"course": i, "warning": "instructor is not listed for this subject"})
+
+        hard = any(v['penalty'] >= HARD_PENALTY for v in violations)
+        return {"version": self.version_id, "valid": not conflicts and not hard,
+                "penalty_before": float(before), "penalty_after": float(after), "penalty_delta": float(after - before),
+                "changes": [{"from": self.describe(i, old[k]), "to": self.describe(i)} for k, i in enumerate(courses)],
+                "conflicts": conflicts, "violations": violations, "warnings": warnings}
+
+    def apply(self, changes, client, force=False):
+        """บันทึกการแก้ไข (ถ้าไม่ valid จะไม่บันทึก เว้นแต่ force=True) -> (ผลตรวจ, ข้อมูลเวอร์ชันหรือ None)"""
+        idx = np.array(sorted(changes), dtype=np.int64)
+        old = self.genes[idx].copy()
+        before = self.state.penalty()
+        self._swap_genes(idx, np.array([changes[i] for i in idx.tolist()], dtype=np.int64))
+        result = self._report(idx, old, before)
+        if not result['valid'] and not force:
+            self._swap_genes(idx, old)
+            return result, None
+
+        try:
+            if self.has_closed_rows:
+                # ตารางนี้มาจากการ rollback: บันทึกแบบเทียบทั้งตาราง แล้วให้ cache สร้าง editor ใหม่
+                records = [r for i in range(self.table.n_courses) for r in gene_records(self.table, i, self.genes[i].tolist())]
+                saved = save_schedule_version(records, client, penalty=result['penalty_after'], mode='manual')
+                self.version_id = None
+                return result, saved
+
+            removed = [row_id for i in idx.tolist() for row_id in self.row_ids[i]]
+            added = {i: gene_records(self.table, i, self.genes[i].tolist()) for i in idx.tolist()}
+            rows_total = sum(len(ids) for ids in self.row_ids) - len(removed) + sum(len(r) for r in added.values())
+            saved, inserted = save_schedule_edit(self.version_id, removed, [r for i in idx.tolist() for r in added[i]],
+                                                 rows_total, client, penalty=result['penalty_after'])
+        except Exception:
+            self._swap_genes(idx, old)
+            raise
+
+        # แถวที่ insert เรียงตามวิชาใน idx
+        pos = 0
+        for i in idx.tolist():
+            self.row_ids[i] = [row['id'] for row in inserted[pos:pos + len(added[i])]]
+            pos += len(added[i])
+        self.version_id = saved['version_id']
+        result['version'] = self.version_id
+        return result, saved
+
+    def summary(self):
+        return {"version": self.version_id, "penalty": float(self.state.penalty()),
+                "built_at": self.built_at, "courses": [self.describe(i) for i in range(self.table.n_courses)]}
+
+class ScheduleEditorCache:
+    """ScheduleEditor ของตารางที่ active (1 ตัวต่อ process) สร้างใหม่เมื่อเวอร์ชันหรือข้อมูลปัญหาเปลี่ยน
+
+    ตารางที่ยังไม่มีเวอร์ชัน (ยังไม่ได้ migrate) ดูการเปลี่ยนแปลงไม่ได้ จึงสร้างใหม่ทุก SCHEDULE_INDEX_TTL วินาที
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.SCHEDULE_INDEX_TTL if ttl is None else ttl
+        self.lock = threading.Lock()
+        self.editor = None
+        self.client = None
+        self.expires_at = 0.0
+
+    def _current(self, client):
+        snapshot = get_problem_snapshot(client)
+        if snapshot is None:
+            raise EditError("Incomplete Data")
+        active = get_active_version(client)
+        editor = self.editor
+        if (editor is not None and self.client is client and editor.fingerprint == snapshot.fingerprint
+                and editor.version_id == active and (active is not None or time.monotonic() < self.expires_at)):
+            return editor
+        self.editor = ScheduleEditor(snapshot, load_active_rows(client), active)
+        self.client = client
+        self.expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        return self.editor
+
+    def run(self, func, client=None):
+        """เรียก func(editor) ภายใต้ lock (ตรวจ/บันทึกทีละคำขอ)"""
+        client = client or supabase
+        with self.lock:
+            return func(self._current(client))
+
+    def invalidate(self):
+        with self.lock:
+            self.editor = None
+
+schedule_editor_cache = ScheduleEditorCache()
+
+def validate_edit(body, client=None):
+    return schedule_editor_cache.run(lambda editor: editor.check(editor.parse(body)), client)
+
+def apply_edit(body, client=None, force=False):
+    """-> (ผลตรวจ, ข้อมูลเวอร์ชันหรือ None ถ้าไม่ได้บันทึก)"""
+    client = client or supabase
+    return schedule_editor_cache.run(lambda editor: editor.apply(editor.parse(body), client, force), client)
+
+def editor_summary(client=None):
+    return schedule_editor_cache.run(lambda editor: editor.summary(), client)
@@ -0,0 +1,182 @@
+import csv
+import hashlib
+import io
+import json
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from core.rules import LUNCH_SLOT, DAY_START_HOUR, DAY_NAMES
+
+# ส่งออกตารางเรียนแบบ stream (generator ของ string) จากแถวของ ScheduleIndex โดยไม่สำเนาหรือเก็บทั้งตารางไว้
+
+CHUNK_ROWS = 200           # จำนวน session ต่อ chunk ที่ส่งออก
+ICS_TZID = 'Asia/Bangkok'
+
+# key ของ session: แถวที่ key เหมือนกันและคาบต่อกันในวันเดียวกัน = คาบเรียนเดียวกัน
+SESSION_FIELDS = ("subject_code", "subject_name", "room_code", "instructor_id", "department", "year_level")
+
+GROUP_BY = {
+    'group': ("department", "year_level"),
+    'instructor': ("instructor_id",),
+    'room': ("room_code",),
+}
+
+CSV_COLUMNS = ["day_of_week", "day_name", "start_slot", "end_slot", "start_time", "end_time", "hours",
+               "subject_code", "subject_name", "instructor_id", "instructor_name", "room_code",
+               "department", "year_level"]
+
+def slot_time(slot):
+    """slot ในวัน -> เวลา 'HH:MM' (ใช้กับ end_slot ได้ = เวลาเลิก)"""
+    return f"{DAY_START_HOUR + slot:02d}:00"
+
+def _next_slot(slot):
+    """slot ถัดไปที่ต่อกันได้ (ข้ามพักเที่ยงที่ไม่ได้บันทึกไว้ เหมือนตอน save_to_db)"""
+    return slot + 2 if slot + 1 == LUNCH_SLOT else slot + 1
+
+def _session_closed(session, day, slot):
+    """คาบนี้ต่อกับแถวที่ (day, slot) หรือแถวหลังจากนั้นไม่ได้แล้ว (แถวเรียงตามวัน, คาบ)"""
+    return session['day_of_week'] < day or _next_slot(session['end_slot'] - 1) < slot
+
+def _finish_session(session):
+    session['day_name'] = DAY_NAMES[session['day_of_week']] if 0 <= session['day_of_week'] < len(DAY_NAMES) else None
+    session['start_time'] = slot_time(session['start_slot'])
+    session['end_time'] = slot_time(session['end_slot'])
+    return session
+
+def merge_sessions(rows):
+    """รวมแถวรายชั่วโมงที่ต่อกันเป็นคาบเรียน -> generator ของ dict ต่อคาบ (เรียงตาม วัน, เวลาเริ่ม)
+
+    rows ต้องเรียงตาม (day_of_week, start_slot) อยู่แล้ว (เช่น ScheduleIndex.iter_rows) คาบจะถูกส่งออกทันทีที่ต่อไม่ได้แล้ว
+    จึงเก็บไว้เฉพาะคาบที่ยังเปิดอยู่ ไม่ต้องสร้าง list ของทั้งตาราง
+    """
+    open_sessions = {}   # (key, day) -> session ที่ยังต่อได้
+    pending = deque()    # (key, session) ตามลำดับที่เริ่ม = ลำดับที่ส่งออก
+    for row in rows:
+        day, slot = int(row['day_of_week']), int(row['start_slot'])
+        while pending and _session_closed(pending[0][1], day, slot):
+            key, session = pending.popleft()
+            if open_sessions.get(key) is session: del open_sessions[key]
+            yield _finish_session(session)
+
+        key = (tuple(row.get(f) for f in SESSION_FIELDS), day)
+        session = open_sessions.get(key)
+        if session is not None and _next_slot(session['end_slot'] - 1) == slot:
+            session['end_slot'] = slot + 1
+            session['hours'] += 1
+            continue
+        session = {f: row.get(f) for f in SESSION_FIELDS}
+        session.update(day_of_week=day, start_slot=slot, end_slot=slot + 1, hours=1)
+        open_sessions[key] = session
+        pending.append((key, session))
+
+    for _, session in pending:
+        yield _finish_session(session)
+
+def instructor_name(index, instructor_id):
+    ins = index.instructor_by_id.get(str(instructor_id))
+    if not ins: return None
+    return f"{ins.get('first_name', '')} {ins.get('last_name', '')}".strip()
+
+# --- CSV ---
+def export_csv(index, sessions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM ให้ Excel อ่านภาษาไทยถูก
+    writer.writerow(CSV_COLUMNS)
+    for k, s in enumerate(sessions, start=1):
+        row = dict(s, instructor_name=instructor_name(index, s['instructor_id']))
+        writer.writerow([row.get(c) for c in CSV_COLUMNS])
+        if k % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# --- iCalendar ---
+def _ics_escape(text):
+    return str(text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def _ics_fold(line):
+    """บรรทัดยาวเกิน 75 byte ต้องตัดแล้วขึ้นบรรทัดใหม่ด้วยช่องว่าง (RFC 5545)"""
+    raw = line.encode('utf-8')
+    if len(raw) <= 75:
+        return line + '\r\n'
+    parts, current = [], b''
+    for ch in line:
+        b = ch.encode('utf-8')
+        if len(current) + len(b) > (75 if not parts else 74):
+            parts.append(current.decode('utf-8'))
+            current = b''
+        current += b
+    parts.append(current.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+def week_start(value=None):
+    """วันจันทร์ของสัปดาห์แรก (value = 'YYYY-MM-DD', ไม่ส่ง = สัปดาห์นี้)"""
+    day = date.fromisoformat(value) if value else date.today()
+    return day - timedelta(days=day.weekday())
+
+def export_ics(index, sessions, start=None, weeks=None, name='ตารางเรียน'):
+    """ปฏิทินแบบ event ซ้ำทุกสัปดาห์ เริ่มสัปดาห์ของ start (weeks = จำนวนสัปดาห์, ไม่ส่ง = ไม่สิ้นสุด)"""
+    monday = week_start(start)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//auto-timetable//schedule export//TH",
+              "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_ics_escape(name)}", f"X-WR-TIMEZONE:{ICS_TZID}",
+              "BEGIN:VTIMEZONE", f"TZID:{ICS_TZID}", "BEGIN:STANDARD", "DTSTART:19700101T000000",
+              "TZOFFSETFROM:+0700", "TZOFFSETTO:+0700", "TZNAME:ICT", "END:STANDARD", "END:VTIMEZONE"]
+    yield ''.join(_ics_fold(line) for line in header)
+
+    chunk = []
+    for k, s in enumerate(sessions, start=1):
+        day = monday + timedelta(days=s['day_of_week'])
+        begin = datetime(day.year, day.month, day.day, DAY_START_HOUR + s['start_slot'])
+        end = datetime(day.year, day.month, day.day) + timedelta(hours=DAY_START_HOUR + s['end_slot'])
+        uid_src = json.dumps([s[f] for f in SESSION_FIELDS] + [s['day_of_week'], s['start_slot']],
+                             default=str, ensure_ascii=False)
+        uid = hashlib.sha1(uid_src.encode('utf-8')).hexdigest()
+        teacher = instructor_name(index, s['instructor_id']) or s['instructor_id']
+        summary = f"{s['subject_code']} {s['subject_name'] or ''}".strip()
+        description = f"ครู: {teacher} / {s['department']} ปี {s['year_level']}"
+        rule = "RRULE:FREQ=WEEKLY" + (f";COUNT={int(weeks)}" if weeks else "")
+        lines = ["BEGIN:VEVENT", f"UID:{uid}@auto-timetable", f"DTSTAMP:{stamp}",
+                 f"DTSTART;TZID={ICS_TZID}:{begin:%Y%m%dT%H%M%S}", f"DTEND;TZID={ICS_TZID}:{end:%Y%m%dT%H%M%S}",
+                 rule, f"SUMMARY:{_ics_escape(summary)}", f"LOCATION:{_ics_escape(s['room_code'])}",
+                 f"DESCRIPTION:{_ics_escape(description)}", "END:VEVENT"]
+        chunk.append(''.join(_ics_fold(line) for line in lines))
+        if k % CHUNK_ROWS == 0:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(_ics_fold("END:VCALENDAR"))
+    yield ''.join(chunk)
+
+# --- JSON แยกตาม กลุ่มนักเรียน / ครู / ห้อง ---
+# lookup ของ ScheduleIndex ที่ใช้แบ่งกลุ่ม (position เรียงตาม วัน, คาบ อยู่แล้ว)
+GROUP_LOOKUPS = {'group': 'by_dept_year', 'instructor': 'by_instructor', 'room': 'by_room'}
+
+def export_grouped_json(index, positions, group_by):
+    """positions = ผลจาก ScheduleIndex.select (None = ทุกแถว) ส่งออกทีละกลุ่มเมื่อรวมคาบของกลุ่มนั้นเสร็จ"""
+    fields = GROUP_BY[group_by]
+    lookup = getattr(index, GROUP_LOOKUPS[group_by])
+    selected = None if positions is None else set(positions)
+
+    yield json.dumps({"group_by": group_by, "version": index.version}, ensure_ascii=False)[:-1] + ', "groups": ['
+    k = 0
+    for key in sorted(lookup, key=lambda key: [str(v) for v in (key if isinstance(key, tuple) else (key,))]):
+        group_positions = lookup[key] if selected is None else [p for p in lookup[key] if p in selected]
+        if not group_positions: continue
+        first = index.rows[group_positions[0]]
+        group = {f: first.get(f) for f in fields}
+        if group_by == 'instructor':
+            group['instructor_name'] = instructor_name(index, group['instructor_id'])
+        sessions = [{f: v for f, v in s.items() if f not in fields}
+                    for s in merge_sessions(index.iter_rows(group_positions))]
+        group['hours'] = sum(s['hours'] for s in sessions)
+        group['sessions'] = sessions
+        yield (',' if k else '') + json.dumps(group, ensure_ascii=False, default=str)
+        k += 1
+    yield ']}'
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ics': 'text/calendar; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
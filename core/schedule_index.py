@@ -0,0 +1,264 @@
+import hashlib
+import json
+import threading
+import time
+from config import Config
+from core.database import supabase, fetch_all
+from core.schedule_store import load_active_rows
+
+def _key(value):
+    """ค่าที่ใช้เทียบแบบ eq (Supabase เทียบเป็น string เช่น year_level '1' กับ 1)"""
+    return None if value is None else str(value)
+
+class TextIndex:
+    """index สำหรับค้นหาแบบ ilike '%x%': เก็บค่าที่ไม่ซ้ำ (lowercase) -> รายการ key
+
+    ค่าที่ไม่ซ้ำมีน้อยกว่าจำนวนแถวมาก การไล่หา substring จึงทำกับค่าเหล่านี้แทนทุกแถว
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def add(self, value, key):
+        if value is None: return
+        self.values.setdefault(str(value).lower(), []).append(key)
+
+    def search(self, text):
+        text = text.lower()
+        found = []
+        for value, keys in self.values.items():
+            if text in value:
+                found.extend(keys)
+        return found
+
+class ScheduleIndex:
+    """ตาราง generated_schedules ปัจจุบันในหน่วยความจำ + ข้อมูลครู / ห้อง / นักเรียน ที่ใช้ค้นหา
+
+    แถวเรียงตาม (day_of_week, start_slot) ไว้แล้ว ผลค้นหาจึงคืนตามลำดับ position ได้เลย
+    """
+
+    def __init__(self, schedules, instructors, classrooms, students):
+        self.rows = sorted(schedules, key=lambda r: (r.get('day_of_week') is None, r.get('day_of_week'),
+                                                     r.get('start_slot') is None, r.get('start_slot')))
+        self.instructors = instructors
+        self.classrooms = classrooms
+        self.students = students
+        self.version = hashlib.sha256(json.dumps([self.rows, instructors, classrooms, students], sort_keys=True,
+                                                 default=str, ensure_ascii=False).encode('utf-8')).hexdigest()
+        self.built_at = time.time()
+
+        # lookup ของแถวตาราง -> list ของ position
+        self.by_dept_year = {}
+        self.by_dept = {}
+        self.by_year = {}
+        self.by_instructor = {}
+        self.by_room = {}
+        self.by_subject = {}
+        self.room_text = TextIndex()
+        self.subject_code_text = TextIndex()
+        self.subject_name_text = TextIndex()
+        for pos, r in enumerate(self.rows):
+            dept, year = _key(r.get('department')), _key(r.get('year_level'))
+            self.by_dept_year.setdefault((dept, year), []).append(pos)
+            self.by_dept.setdefault(dept, []).append(pos)
+            self.by_year.setdefault(year, []).append(pos)
+            self.by_instructor.setdefault(_key(r.get('instructor_id')), []).append(pos)
+            self.by_room.setdefault(_key(r.get('room_code')), []).append(pos)
+            self.by_subject.setdefault(_key(r.get('subject_code')), []).append(pos)
+        for room in self.by_room:
+            self.room_text.add(room, room)
+        for code, positions in self.by_subject.items():
+            self.subject_code_text.add(code, code)
+            for name in {self.rows[p].get('subject_name') for p in positions}:
+                self.subject_name_text.add(name, code)
+
+        # ข้อมูลที่ join กับตาราง
+        self.instructor_first = TextIndex()
+        self.instructor_last = TextIndex()
+        self.instructors_by_dept = {}
+        self.instructor_by_id = {_key(ins.get('id')): ins for ins in instructors}
+        for ins in instructors:
+            ins_id = _key(ins.get('id'))
+            self.instructor_first.add(ins.get('first_name'), ins_id)
+            self.instructor_last.add(ins.get('last_name'), ins_id)
+            self.instructors_by_dept.setdefault(_key(ins.get('department')), []).append(ins_id)
+
+        self.student_by_id = {}
+        self.student_first = TextIndex()
+        self.student_last = TextIndex()
+        for pos, std in enumerate(students):
+            self.student_by_id.setdefault(_key(std.get('student_id')), []).append(pos)
+            self.student_first.add(std.get('first_name'), pos)
+            self.student_last.add(std.get('last_name'), pos)
+
+    # --- helpers ---
+    def iter_rows(self, positions):
+        """แถวตามลำดับเดิม (วัน, คาบ) แบบไม่สำเนา (ห้ามแก้ dict ที่ได้) positions = None คือทุกแถว"""
+        if positions is None:
+            return iter(self.rows)
+        return (self.rows[p] for p in sorted(positions))
+
+    def _rows(self, positions):
+        """แถวตามลำดับเดิม (วัน, คาบ) -> list ของ dict (สำเนา)"""
+        return [dict(r) for r in self.iter_rows(positions)]
+
+    @staticmethod
+    def _narrow(current, keys):
+        """AND ของเงื่อนไข (None = ยังไม่กรอง)"""
+        keys = set(keys)
+        return keys if current is None else current & keys
+
+    def _positions(self, lookup, keys):
+        out = set()
+        for key in keys:
+            out.update(lookup.get(key, ()))
+        return out
+
+    # --- search (ผลเท่ากับ query เดิมใน AdvancedSchedule) ---
+    def all(self):
+        return self._rows(None)
+
+    def search(self, type_, args):
+        """ค้นหาตาม parameter ของ /schedules/search (args = request.args) -> list ของแถว (สำเนา)"""
+        return self._rows(self.select(type_, args))
+
+    def select(self, type_, args):
+        """position ของแถวที่ตรงกับ parameter (None = ทุกแถว) รองรับ 4 โหมด: student, instructor, room, subject"""
+        def clean(name):
+            val = args.get(name)
+            return val.strip() if val else None
+
+        # --- 1. SEARCH STUDENT ---
+        if type_ == 'student':
+            # ระบุตัวตน (ID หรือ ชื่อ) -> ใช้แผนก/ชั้นปีของนักเรียนคนแรกที่เจอ, ไม่งั้นใช้ filter แผนก/ชั้นปี
+            # หมายเหตุ: ยังไม่กรองตาม group_no (แถวที่บันทึกก่อน migrations/002 ไม่มีคอลัมน์นี้)
+            return self.find_student(std_id=clean('id'), fname=clean('fname'), lname=clean('lname'),
+                                     dept=clean('dept'), year=clean('year'))
+        # --- 2. SEARCH INSTRUCTOR ---
+        if type_ == 'instructor':
+            return self.find_instructor(fname=clean('fname'), lname=clean('lname'), dept=clean('dept'))
+        # --- 3. SEARCH ROOM ---
+        if type_ == 'room':
+            # code ตรงๆ และ/หรือ คุณสมบัติห้อง (ตึก, ประเภท, แผนกเจ้าของ)
+            return self.find_room(room_code=clean('room_code'), room_type=clean('room_type'),
+                                  building=clean('building'), dept=clean('dept'))
+        # --- 4. SEARCH SUBJECT ---
+        if type_ == 'subject':
+            return self.find_subject(code=clean('code'), name=clean('name'), instructor=clean('instructor'))
+        return None
+
+    def find_student(self, std_id=None, fname=None, lname=None, dept=None, year=None):
+        if std_id or fname or lname:
+            matches = None
+            if std_id: matches = self._narrow(matches, self.student_by_id.get(std_id, ()))
+            if fname: matches = self._narrow(matches, self.student_first.search(fname))
+            if lname: matches = self._narrow(matches, self.student_last.search(lname))
+            if not matches:
+                return []
+            # เอานักเรียนคนแรกที่เจอมาใช้เป็น filter (ตารางจัดตาม แผนก และ ชั้นปี)
+            target = self.students[min(matches)]
+            return self.by_dept_year.get((_key(target.get('department')), _key(target.get('year_level'))), ())
+
+        positions = None
+        if dept: positions = self._narrow(positions, self.by_dept.get(dept, ()))
+        if year: positions = self._narrow(positions, self.by_year.get(year, ()))
+        return positions
+
+    def find_instructor(self, fname=None, lname=None, dept=None):
+        if not (fname or lname or dept):
+            return None
+        ids = None
+        if fname: ids = self._narrow(ids, self.instructor_first.search(fname))
+        if lname: ids = self._narrow(ids, self.instructor_last.search(lname))
+        if dept: ids = self._narrow(ids, self.instructors_by_dept.get(dept, ()))
+        if not ids:
+            return []
+        return self._positions(self.by_instructor, ids)
+
+    def find_room(self, room_code=None, room_type=None, building=None, dept=None):
+        positions = None
+        if room_code:
+            positions = self._positions(self.by_room, self.room_text.search(room_code))
+        if room_type or building or dept:
+            codes = [_key(r.get('room_code')) for r in self.classrooms
+                     if (not room_type or _key(r.get('room_type')) == room_type)
+                     and (not building or building.lower() in str(r.get('building') or '').lower())
+                     and (not dept or _key(r.get('department_owner')) == dept)]
+            if not codes:
+                return []
+            positions = self._narrow(positions, self._positions(self.by_room, codes))
+        return positions
+
+    def find_subject(self, code=None, name=None, instructor=None):
+        positions = None
+        if code: positions = self._positions(self.by_subject, self.subject_code_text.search(code))
+        if name:
+            # ชื่อวิชาเก็บรายแถว -> กรองซ้ำที่ระดับแถว (วิชาเดียวกันอาจบันทึกชื่อไม่เหมือนกัน)
+            candidates = self._positions(self.by_subject, self.subject_name_text.search(name))
+            candidates = {p for p in candidates if name.lower() in str(self.rows[p].get('subject_name') or '').lower()}
+            positions = self._narrow(positions, candidates)
+        if instructor:
+            ids = set(self.instructor_first.search(instructor)) | set(self.instructor_last.search(instructor))
+            if not ids:
+                return []
+            positions = self._narrow(positions, self._positions(self.by_instructor, ids))
+        return positions
+
+    def report(self):
+        return {"version": self.version, "built_at": self.built_at, "rows": len(self.rows)}
+
+class ScheduleIndexCache:
+    """ScheduleIndex ปัจจุบันของ process: สร้างใหม่ทั้งก้อนแล้วสลับ reference (ผู้อ่านไม่เห็นสถานะครึ่งๆ กลางๆ)
+
+    สร้างใหม่หลัง save_to_db, หลังแก้ข้อมูลใน ns_data (lazy) หรือเมื่อครบ ttl (กันกรณี process อื่นเป็นคนบันทึก)
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.SCHEDULE_INDEX_TTL if ttl is None else ttl
+        self.lock = threading.Lock()
+        self.index = None
+        self.client = None
+        self.expires_at = 0.0
+
+    def _build(self, client):
+        return ScheduleIndex(load_active_rows(client),
+                             fetch_all('instructors', client=client),
+                             fetch_all('classrooms', client=client),
+                             fetch_all('students', client=client))
+
+    def get(self, client=None):
+        client = client or supabase
+        index = self.index
+        if index is not None and self.client is client and time.monotonic() < self.expires_at:
+            return index
+        with self.lock:
+            # อีก thread อาจสร้างเสร็จแล้วระหว่างรอ lock
+            if self.index is not None and self.client is client and time.monotonic() < self.expires_at:
+                return self.index
+            return self._swap(client)
+
+    def refresh(self, client=None):
+        with self.lock:
+            return self._swap(client or supabase)
+
+    def _swap(self, client):
+        index = self._build(client)
+        self.index, self.client = index, client
+        self.expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        return index
+
+    def invalidate(self):
+        self.expires_at = 0.0
+
+schedule_index_cache = ScheduleIndexCache()
+
+def get_schedule_index(client=None):
+    return schedule_index_cache.get(client)
+
+def refresh_schedule_index(client=None):
+    """สร้าง index ใหม่ทันที (เรียกหลังบันทึกตารางใหม่)"""
+    return schedule_index_cache.refresh(client)
+
+def invalidate_schedule_index():
+    """ให้สร้างใหม่ตอนค้นหาครั้งถัดไป (เช่น หลังเพิ่มนักเรียน / ครู / ห้อง)"""
+    schedule_index_cache.invalidate()
@@ -0,0 +1,220 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from core.database import supabase, fetch_all
+
+# ตารางเรียนแบบมีเวอร์ชัน (ดู migrations/001_schedule_versions.sql, group_no จาก 002_schedule_group_no.sql)
+#   generated_schedules.valid_from / valid_to : แถวมีผลตั้งแต่เวอร์ชัน valid_from ถึงก่อน valid_to (NULL = ยังไม่ถูกปิด)
+#   schedule_versions                       : ข้อมูลแต่ละเวอร์ชัน (penalty, mode, จำนวนแถวที่เพิ่ม/ปิด)
+#   schedule_active (id = 1)                : เวอร์ชันที่ใช้งานอยู่ เปลี่ยนด้วย update แถวเดียว (atomic)
+SCHEDULE_TABLE = 'generated_schedules'
+VERSIONS_TABLE = 'schedule_versions'
+ACTIVE_TABLE = 'schedule_active'
+
+# คอลัมน์ที่ใช้เทียบว่าแถวเหมือนเดิมหรือไม่
+ROW_FIELDS = ("subject_code", "subject_name", "room_code", "instructor_id", "day_of_week", "start_slot",
+              "department", "year_level", "group_no")
+# error ของ PostgREST ว่าไม่มีตาราง: 42P01 = relation does not exist, PGRST205 = ไม่อยู่ใน schema cache
+MISSING_TABLE_CODES = ("42P01", "PGRST205")
+INSERT_BATCH_SIZE = 1000
+CLOSE_BATCH_SIZE = 200   # จำนวน id ต่อ update (id อยู่ใน URL)
+
+# บันทึกได้ทีละงานต่อ process (diff คิดจากเวอร์ชันที่ active อยู่)
+_save_lock = threading.Lock()
+
+def row_key(row):
+    return tuple(str(row.get(f)) for f in ROW_FIELDS)
+
+def visible_in(version_id):
+    """filter ของแถวที่มีผลในเวอร์ชัน version_id"""
+    def where(query):
+        return query.lte('valid_from', version_id) \
+            .or_(f"valid_to.is.null,valid_to.gt.{version_id}") \
+            .order('id')
+    return where
+
+def is_missing_table(error, table_name):
+    """error นี้แปลว่าไม่มีตาราง table_name (ยังไม่ได้รัน migration) หรือไม่"""
+    if getattr(error, 'code', None) in MISSING_TABLE_CODES:
+        return True
+    message = str(getattr(error, 'message', None) or error)
+    return table_name in message and 'does not exist' in message
+
+def get_active_version(client=None):
+    """id ของเวอร์ชันที่ active -> None ถ้ายังไม่ได้ migrate (ใช้แบบเดิม: ตารางเดียวไม่มีเวอร์ชัน)
+
+    error อื่น (network / timeout / สิทธิ์) ส่งต่อให้ผู้เรียก: ถ้าตีเป็น None การบันทึกจะไปใช้ _legacy_save ที่ลบทุกเวอร์ชัน
+    """
+    client = client or supabase
+    try:
+        data = client.table(ACTIVE_TABLE).select('version_id').eq('id', 1).execute().data
+    except Exception as e:
+        if not is_missing_table(e, ACTIVE_TABLE):
+            raise
+        return None
+    return data[0]['version_id'] if data else None
+
+def load_version_rows(version_id, client=None):
+    client = client or supabase
+    return fetch_all(SCHEDULE_TABLE, client=client, where=visible_in(version_id))
+
+def load_active_rows(client=None):
+    """แถวของตารางเรียนปัจจุบัน (เวอร์ชันที่ active หรือทั้งตารางถ้ายังไม่มีเวอร์ชัน)"""
+    client = client or supabase
+    version_id = get_active_version(client)
+    if version_id is None:
+        return fetch_all(SCHEDULE_TABLE, client=client)
+    return load_version_rows(version_id, client)
+
+def diff_rows(current, new_rows):
+    """เทียบแถวของเวอร์ชันปัจจุบันกับแถวใหม่ -> (แถวใหม่ที่ต้อง insert, id ของแถวที่ยังใช้ต่อได้)
+
+    เทียบแบบ multiset (แถวซ้ำกันได้ถ้าตารางยังมีวิชาชนกัน); ใช้ต่อได้เฉพาะแถวที่ยังไม่ถูกปิด (valid_to = NULL)
+    """
+    reusable = {}
+    for row in current:
+        if row.get('valid_to') is None:
+            reusable.setdefault(row_key(row), []).append(row['id'])
+    to_insert, kept = [], set()
+    for row in new_rows:
+        ids = reusable.get(row_key(row))
+        if ids:
+            kept.add(ids.pop())
+        else:
+            to_insert.append(row)
+    return to_insert, kept
+
+def _chunks(items, size):
+    return [items[k:k + size] for k in range(0, len(items), size)]
+
+def _run_parallel(func, batches, workers):
+    if not batches: return
+    if workers <= 1 or len(batches) == 1:
+        for batch in batches:
+            func(batch)
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(batches)), thread_name_prefix='schedule-save') as pool:
+        for future in [pool.submit(func, batch) for batch in batches]:
+            future.result()
+
+def _legacy_save(client, records):
+    """แบบเดิม (ยังไม่ได้ migrate): ลบทั้งหมดแล้ว insert ใหม่"""
+    client.table(SCHEDULE_TABLE).delete().neq('id', 0).execute()
+    for batch in _chunks(records, INSERT_BATCH_SIZE):
+        client.table(SCHEDULE_TABLE).insert(batch).execute()
+    return {"version_id": None, "rows": len(records), "added": len(records), "removed": None}
+
+def save_schedule_version(records, client=None, penalty=None, mode=None, workers=None):
+    """บันทึกตารางเป็นเวอร์ชันใหม่: insert เฉพาะแถวที่ต่างจากเวอร์ชัน active, ปิดแถวที่หายไป แล้วสลับ active
+
+    ผู้อ่านเห็นเวอร์ชันเดิมครบทุกแถวจนกว่าจะสลับ pointer (แถวที่ปิดด้วย valid_to = เวอร์ชันใหม่ยังมีผลในเวอร์ชันเดิม)
+    ถ้าล้มกลางทาง จะลบแถวที่เพิ่มและเปิดแถวที่ปิดไปคืน
+    """
+    client = client or supabase
+    workers = Config.SAVE_WORKERS if workers is None else workers
+    with _save_lock:
+        active = get_active_version(client)
+        if active is None:
+            return _legacy_save(client, records)
+
+        # แถวที่ยังไม่ถูกปิดทั้งหมด (รวมแถวของเวอร์ชันที่ถูก rollback ไปแล้ว) ต้องปิดถ้าไม่ได้ใช้ต่อ
+        current = load_version_rows(active, client)
+        open_ids = [r['id'] for r in fetch_all(SCHEDULE_TABLE, 'id', client=client,
+                                               where=lambda q: q.is_('valid_to', 'null').order('id'))]
+        to_insert, kept = diff_rows(current, records)
+        to_close = [i for i in open_ids if i not in kept]
+
+        version = client.table(VERSIONS_TABLE).insert({
+            "parent_id": active, "penalty": penalty, "mode": mode, "status": "building",
+            "rows_total": len(records), "rows_added": len(to_insert), "rows_removed": len(to_close),
+        }).execute().data[0]
+        version_id = version['id']
+
+        try:
+            rows = [dict(r, valid_from=version_id) for r in to_insert]
+            _run_parallel(lambda batch: client.table(SCHEDULE_TABLE).insert(batch).execute(),
+                          _chunks(rows, INSERT_BATCH_SIZE), workers)
+            _run_parallel(lambda ids: client.table(SCHEDULE_TABLE).update({"valid_to": version_id})
+                          .in_('id', ids).execute(), _chunks(to_close, CLOSE_BATCH_SIZE), workers)
+            client.table(VERSIONS_TABLE).update({"status": "ready"}).eq('id', version_id).execute()
+            client.table(ACTIVE_TABLE).update({"version_id": version_id}).eq('id', 1).execute()
+        except Exception:
+            _abort_version(client, version_id)
+            raise
+
+    return {"version_id": version_id, "parent_id": active, "rows": len(records),
+            "added": len(to_insert), "removed": len(to_close)}
+
+class StaleVersionError(Exception):
+    """เวอร์ชันที่ active เปลี่ยนไปแล้วระหว่างแก้ไข (ต้องโหลดตารางใหม่ก่อน)"""
+
+def save_schedule_edit(base_version, removed_ids, added_rows, rows_total, client=None, penalty=None, mode='manual'):
+    """บันทึกการแก้ไขบางวิชาเป็นเวอร์ชันใหม่ โดยไม่ต้องโหลด/เทียบทั้งตาราง
+
+    removed_ids ต้องเป็นแถวที่ยังไม่ถูกปิด (valid_to = NULL) ของเวอร์ชัน base_version
+    -> (ข้อมูลเวอร์ชัน, แถวที่ insert พร้อม id)
+    """
+    client = client or supabase
+    with _save_lock:
+        active = get_active_version(client)
+        if active != base_version:
+            raise StaleVersionError(f"active version is {active}, edit was based on {base_version}")
+
+        if active is None:
+            for ids in _chunks(removed_ids, CLOSE_BATCH_SIZE):
+                client.table(SCHEDULE_TABLE).delete().in_('id', ids).execute()
+            inserted = client.table(SCHEDULE_TABLE).insert(added_rows).execute().data if added_rows else []
+            return {"version_id": None, "rows": rows_total, "added": len(added_rows),
+                    "removed": len(removed_ids)}, inserted
+
+        version = client.table(VERSIONS_TABLE).insert({
+            "parent_id": active, "penalty": penalty, "mode": mode, "status": "building",
+            "rows_total": rows_total, "rows_added": len(added_rows), "rows_removed": len(removed_ids),
+        }).execute().data[0]
+        version_id = version['id']
+        try:
+            rows = [dict(r, valid_from=version_id) for r in added_rows]
+            inserted = client.table(SCHEDULE_TABLE).insert(rows).execute().data if rows else []
+            for ids in _chunks(removed_ids, CLOSE_BATCH_SIZE):
+                client.table(SCHEDULE_TABLE).update({"valid_to": version_id}).in_('id', ids).execute()
+            client.table(VERSIONS_TABLE).update({"status": "ready"}).eq('id', version_id).execute()
+            client.table(ACTIVE_TABLE).update({"version_id": version_id}).eq('id', 1).execute()
+        except Exception:
+            _abort_version(client, version_id)
+            raise
+
+    return {"version_id": version_id, "parent_id": active, "rows": rows_total,
+            "added": len(added_rows), "removed": len(removed_ids)}, inserted
+
+def _abort_version(client, version_id):
+    try:
+        client.table(SCHEDULE_TABLE).delete().eq('valid_from', version_id).execute()
+        client.table(SCHEDULE_TABLE).update({"valid_to": None}).eq('valid_to', version_id).execute()
+        client.table(VERSIONS_TABLE).update({"status": "failed"}).eq('id', version_id).execute()
+    except Exception as e:
+        print(f"⚠️ Could not clean up schedule version {version_id}: {e}")
+
+# --- เวอร์ชันเก่า: ดูรายการ / เทียบ / rollback ---
+def list_versions(client=None, limit=50):
+    client = client or supabase
+    return client.table(VERSIONS_TABLE).select('*').order('id', desc=True).limit(limit).execute().data
+
+def activate_version(version_id, client=None):
+    """สลับกลับไปใช้เวอร์ชันเก่า (แถวไม่ถูกลบ จึงแค่ย้าย pointer)"""
+    client = client or supabase
+    found = client.table(VERSIONS_TABLE).select('id, status').eq('id', version_id).execute().data
+    if not found or found[0].get('status') != 'ready':
+        return False
+    client.table(ACTIVE_TABLE).update({"version_id": version_id}).eq('id', 1).execute()
+    return True
+
+def compare_versions(old_id, new_id, client=None):
+    """แถวที่เพิ่ม / หายไประหว่าง 2 เวอร์ชัน (เทียบด้วยเนื้อหา ไม่ใช่ id)"""
+    old_rows = Counter(row_key(r) for r in load_version_rows(old_id, client))
+    new_rows = Counter(row_key(r) for r in load_version_rows(new_id, client))
+    as_dict = lambda key: dict(zip(ROW_FIELDS, key))
+    added = [as_dict(k) for k in (new_rows - old_rows).elements()]
+    removed = [as_dict(k) for k in (old_rows - new_rows).elements()]
+    return {"old": old_id, "new": new_id, "added": added, "removed": removed,
+            "unchanged": sum((old_rows & new_rows).values())}
@@ -0,0 +1,64 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from core.database import supabase
+
+# ชื่อ key ในผลลัพธ์ -> ตารางที่นับ
+COUNTED_TABLES = {"students": "students", "instructors": "instructors", "subjects": "subjects", "rooms": "classrooms"}
+
+def count_rows(client, table_name):
+    return client.table(table_name).select('*', count='exact').limit(0).execute().count
+
+class StatsCache:
+    """จำนวนแถวของตารางหลัก (สำหรับ dashboard) + ข้อมูลการจัดตารางครั้งล่าสุด
+
+    นับใหม่ทุกตารางพร้อมกันเมื่อครบ ttl, เพิ่มค่าทันทีเมื่อ insert ผ่าน ns_data
+    ถ้านับไม่สำเร็จจะคืนค่าเดิมพร้อม stale=True แทนการคืน 0
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.STATS_CACHE_TTL if ttl is None else ttl
+        self.lock = threading.Lock()
+        self.counts = None
+        self.counted_at = None
+        self.expires_at = 0.0
+        self.last_generation = None
+
+    def _fetch(self, client):
+        with ThreadPoolExecutor(max_workers=len(COUNTED_TABLES)) as pool:
+            futures = {key: pool.submit(count_rows, client, table) for key, table in COUNTED_TABLES.items()}
+            return {key: future.result() or 0 for key, future in futures.items()}
+
+    def get(self, client=None):
+        """-> (dict ของผลลัพธ์, error หรือ None)"""
+        client = client or supabase
+        error = None
+        with self.lock:
+            if self.counts is None or time.monotonic() >= self.expires_at:
+                try:
+                    self.counts = self._fetch(client)
+                    self.counted_at = time.time()
+                    self.expires_at = time.monotonic() + self.ttl
+                except Exception as e:
+                    error = str(e)
+            counts = dict(self.counts) if self.counts is not None else None
+            body = dict(counts or {}, counted_at=self.counted_at, stale=error is not None,
+                        last_generation=self.last_generation)
+        return (body if counts is not None else None), error
+
+    def bump(self, key, n=1):
+        """เพิ่มจำนวนหลัง insert สำเร็จ (ยังไม่เคยนับ = ปล่อยให้นับตอนขอครั้งถัดไป)"""
+        with self.lock:
+            if self.counts is not None and key in self.counts:
+                self.counts[key] += n
+
+    def invalidate(self):
+        with self.lock:
+            self.expires_at = 0.0
+
+    def record_generation(self, info):
+        with self.lock:
+            self.last_generation = dict(info, finished_at=time.time())
+
+stats_cache = StatsCache()
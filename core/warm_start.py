@@ -0,0 +1,98 @@
+import numpy as np
+from core.schedule_store import load_active_rows
+from core.rules import SLOTS_PER_DAY, LUNCH_SLOT
+
+# สัดส่วนประชากรเริ่มต้นที่มาจากตารางเดิม (ตัวเดิม + mutant) ที่เหลือสร้างใหม่
+WARM_START_RATIO = 0.2
+
+def load_current_schedule(client=None):
+    """แถวทั้งหมดของ generated_schedules ปัจจุบัน (เวอร์ชันที่ active)"""
+    return load_active_rows(client)
+
+def rebuild_individual(rows, table):
+    """แปลงแถว generated_schedules กลับเป็น gene [room_idx, start_slot, teacher_idx] ตามลำดับวิชาใน table
+
+    save_to_db เก็บทีละชั่วโมง (ข้ามพักเที่ยง) -> จับคู่ด้วย (subject_code, department, year_level, group_no)
+    แล้วไล่ให้วิชาตามลำดับ: ชั่วโมงแรกที่ยังไม่ถูกใช้ = จุดเริ่ม, กินชั่วโมงถัดไปในห้อง/ครู/วันเดียวกันตาม duration
+    แถวเก่าที่ไม่มี group_no (ก่อน migrations/002) จับคู่โดยไม่ดูกลุ่ม วิชาเดียวกันต่างกลุ่มจึงอาจสลับกันได้
+    วิชาที่หาแถวไม่เจอ (หรือห้อง/ครูไม่อยู่ในข้อมูลแล้ว) จะได้ None
+    """
+    room_index = {code: idx for idx, code in enumerate(table.room_ids)}
+    teacher_index = {}
+    for idx, tid in enumerate(table.instructor_ids):
+        teacher_index.setdefault(int(tid), idx)
+
+    rows_by_key = {}
+    for row in rows:
+        group_no = row.get('group_no')
+        key = (row.get('subject_code'), row.get('department'), row.get('year_level'),
+               str(group_no) if group_no is not None else None)
+        rows_by_key.setdefault(key, []).append(row)
+    for key_rows in rows_by_key.values():
+        key_rows.sort(key=lambda r: (r['day_of_week'], r['start_slot'], str(r['room_code']), r['instructor_id']))
+
+    genes = [None] * table.n_courses
+    for i in range(table.n_courses):
+        key = (table.subject_codes[i], table.departments[i], table.year_levels[i])
+        key_rows = rows_by_key.get(key + (table.group_nos[i],)) or rows_by_key.get(key + (None,))
+        if not key_rows: continue
+
+        first = key_rows.pop(0)
+        day, slot = int(first['day_of_week']), int(first['start_slot'])
+        room_code, teacher_id = first['room_code'], int(first['instructor_id'])
+
+        # ชั่วโมงที่เหลือของคาบเดียวกัน (ข้ามช่องพักเที่ยงที่ไม่ได้บันทึกไว้)
+        for t in range(1, int(table.duration[i])):
+            s = slot + t
+            if s == LUNCH_SLOT: continue
+            for k, r in enumerate(key_rows):
+                if (int(r['day_of_week']) == day and int(r['start_slot']) == s
+                        and r['room_code'] == room_code and int(r['instructor_id']) == teacher_id):
+                    del key_rows[k]
+                    break
+
+        if room_code in room_index and teacher_id in teacher_index:
+            genes[i] = [room_index[room_code], day * SLOTS_PER_DAY + slot, teacher_index[teacher_id]]
+    return genes
+
+def gene_records(table, i, gene):
+    """แถว generated_schedules ของวิชา i ตาม gene (ทีละชั่วโมง ข้ามพักเที่ยง) ใช้ตอนบันทึก"""
+    r_idx, start_slot, t_idx = gene
+    records = []
+    for t in range(int(table.duration[i])):
+        current_slot = start_slot + t
+        day = current_slot // SLOTS_PER_DAY
+        slot_in_day = current_slot % SLOTS_PER_DAY
+
+        if slot_in_day == LUNCH_SLOT: continue
+        if day != (start_slot // SLOTS_PER_DAY): continue
+
+        records.append({
+            "subject_code": table.subject_codes[i],
+            "subject_name": table.subject_names[i],
+            "room_code": table.room_ids[r_idx],
+            "instructor_id": int(table.instructor_ids[t_idx]),
+            "day_of_week": int(day),
+            "start_slot": int(slot_in_day),
+            "department": table.departments[i],
+            "year_level": table.year_levels[i],
+            "group_no": table.group_nos[i]
+        })
+    return records
+
+def find_affected_courses(genes, table, changed_subjects=None, changed_instructors=None):
+    """mask ของวิชาที่ต้องค้นหาใหม่: ไม่มีในตารางเดิม, วิชา/ครูที่ถูกแก้ไข, หรือห้อง/ครูเดิมใช้ไม่ได้แล้ว"""
+    changed_subjects = {str(s) for s in (changed_subjects or [])}
+    changed_instructors = {int(t) for t in (changed_instructors or [])}
+
+    affected = np.zeros(table.n_courses, dtype=bool)
+    for i, gene in enumerate(genes):
+        if gene is None or str(table.subject_codes[i]) in changed_subjects:
+            affected[i] = True
+            continue
+        room_idx, _, teacher_idx = gene
+        if int(table.instructor_ids[teacher_idx]) in changed_instructors:
+            affected[i] = True
+        elif not table.room_mask[i, room_idx] or teacher_idx not in table.teacher_options[i]:
+            affected[i] = True
+    return affected
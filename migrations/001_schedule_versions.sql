@@ -0,0 +1,32 @@
+-- ตารางเรียนแบบมีเวอร์ชัน (core/schedule_store.py)
+-- แถวใน generated_schedules ไม่ถูกลบอีกต่อไป: มีผลตั้งแต่เวอร์ชัน valid_from จนถึงก่อน valid_to (NULL = ยังไม่ถูกปิด)
+-- รันครั้งเดียวใน Supabase SQL editor; ตารางเดิมทั้งหมดจะกลายเป็นเวอร์ชัน 0
+
+create table if not exists schedule_versions (
+    id           bigserial primary key,
+    parent_id    bigint references schedule_versions (id),
+    created_at   timestamptz not null default now(),
+    penalty      double precision,
+    mode         text,
+    status       text not null default 'building',   -- building | ready | failed
+    rows_total   integer,
+    rows_added   integer,
+    rows_removed integer
+);
+
+-- เวอร์ชัน 0 = ข้อมูลที่มีอยู่ก่อน migrate
+insert into schedule_versions (id, status, mode) values (0, 'ready', 'legacy')
+on conflict (id) do nothing;
+
+create table if not exists schedule_active (
+    id         integer primary key check (id = 1),
+    version_id bigint not null references schedule_versions (id)
+);
+insert into schedule_active (id, version_id) values (1, 0)
+on conflict (id) do nothing;
+
+alter table generated_schedules add column if not exists valid_from bigint not null default 0;
+alter table generated_schedules add column if not exists valid_to bigint;
+
+create index if not exists generated_schedules_valid_from_idx on generated_schedules (valid_from);
+create index if not exists generated_schedules_open_idx on generated_schedules (valid_to) where valid_to is null;
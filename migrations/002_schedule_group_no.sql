@@ -0,0 +1,5 @@
+-- กลุ่มเรียนของแต่ละแถวใน generated_schedules (core/warm_start.py gene_records / rebuild_individual)
+-- วิชาเดียวกันของแผนก/ชั้นปีเดียวกันแต่คนละกลุ่ม ต้องแยกจากกันได้ตอนโหลดตารางเดิมกลับเป็น gene (warm start / editor)
+-- รันหลัง 001; แถวเดิมจะมี group_no = NULL และถูกแทนด้วยแถวที่มี group_no ในการบันทึกครั้งถัดไป
+
+alter table generated_schedules add column if not exists group_no text;
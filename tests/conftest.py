@@ -0,0 +1,35 @@
+import random
+import pytest
+from core.rules import is_head_instructor
+from core.course_table import build_allowed_teachers_map, compile_course_table
+
+DEPARTMENTS = ["คอมพิวเตอร์", "ไฟฟ้า", "ช่างยนต์"]
+SUBJECT_NAMES = ["วงจรไฟฟ้า", "ฟิสิกส์", "งานเชื่อม", "การเขียนโปรแกรมคอมพิวเตอร์", "ภาษาไทย", "ลูกเสือ"]
+
+def make_problem(n_courses, seed=0):
+    """ปัญหาขนาดเล็กแบบสุ่ม (แถวแบบเดียวกับที่โหลดจาก Supabase) -> (table, instructor_details_map, head_instructor_ids)"""
+    rnd = random.Random(seed)
+    rooms = ["LB101", "TH201", "สนามฟุตบอล"] + [f"R{k:03d}" for k in range(max(3, n_courses // 8))]
+    instructors = [{"id": k + 1, "first_name": f"ครู{k}", "last_name": f"ทดสอบ{k}",
+                    "department": DEPARTMENTS[k % len(DEPARTMENTS)],
+                    "position_role": "หัวหน้าแผนก" if k % 10 == 0 else "ครู"}
+                   for k in range(max(4, n_courses // 4))]
+    courses = []
+    for k in range(n_courses):
+        subject = {"subject_code": f"S{k % 20:03d}", "subject_name": rnd.choice(SUBJECT_NAMES),
+                   "theory_hours": rnd.randint(0, 2), "practice_hours": rnd.randint(0, 2)}
+        for slot, ins in enumerate(rnd.sample(instructors, rnd.randint(1, 3)), start=1):
+            subject[f"instructor_{slot}_fname"] = ins["first_name"]
+            subject[f"instructor_{slot}_lname"] = ins["last_name"]
+        courses.append({"id": k + 1, "subject_code": subject["subject_code"], "subjects": subject,
+                        "department": DEPARTMENTS[k % len(DEPARTMENTS)], "year_level": str(k // 24 % 3 + 1),
+                        "group_no": "1", "advisor_id": rnd.choice(instructors)["id"] if rnd.random() < 0.3 else None})
+
+    instructor_ids = [ins["id"] for ins in instructors]
+    table = compile_course_table(courses, rooms, instructor_ids, build_allowed_teachers_map(courses, instructors))
+    return (table, {ins["id"]: ins for ins in instructors},
+            {ins["id"] for ins in instructors if is_head_instructor(ins)})
+
+@pytest.fixture
+def small_problem():
+    return make_problem(60, seed=1)
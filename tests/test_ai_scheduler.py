@@ -0,0 +1,77 @@
+import random
+import threading
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.problem_cache import invalidate_problem_cache
+from core.constructive import DraftSolver
+
+def test_mode_alias_is_resolved_before_logging(capsys):
+    invalidate_problem_cache()
+    try:
+        result = ai_scheduler.run_genetic_algorithm('perfect', db=MemoryDB(generate_dataset(40, seed=1)),
+                                                    time_budget_seconds=1)
+    finally:
+        invalidate_problem_cache()
+    assert result['mode'] == 'precise'
+    out = capsys.readouterr().out
+    assert 'MODE: PRECISE' in out and 'PERFECT' not in out
+
+def test_draft_is_deterministic(small_problem):
+    table = small_problem[0]
+    first, second = DraftSolver(table), DraftSolver(table)
+    genes = first.solve()
+    assert genes == second.solve()
+    assert len(genes) == table.n_courses
+    assert all(0 <= room < table.n_rooms and 0 <= teacher < len(table.instructor_ids) for room, _, teacher in genes)
+    assert first.report()['backtracks'] == second.report()['backtracks']
+
+def run_fast(db, **kwargs):
+    invalidate_problem_cache()
+    try:
+        return ai_scheduler.run_genetic_algorithm('fast', db=db, **kwargs)
+    finally:
+        invalidate_problem_cache()
+
+def test_parallel_run_matches_serial():
+    dataset = generate_dataset(40, seed=2)
+    results = []
+    for workers in (1, 2):
+        random.seed(5)
+        db = MemoryDB(dataset)
+        results.append((run_fast(db, workers=workers), db.tables['generated_schedules']))
+    (serial, serial_rows), (parallel, parallel_rows) = results
+    assert serial['status'] == parallel['status'] == 'success'
+    assert serial['penalty'] == parallel['penalty']
+    assert serial_rows == parallel_rows
+
+def test_concurrent_runs_use_separate_toolboxes(monkeypatch):
+    # ให้ทั้ง 2 งานลงทะเบียน operator เสร็จก่อนเริ่ม evolve (ถ้าใช้ toolbox ร่วมกัน งานแรกจะถูกทับ)
+    barrier = threading.Barrier(2, timeout=30)
+    toolboxes = []
+    register = ai_scheduler.register_operators
+
+    def register_then_wait(tb, table, cfg, evaluator):
+        cache = register(tb, table, cfg, evaluator)
+        toolboxes.append((tb, tb.evaluate))
+        barrier.wait()
+        return cache
+
+    monkeypatch.setattr(ai_scheduler, 'register_operators', register_then_wait)
+    db = MemoryDB(generate_dataset(40, seed=3))
+    invalidate_problem_cache()
+    results = [None, None]
+
+    def job(k):
+        results[k] = ai_scheduler.run_genetic_algorithm('fast', db=db, time_budget_seconds=5)
+
+    threads = [threading.Thread(target=job, args=(k,)) for k in range(2)]
+    try:
+        for t in threads: t.start()
+        for t in threads: t.join(60)
+    finally:
+        invalidate_problem_cache()
+    assert [r['status'] for r in results] == ['success', 'success']
+    assert toolboxes[0][0] is not toolboxes[1][0]
+    # operator ของแต่ละงานยังเป็นของงานนั้นหลังอีกงานลงทะเบียน
+    assert all(tb.evaluate == evaluate for tb, evaluate in toolboxes)
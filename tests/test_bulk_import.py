@@ -0,0 +1,96 @@
+import io
+import json
+from benchmarks.memory_db import MemoryDB, MemoryQuery
+from core.api_routes import classroom_model
+from core.bulk_import import BulkImporter, detect_format, iter_records
+
+class CheckedQuery(MemoryQuery):
+    def execute(self):
+        if self.op in ('insert', 'upsert'):
+            self.db.writes += 1
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            if any(str(row.get('room_code', '')).startswith('BAD') for row in payload):
+                raise ValueError("violates check constraint")
+        return super().execute()
+
+class CheckedDB(MemoryDB):
+    """MemoryDB ที่ปฏิเสธทั้ง batch ถ้ามีห้องรหัสขึ้นต้นด้วย BAD (แบบ constraint ของ Postgres)"""
+
+    def __init__(self, tables=None):
+        super().__init__(tables)
+        self.writes = 0
+
+    def table(self, name):
+        return CheckedQuery(self, name)
+
+def csv_body(lines):
+    # มี BOM แบบไฟล์ที่ export จาก Excel
+    return io.BytesIO(('\ufeff' + '\n'.join(lines) + '\n').encode('utf-8'))
+
+def jsonl_body(records):
+    return io.BytesIO('\n'.join(r if isinstance(r, str) else json.dumps(r, ensure_ascii=False)
+                                for r in records).encode('utf-8'))
+
+def test_detect_format():
+    assert detect_format('NDJSON', 'text/csv') == 'jsonl'
+    assert detect_format(None, 'text/csv; charset=utf-8') == 'csv'
+    assert detect_format(None, 'application/json') is None
+    assert detect_format('xml', None) is None
+
+def test_csv_rows_validated_and_batched():
+    db = CheckedDB()
+    body = csv_body(["room_code,room_type,capacity,building",
+                     "R001,lecture,40,อาคาร 1",
+                     "R002,,abc,",
+                     ",lab,30,",
+                     "R003,lab, 35 ,",
+                     "R004,lab,20,,extra",
+                     "R005,lecture,,ตึกช่าง"])
+    report = BulkImporter(db, 'classrooms', classroom_model, batch_size=2).run(iter_records(body, 'csv'))
+    assert (report['received'], report['valid'], report['written'], report['batches']) == (6, 3, 3, 2)
+    # เลขแถวนับรวม header
+    assert [e['row'] for e in report['errors']] == [3, 4, 6]
+    assert "'capacity' must be integer" in report['errors'][0]['error']
+    assert "'room_code' is required" in report['errors'][1]['error']
+    assert report['errors'][2]['error'] == "too many columns"
+    assert [r['room_code'] for r in db.tables['classrooms']] == ['R001', 'R003', 'R005']
+    assert db.tables['classrooms'][1]['capacity'] == 35
+    assert db.tables['classrooms'][2]['building'] == 'ตึกช่าง' and 'capacity' not in db.tables['classrooms'][2]
+
+def test_jsonl_errors_reported_per_line():
+    db = CheckedDB()
+    body = jsonl_body([{"room_code": "R001"}, "", "{not json", "[1, 2]", {"room_code": "R002", "floor": 3},
+                       {"room_code": "R003", "capacity": 12.0}])
+    report = BulkImporter(db, 'classrooms', classroom_model, batch_size=10).run(iter_records(body, 'jsonl'))
+    assert report['written'] == 2 and report['error_count'] == 3
+    assert [e['row'] for e in report['errors']] == [3, 4, 5]
+    assert report['errors'][1]['error'] == "expected a JSON object"
+    assert "unknown field 'floor'" in report['errors'][2]['error']
+
+def test_failed_batch_retried_row_by_row():
+    db = CheckedDB()
+    records = [{"room_code": code} for code in ("R001", "BAD1", "R002", "R003", "BAD2", "R004")]
+    report = BulkImporter(db, 'classrooms', classroom_model, batch_size=3).run(iter_records(jsonl_body(records), 'jsonl'))
+    assert report['written'] == 4 and report['batches'] == 2
+    assert [e['row'] for e in report['errors']] == [2, 5]
+    assert [r['room_code'] for r in db.tables['classrooms']] == ['R001', 'R002', 'R003', 'R004']
+    assert db.writes == 2 + 3 + 3           # 2 batch ที่ล้ม + ลองใหม่ทีละแถว
+
+def test_upsert_and_dry_run():
+    db = CheckedDB({"classrooms": [{"id": 1, "room_code": "R001", "capacity": 10}]})
+    records = [{"room_code": "R001", "capacity": 50}, {"room_code": "R002", "capacity": 20}]
+    dry = BulkImporter(db, 'classrooms', classroom_model, batch_size=10, dry_run=True)
+    assert dry.run(iter_records(jsonl_body(records), 'jsonl'))['written'] == 0
+    assert db.writes == 0
+
+    report = BulkImporter(db, 'classrooms', classroom_model, batch_size=10, on_conflict='room_code').run(
+        iter_records(jsonl_body(records), 'jsonl'))
+    assert report['mode'] == 'upsert' and report['written'] == 2
+    assert [(r['room_code'], r['capacity']) for r in db.tables['classrooms']] == [('R001', 50), ('R002', 20)]
+
+def test_error_list_truncated(monkeypatch):
+    monkeypatch.setattr('core.bulk_import.MAX_REPORTED_ERRORS', 3)
+    records = [{"capacity": k} for k in range(5)]
+    report = BulkImporter(CheckedDB(), 'classrooms', classroom_model, batch_size=10).run(
+        iter_records(jsonl_body(records), 'jsonl'))
+    assert report['error_count'] == 5 and len(report['errors']) == 3 and report['errors_truncated']
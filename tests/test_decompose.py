@@ -0,0 +1,21 @@
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.decompose import exclusive_instructors, partition_courses
+from core.problem_cache import invalidate_problem_cache
+
+def test_exclusive_instructors_teach_in_one_part_only():
+    invalidate_problem_cache()
+    try:
+        table = ai_scheduler.load_problem(MemoryDB(generate_dataset(200, seed=1, department_local=0.9)))[0]
+    finally:
+        invalidate_problem_cache()
+    parts, _ = partition_courses(table, 3)
+    scored = exclusive_instructors(table, parts)
+    assert all(scored)
+    ids = [{int(table.instructor_ids[t]) for t in teachers} for teachers in scored]
+    for k, courses in enumerate(parts):
+        others = {int(table.instructor_ids[t]) for j, other in enumerate(parts) if j != k
+                  for i in other for t in table.teacher_options[i]}
+        assert not ids[k] & others
+        assert ids[k] <= {int(table.instructor_ids[t]) for i in courses for t in table.teacher_options[i]}
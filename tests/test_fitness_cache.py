@@ -0,0 +1,80 @@
+import random
+import pytest
+from tests.conftest import make_problem
+import core.ai_scheduler  # noqa: F401  (ลงทะเบียน creator.Individual)
+from core.fitness_engine import PopulationEvaluator
+from core.fitness_cache import FitnessCache
+from core.parallel_eval import genome_dtype, make_individual
+from core.rules import DAYS, SLOTS_PER_DAY
+
+class CountingEvaluator(PopulationEvaluator):
+    """นับจำนวน genome ที่ถูกส่งเข้าไปประเมินจริง"""
+
+    def __init__(self, *problem):
+        super().__init__(*problem)
+        self.evaluated = 0
+
+    def evaluate_population(self, population, breakdown=False):
+        self.evaluated += len(population)
+        return super().evaluate_population(population, breakdown)
+
+@pytest.fixture(scope='module')
+def problem():
+    return make_problem(60, seed=2)
+
+def random_population(table, n, seed):
+    rng = random.Random(seed)
+    dtype = genome_dtype(table)
+    return [make_individual([[rng.randrange(table.n_rooms), rng.randrange(DAYS * SLOTS_PER_DAY),
+                              rng.randrange(len(table.instructor_ids))] for _ in range(table.n_courses)], dtype)
+            for _ in range(n)]
+
+def test_map_matches_evaluator(problem):
+    population = random_population(problem[0], 12, seed=1)
+    cache = FitnessCache(CountingEvaluator(*problem), maxsize=100)
+    expected = PopulationEvaluator(*problem).map(PopulationEvaluator(*problem).evaluate, population)
+    assert cache.map(cache.evaluate, population) == expected
+    # รอบสองได้จาก cache ทั้งหมด ค่าเท่าเดิม
+    assert cache.map(cache.evaluate, population) == expected
+    assert [cache.evaluate(ind) for ind in population] == expected
+
+def test_repeats_hit_cache(problem):
+    population = random_population(problem[0], 8, seed=2)
+    evaluator = CountingEvaluator(*problem)
+    cache = FitnessCache(evaluator, maxsize=100)
+    cache.map(cache.evaluate, population)
+    cache.map(cache.evaluate, population[:5] + random_population(problem[0], 3, seed=3))
+    assert evaluator.evaluated == 11
+    assert cache.report() == {"hits": 5, "misses": 11, "size": 11, "hit_rate": round(5 / 16, 4)}
+
+def test_duplicates_in_batch_evaluated_once(problem):
+    population = random_population(problem[0], 4, seed=4)
+    batch = [population[0], population[1], population[0].copy(), population[2], population[0], population[1]]
+    evaluator = CountingEvaluator(*problem)
+    cache = FitnessCache(evaluator, maxsize=100)
+    results = cache.map(cache.evaluate, batch)
+    assert evaluator.evaluated == 3
+    assert results[0] == results[2] == results[4] and results[1] == results[5]
+    assert (cache.hits, cache.misses) == (3, 3)
+
+def test_lru_bounded_and_evicts_oldest(problem):
+    population = random_population(problem[0], 6, seed=5)
+    evaluator = CountingEvaluator(*problem)
+    cache = FitnessCache(evaluator, maxsize=3)
+    for ind in population[:3]:
+        cache.evaluate(ind)
+    cache.evaluate(population[0])             # ใช้ล่าสุด -> ตัวเก่าสุดคือ population[1]
+    cache.evaluate(population[3])
+    assert len(cache.entries) == 3
+    assert FitnessCache.genome_key(population[1]) not in cache.entries
+    assert FitnessCache.genome_key(population[0]) in cache.entries
+
+    evaluator.evaluated = 0
+    cache.map(cache.evaluate, population)
+    assert len(cache.entries) == 3
+    assert evaluator.evaluated == 3           # 0, 2, 3 ยังอยู่ใน cache
+
+def test_map_passes_other_functions_through(problem):
+    cache = FitnessCache(CountingEvaluator(*problem), maxsize=10)
+    assert cache.map(len, [[1, 2], [3]]) == [2, 1]
+    assert cache.report() == {"hits": 0, "misses": 0, "size": 0, "hit_rate": 0.0}
@@ -0,0 +1,107 @@
+import random
+import numpy as np
+import pytest
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.rules import DAYS, SLOTS_PER_DAY
+from core.problem_cache import invalidate_problem_cache
+from core.fitness_engine import PopulationEvaluator
+from core.delta_eval import DeltaEvaluator
+from core.parallel_eval import genome_dtype, make_individual
+
+N_INDIVIDUALS = 30
+
+@pytest.fixture(scope='module')
+def problem():
+    invalidate_problem_cache()
+    problem = ai_scheduler.load_problem(MemoryDB(generate_dataset(80, seed=3)))
+    invalidate_problem_cache()
+    return problem
+
+def random_gene(table, rng):
+    """gene สุ่มทั้งโดเมน (ชนกัน / ผิดกฎได้ทุกข้อ)"""
+    return [rng.randrange(table.n_rooms), rng.randrange(DAYS * SLOTS_PER_DAY), rng.randrange(len(table.instructor_ids))]
+
+def random_genes(table, rng):
+    return [random_gene(table, rng) for _ in range(table.n_courses)]
+
+def individuals(table, seed):
+    """ครึ่งหนึ่งสุ่มทั้งโดเมน อีกครึ่งจาก smart initializer (ใกล้ตารางจริง)"""
+    rng = random.Random(seed)
+    random.seed(seed)
+    dtype = genome_dtype(table)
+    out = [make_individual(random_genes(table, rng), dtype) for _ in range(N_INDIVIDUALS // 2)]
+    out += [ai_scheduler.create_smart_individual(table) for _ in range(N_INDIVIDUALS - len(out))]
+    return out
+
+def blocked_subset(table, seed):
+    """CourseTable ย่อยที่จองชั่วโมงห้อง / ครูไว้บางส่วน (แบบ decompose) ให้กฎ reserved มีผล"""
+    rng = random.Random(seed)
+    sub = table.subset(range(0, table.n_courses, 2))
+    hours = DAYS * SLOTS_PER_DAY
+    sub.block({r: rng.sample(range(hours), 15) for r in range(sub.n_rooms)},
+              {t: rng.sample(range(hours), 10) for t in range(len(sub.instructor_ids))})
+    return sub
+
+def legacy(population, table, instructor_details_map, head_instructor_ids):
+    return [ai_scheduler.evaluate(ind, table, instructor_details_map, head_instructor_ids)[0] for ind in population]
+
+@pytest.mark.parametrize('blocked', [False, True])
+def test_vectorized_matches_legacy(problem, blocked):
+    table, instructor_details_map, head_instructor_ids = problem
+    if blocked: table = blocked_subset(table, 1)
+    population = individuals(table, 2)
+    vectorized = PopulationEvaluator(table, instructor_details_map, head_instructor_ids).evaluate_population(population)
+    expected = legacy(population, table, instructor_details_map, head_instructor_ids)
+    assert vectorized.tolist() == pytest.approx(expected, rel=1e-12)
+
+@pytest.mark.parametrize('blocked', [False, True])
+def test_breakdown_sums_to_penalty(problem, blocked):
+    table, instructor_details_map, head_instructor_ids = problem
+    if blocked: table = blocked_subset(table, 1)
+    population = individuals(table, 3)
+    penalty, terms = PopulationEvaluator(table, instructor_details_map, head_instructor_ids).evaluate_population(
+        population, breakdown=True)
+    assert sum(terms.values()) == pytest.approx(penalty, rel=1e-12)
+    if blocked: assert terms['reserved'].any()
+
+@pytest.mark.parametrize('blocked', [False, True])
+def test_delta_matches_full(problem, blocked):
+    table, instructor_details_map, head_instructor_ids = problem
+    if blocked: table = blocked_subset(table, 1)
+    full = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+    delta = DeltaEvaluator(PopulationEvaluator(table, instructor_details_map, head_instructor_ids))
+    rng = random.Random(4)
+    for ind in individuals(table, 4):
+        # build() ครั้งเดียว แล้วแก้ทีละไม่กี่ gene ผ่าน apply() (แบบ ScheduleEditor)
+        genes = np.array(ind, dtype=np.int64)
+        state = delta.build(genes)
+        for _ in range(5):
+            got = state.penalty()
+            assert got == pytest.approx(float(full.evaluate_population([genes])[0]), rel=1e-12)
+            assert got == pytest.approx(legacy([genes], table, instructor_details_map, head_instructor_ids)[0],
+                                        rel=1e-12)
+            changed = np.array(rng.sample(range(table.n_courses), 3))
+            for i in changed:
+                genes[i] = random_gene(table, rng)
+            delta.apply(state, genes, changed)
+    assert delta.delta_evals > 0
+
+def test_workload_terms_follow_restricted_instructors(problem):
+    table, instructor_details_map, head_instructor_ids = problem
+    population = individuals(table, 5)
+    penalty, terms = PopulationEvaluator(table, instructor_details_map, head_instructor_ids).evaluate_population(
+        population, breakdown=True)
+
+    everyone = table.copy()
+    everyone.restrict_workload(range(len(table.instructor_ids)))
+    assert PopulationEvaluator(everyone, instructor_details_map, head_instructor_ids).evaluate_population(
+        population).tolist() == penalty.tolist()
+
+    # ไม่นับครูคนไหนเลย: เหลือเฉพาะโทษราย gene และการชน
+    nobody = table.copy()
+    nobody.restrict_workload([])
+    workload = sum(terms[name] for name in ('head_load', 'min_load', 'comp_days', 'sd'))
+    assert PopulationEvaluator(nobody, instructor_details_map, head_instructor_ids).evaluate_population(
+        population) == pytest.approx(penalty - workload, rel=1e-12)
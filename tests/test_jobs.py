@@ -0,0 +1,44 @@
+import threading
+from core.jobs import JobManager
+
+class BlockingRunner:
+    """runner ที่รอจนกว่าจะถูกปล่อย (หรือถูกยกเลิก) แล้วบันทึกว่าถูกเรียกด้วย params อะไร"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, progress=None, cancel_event=None, **params):
+        self.calls.append(params)
+        self.started.set()
+        while not self.release.is_set() and not cancel_event.is_set():
+            self.release.wait(0.01)
+        return {"status": "cancelled" if cancel_event.is_set() else "success"}
+
+def test_cancel_queued_job_never_runs():
+    runner = BlockingRunner()
+    manager = JobManager(runner, max_workers=1)
+    first, _ = manager.submit({"mode": "fast"})
+    assert runner.started.wait(5)
+    queued, _ = manager.submit({"mode": "balanced"})
+    manager.cancel(queued.id)
+    assert queued.status == 'cancelled'
+    assert queued.fingerprint not in manager.active_by_fingerprint
+
+    runner.release.set()
+    manager.executor.shutdown(wait=True)
+    assert first.status == 'succeeded'
+    assert queued.status == 'cancelled' and queued.started_at is None
+    assert runner.calls == [{"mode": "fast"}]
+
+def test_cancel_running_job_finishes_after_runner_stops():
+    runner = BlockingRunner()
+    manager = JobManager(runner, max_workers=1)
+    job, _ = manager.submit({"mode": "fast"})
+    assert runner.started.wait(5)
+    manager.cancel(job.id)
+    manager.executor.shutdown(wait=True)
+    assert job.status == 'cancelled'
+    assert job.finished_at is not None
+    assert job.fingerprint not in manager.active_by_fingerprint
@@ -0,0 +1,81 @@
+import re
+import pytest
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.problem_cache import invalidate_problem_cache
+from core.metrics import MetricsRegistry, RunMetrics, population_diversity
+
+# บรรทัดข้อมูลของ Prometheus text format: ชื่อ{label="..."} ค่า
+SAMPLE_LINE = re.compile(r'^[a-z_]+(\{([a-z_]+="([^"\\]|\\.)*",?)+\})? -?[0-9.e+-]+$')
+
+@pytest.fixture(scope='module')
+def run():
+    registry = MetricsRegistry()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ai_scheduler, 'metrics_registry', registry)
+        invalidate_problem_cache()
+        try:
+            result = ai_scheduler.run_genetic_algorithm('fast', db=MemoryDB(generate_dataset(40, seed=3)))
+        finally:
+            invalidate_problem_cache()
+    return result, registry
+
+def test_run_report(run):
+    result, registry = run
+    assert result['status'] == 'success'
+    report = result['metrics']
+    assert report['status'] == 'success' and report['mode'] == 'fast'
+    assert {'load', 'evolve', 'save'} <= set(report['phases'])
+    assert sum(report['breakdown'].values()) == pytest.approx(result['penalty'])
+
+    generations = report['generations']
+    assert generations and all(g['nevals'] is not None for g in generations)
+    assert all(0.0 <= g['diversity'] <= 1.0 and g['best'] <= g['mean'] for g in generations)
+    assert report['evals_per_sec'] > 0
+    assert registry.recent() == [report]
+
+def test_render_is_prometheus_text(run):
+    _, registry = run
+    text = registry.render()
+    assert text.endswith('\n')
+    samples = [line for line in text.splitlines() if not line.startswith('#')]
+    assert all(SAMPLE_LINE.match(line) for line in samples), samples
+    assert 'timetable_ga_runs_total{mode="fast",status="success"} 1' in samples
+    assert any(line.startswith('timetable_ga_last_penalty{mode="fast"}') for line in samples)
+    assert any('constraint="teacher_clash"' in line for line in samples)
+
+def test_disabled_metrics_are_not_recorded():
+    metrics = RunMetrics('fast', enabled=False)
+    with metrics.span('evolve'):
+        pass
+    metrics.generation(0, 1, [])
+    metrics.finish('success', 1.0)
+    assert metrics.phases == {} and metrics.report() is None
+
+    registry = MetricsRegistry()
+    registry.record(metrics)
+    assert registry.recent() == [] and registry.runs_total == {}
+
+def test_registry_keeps_recent_runs_and_escapes_labels():
+    registry = MetricsRegistry(max_runs=2)
+    for k in range(3):
+        metrics = RunMetrics('fast' if k < 2 else 'a"b\\c', enabled=True)
+        with metrics.span('load'):
+            pass
+        metrics.finish('error')
+        registry.record(metrics)
+    assert len(registry.recent()) == 2
+    assert registry.runs_total[('fast', 'error')] == 2
+    text = registry.render()
+    assert 'timetable_ga_runs_total{mode="a\\"b\\\\c",status="error"} 1' in text
+    assert all(SAMPLE_LINE.match(line) for line in text.splitlines() if not line.startswith('#'))
+
+def test_population_diversity(small_problem):
+    table = small_problem[0]
+    first = ai_scheduler.create_smart_individual(table)
+    assert population_diversity([first, first.copy()], first) == 0.0
+    other = first.copy()
+    other[: table.n_courses // 2, 0] += 1
+    assert population_diversity([first, other], first) == pytest.approx((table.n_courses // 2) / table.n_courses / 2)
+    assert population_diversity([], first) == 0.0
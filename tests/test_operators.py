@@ -0,0 +1,99 @@
+import random
+import numpy as np
+import pytest
+import core.ai_scheduler as ai_scheduler
+from core.rules import DAYS, SLOTS_PER_DAY
+from core.fitness_engine import PopulationEvaluator
+from core.occupancy import feasible_starts
+from tests.conftest import make_problem
+
+CLASH_TERMS = ('room_clash', 'teacher_clash', 'group_clash')
+
+@pytest.fixture
+def pinned_problem():
+    """ปัญหา 80 วิชาที่ pin ไว้ครึ่งหนึ่งกับตารางเดิม (แบบ warm start)"""
+    table = make_problem(80, seed=3)[0]
+    random.seed(3)
+    base_genes = ai_scheduler.create_smart_individual(table).tolist()
+    table = table.copy()
+    table.pin(base_genes, [i % 2 == 0 for i in range(table.n_courses)])
+    return table
+
+def assert_in_domain(individual, table, before=None):
+    """ทุก gene อยู่ในช่วง index และอยู่ใน domain ของวิชานั้น (ห้องตามประเภท, ครูในรายชื่อ)
+
+    before = individual ก่อนแก้: วิชาที่ย้ายเวลาต้องได้เวลาที่ลงได้ หรือเวลาเดิมของวิชาอื่นที่ยาวเท่ากัน (swap)
+    (initializer อาจวางวิชาที่หาช่องไม่ได้ไว้นอกเวลาที่ลงได้ จึงเช็คเฉพาะที่ย้าย)
+    """
+    genes = np.asarray(individual)
+    assert genes.shape == (table.n_courses, 3)
+    assert (genes >= 0).all()
+    assert (genes[:, 0] < table.n_rooms).all()
+    assert (genes[:, 1] < DAYS * SLOTS_PER_DAY).all()
+    assert (genes[:, 2] < len(table.instructor_ids)).all()
+    for i, (room, start, teacher) in enumerate(genes.tolist()):
+        assert table.room_mask[i, room]
+        assert teacher in table.teacher_options[i]
+        if before is not None and start != before[i, 1]:
+            duration = int(table.duration[i])
+            swapped = {int(before[j, 1]) for j in range(table.n_courses) if table.duration[j] == duration}
+            assert start in feasible_starts(duration)[0] or start in swapped
+
+def assert_pins_kept(individual, table):
+    for i in np.flatnonzero(table.pinned):
+        assert individual[i].tolist() == list(table.pinned_genes[i])
+
+def test_mutation_stays_in_domain_and_keeps_pins(pinned_problem):
+    table = pinned_problem
+    random.seed(4)
+    individual = ai_scheduler.create_smart_individual(table)
+    assert_in_domain(individual, table)
+    moved = np.zeros(table.n_courses, dtype=bool)
+    for _ in range(200):
+        before = individual.copy()
+        ai_scheduler.smart_mutate(individual, table, indpb=0.3, swap_prob=1.0)
+        moved |= (individual != before).any(axis=1)
+        assert_in_domain(individual, table, before)
+        assert_pins_kept(individual, table)
+    assert not moved[table.pinned | table.is_scout].any()
+    assert moved[table.movable].all()
+
+def test_swap_move_keeps_pins_and_room_types(pinned_problem):
+    table = pinned_problem
+    random.seed(5)
+    individual = ai_scheduler.create_smart_individual(table)
+    starts = sorted(individual[:, 1].tolist())
+    for _ in range(500):
+        ai_scheduler.swap_move(individual, table)
+    assert_in_domain(individual, table)
+    assert sorted(individual[:, 1].tolist()) == starts  # สลับเวลากันเท่านั้น ไม่สร้างเวลาใหม่
+    assert_pins_kept(individual, table)
+
+def test_crossover_offspring_are_valid_and_repaired(pinned_problem, monkeypatch):
+    table = pinned_problem
+    scorer = PopulationEvaluator(table, *make_problem(80, seed=3)[1:])
+    random.seed(6)
+    clashes = {'repaired': 0, 'raw': 0}
+    for _ in range(30):
+        parents = [ai_scheduler.create_smart_individual(table) for _ in range(2)]
+        state = random.getstate()
+        children = ai_scheduler.cx_blocks(parents[0].copy(), parents[1].copy(), table)
+
+        # ลำดับสุ่มเดียวกันแต่ไม่ซ่อม (ไว้เทียบจำนวนการชน)
+        random.setstate(state)
+        unrepaired = [p.copy() for p in parents]
+        with monkeypatch.context() as m:
+            m.setattr(ai_scheduler, 'repair_conflicts', lambda *args: None)
+            ai_scheduler.cx_blocks(unrepaired[0], unrepaired[1], table)
+
+        for child, raw in zip(children, unrepaired):
+            assert isinstance(child, type(parents[0])) and child.dtype == parents[0].dtype
+            assert_in_domain(child, table, raw)
+            assert_pins_kept(child, table)
+            # ครูมาจากพ่อแม่เสมอ การซ่อมขยับแค่ห้อง / เวลา
+            assert (child[:, 2] == raw[:, 2]).all()
+            for name, genes in (('repaired', child), ('raw', raw)):
+                _, terms = scorer.evaluate_population([genes], breakdown=True)
+                clashes[name] += sum(int(terms[t][0]) for t in CLASH_TERMS)
+    # การซ่อมแบบ greedy อาจทำให้บางตัวแย่ลงเล็กน้อย แต่โดยรวมต้องลดการชนที่เกิดจากการแลกก้อน
+    assert clashes['repaired'] < clashes['raw']
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+from core.problem_cache import ProblemCache
+
+@pytest.fixture
+def db():
+    return MemoryDB(generate_dataset(40, seed=6))
+
+def test_second_get_is_a_hit(db):
+    cache = ProblemCache(ttl=60)
+    first = cache.get(db)
+    assert cache.get(db) is first
+    assert (cache.loads, cache.hits) == (1, 1)
+    assert cache.report()["fingerprint"] == first.fingerprint
+
+def test_invalidate_with_same_data_reuses_snapshot(db):
+    cache = ProblemCache(ttl=60)
+    first = cache.get(db)
+    cache.invalidate()
+    # โหลดใหม่ แต่ข้อมูลเท่าเดิม -> snapshot เดิม ไม่คอมไพล์ซ้ำ
+    assert cache.get(db) is first
+    assert (cache.loads, cache.hits) == (2, 0)
+    assert cache.get(db, refresh=True) is first
+
+def test_changed_data_gives_new_fingerprint(db):
+    cache = ProblemCache(ttl=60)
+    first = cache.get(db)
+    db.table('classrooms').insert({"room_code": "NEW101", "room_type": "lecture"}).execute()
+    assert cache.get(db) is first             # ยังไม่หมดอายุ
+    cache.invalidate()
+    second = cache.get(db)
+    assert second is not first and second.fingerprint != first.fingerprint
+    assert "NEW101" in second.room_ids
+
+def test_other_client_or_ttl_zero_reloads(db):
+    cache = ProblemCache(ttl=0)
+    cache.get(db)
+    cache.get(db)
+    assert (cache.loads, cache.hits) == (2, 0)
+
+    cache = ProblemCache(ttl=60)
+    first = cache.get(db)
+    other = cache.get(MemoryDB(generate_dataset(40, seed=6)))
+    assert other is not first and other.fingerprint == first.fingerprint
+    assert cache.loads == 2
+
+def test_missing_data_returns_none():
+    cache = ProblemCache(ttl=60)
+    assert cache.get(MemoryDB({"classrooms": [], "instructors": [], "curriculums": []})) is None
+    assert cache.report()["fingerprint"] is None
+
+def test_problem_returns_table_copy(db):
+    snapshot = ProblemCache(ttl=60).get(db)
+    table, instructor_details_map, head_instructor_ids = snapshot.problem()
+    assert table is not snapshot.table
+    assert instructor_details_map is snapshot.instructor_details_map
+    genes = [[0, 0, 0]] * table.n_courses
+    table.pin(genes, np.arange(table.n_courses) % 2 == 0)
+    # pin() ของการรันหนึ่งไม่ไปแก้ snapshot ที่ใช้ร่วมกัน
+    assert table.pinned_genes is not None
+    assert snapshot.table.pinned_genes is None
+    assert not snapshot.table.pinned.any()
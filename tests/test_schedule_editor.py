@@ -0,0 +1,68 @@
+import random
+import numpy as np
+import pytest
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.rules import DAYS, SLOTS_PER_DAY
+from core.problem_cache import get_problem_snapshot, invalidate_problem_cache
+from core.schedule_editor import EditError, ScheduleEditor
+from core.schedule_store import get_active_version, load_active_rows
+
+@pytest.fixture
+def db():
+    """MemoryDB ที่บันทึกตาราง 120 วิชาไว้แล้ว 1 เวอร์ชัน"""
+    db = MemoryDB(generate_dataset(120, seed=0))
+    invalidate_problem_cache()
+    table = ai_scheduler.load_problem(db)[0]
+    random.seed(2)
+    ai_scheduler.save_to_db(ai_scheduler.create_smart_individual(table), table, db)
+    yield db
+    invalidate_problem_cache()
+
+def open_editor(db):
+    return ScheduleEditor(get_problem_snapshot(db), load_active_rows(db), get_active_version(db))
+
+def shared_key_course(table):
+    """วิชาที่มีวิชาเดียวกันของแผนก/ชั้นปีเดียวกันอยู่ในกลุ่มอื่น (และเป็นวิชาเดียวของกลุ่มตัวเอง)"""
+    by_key = {}
+    for i in range(table.n_courses):
+        by_key.setdefault((table.subject_codes[i], table.departments[i], table.year_levels[i]), []).append(i)
+    for courses in by_key.values():
+        groups = [table.group_nos[i] for i in courses]
+        for i in courses:
+            if len(set(groups)) > 1 and groups.count(table.group_nos[i]) == 1:
+                return i, courses
+    pytest.fail("dataset has no shared-key courses")
+
+def test_editor_matches_full_evaluation(db):
+    editor = open_editor(db)
+    assert editor.state.penalty() == pytest.approx(float(editor.scorer.evaluate_population([editor.genes])[0]))
+    assert sum(len(ids) for ids in editor.row_ids) == len(load_active_rows(db))
+
+def test_edit_shared_key_course(db):
+    editor = open_editor(db)
+    i, same_key = shared_key_course(editor.table)
+    others = {k: editor.genes[k].copy() for k in same_key if k != i}
+    room, start, _ = (int(x) for x in editor.genes[i])
+    day, slot = divmod(start, SLOTS_PER_DAY)
+    ref = {"subject_code": editor.table.subject_codes[i], "department": editor.table.departments[i],
+           "year_level": editor.table.year_levels[i]}
+    with pytest.raises(EditError):
+        editor.resolve(ref)
+
+    # swap อ้างวิชาด้วยวัน/คาบปัจจุบันได้ ส่วน move ใช้ group_no (วัน/คาบใน move คือตำแหน่งใหม่)
+    assert editor.resolve(dict(ref, day_of_week=day, start_slot=slot)) == i
+    changes = editor.parse({"moves": [dict(ref, group_no=editor.table.group_nos[i], day_of_week=(day + 1) % DAYS)]})
+    assert list(changes) == [i]
+    result, saved = editor.apply(changes, db, force=True)
+    assert saved is not None and result['changes'][0]['to']['group_no'] == editor.table.group_nos[i]
+
+    # โหลดตารางที่บันทึกกลับมาใหม่: วิชาที่แก้อยู่ที่ใหม่ วิชาเดียวกันของกลุ่มอื่นอยู่ที่เดิม penalty เท่ากัน
+    reloaded = open_editor(db)
+    assert reloaded.version_id == saved['version_id']
+    assert reloaded.genes[i].tolist() == [room, ((day + 1) % DAYS) * SLOTS_PER_DAY + slot, int(editor.genes[i, 2])]
+    for k, gene in others.items():
+        assert np.array_equal(reloaded.genes[k], gene)
+    assert reloaded.state.penalty() == pytest.approx(editor.state.penalty())
+    assert sum(len(ids) for ids in reloaded.row_ids) == len(load_active_rows(db))
@@ -0,0 +1,88 @@
+import json
+import random
+import pytest
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.problem_cache import invalidate_problem_cache
+from core.schedule_export import SESSION_FIELDS, _next_slot, export_csv, export_grouped_json, merge_sessions
+from core.schedule_index import ScheduleIndexCache
+
+@pytest.fixture(scope='module')
+def index():
+    db = MemoryDB(generate_dataset(80, seed=4))
+    invalidate_problem_cache()
+    try:
+        table = ai_scheduler.load_problem(db)[0]
+    finally:
+        invalidate_problem_cache()
+    random.seed(3)
+    ai_scheduler.save_to_db(ai_scheduler.create_smart_individual(table), table, db)
+    return ScheduleIndexCache(ttl=0).get(db)
+
+def reference_sessions(rows):
+    """รวมคาบแบบเก็บทั้งตาราง (วิธีเดิม) ไว้เทียบผล"""
+    open_sessions, sessions = {}, []
+    for row in rows:
+        day, slot = int(row['day_of_week']), int(row['start_slot'])
+        key = (tuple(row.get(f) for f in SESSION_FIELDS), day)
+        session = open_sessions.get(key)
+        if session is not None and _next_slot(session['end_slot'] - 1) == slot:
+            session['end_slot'] = slot + 1
+            session['hours'] += 1
+            continue
+        session = dict({f: row.get(f) for f in SESSION_FIELDS}, day_of_week=day, start_slot=slot,
+                       end_slot=slot + 1, hours=1)
+        open_sessions[key] = session
+        sessions.append(session)
+    return sorted(sessions, key=lambda s: (s['day_of_week'], s['start_slot']))
+
+def core_fields(sessions):
+    return [{f: s[f] for f in SESSION_FIELDS + ('day_of_week', 'start_slot', 'end_slot', 'hours')} for s in sessions]
+
+def test_merge_matches_reference(index):
+    sessions = list(merge_sessions(index.iter_rows(None)))
+    assert core_fields(sessions) == reference_sessions(index.rows)
+    assert sum(s['hours'] for s in sessions) == len(index.rows)
+    assert any(s['hours'] > 1 for s in sessions)
+
+def test_merge_streams_without_reading_all_rows(index):
+    consumed = []
+
+    def rows():
+        for row in index.iter_rows(None):
+            consumed.append(row)
+            yield row
+
+    first = next(merge_sessions(rows()))
+    assert first['start_time'] and len(consumed) < len(index.rows)
+
+def test_iter_rows_does_not_copy(index):
+    positions = index.select('room', {'room_code': index.rows[0]['room_code']})
+    assert all(any(row is r for r in index.rows) for row in index.iter_rows(positions))
+    assert index.search('room', {'room_code': index.rows[0]['room_code']}) == list(index.iter_rows(positions))
+
+@pytest.mark.parametrize('group_by, fields', [('group', ('department', 'year_level')),
+                                              ('instructor', ('instructor_id',)), ('room', ('room_code',))])
+def test_grouped_json_yields_one_chunk_per_group(index, group_by, fields):
+    chunks = list(export_grouped_json(index, None, group_by))
+    data = json.loads(''.join(chunks))
+    assert len(chunks) == len(data['groups']) + 2  # header + ทีละกลุ่ม + ปิดท้าย
+    keys = [[str(g[f]) for f in fields] for g in data['groups']]
+    assert keys == sorted(keys)
+    assert sum(g['hours'] for g in data['groups']) == len(index.rows)
+    for g in data['groups']:
+        rows = [r for r in index.rows if all(r.get(f) == g[f] for f in fields)]
+        expected = [{k: v for k, v in s.items() if k not in fields} for s in reference_sessions(rows)]
+        assert [{k: s[k] for k in e} for s, e in zip(g['sessions'], expected)] == expected
+
+def test_grouped_json_respects_filter(index):
+    room = index.rows[0]['room_code']
+    positions = index.select('room', {'room_code': room})
+    data = json.loads(''.join(export_grouped_json(index, positions, 'group')))
+    assert sum(g['hours'] for g in data['groups']) == len(positions)
+    assert all(s['room_code'] == room for g in data['groups'] for s in g['sessions'])
+
+def test_csv_has_one_line_per_session(index):
+    text = ''.join(export_csv(index, merge_sessions(index.iter_rows(None))))
+    assert len(text.strip().splitlines()) == len(reference_sessions(index.rows)) + 1
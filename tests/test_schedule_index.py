@@ -0,0 +1,122 @@
+import json
+import random
+import pytest
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.problem_cache import invalidate_problem_cache
+from core.schedule_index import ScheduleIndexCache
+
+BUILDINGS = ["อาคาร 1", "อาคาร 2", "ตึกช่าง"]
+
+@pytest.fixture(scope='module')
+def db():
+    data = generate_dataset(80, seed=5)
+    for k, room in enumerate(data['classrooms']):
+        room['building'] = BUILDINGS[k % len(BUILDINGS)]
+        room['department_owner'] = data['instructors'][k % 3]['department'] if k % 4 else None
+    db = MemoryDB(data)
+    invalidate_problem_cache()
+    try:
+        table = ai_scheduler.load_problem(db)[0]
+    finally:
+        invalidate_problem_cache()
+    random.seed(5)
+    ai_scheduler.save_to_db(ai_scheduler.create_smart_individual(table), table, db)
+    return db
+
+@pytest.fixture(scope='module')
+def index(db):
+    return ScheduleIndexCache(ttl=0).get(db)
+
+def naive_search(db, type_, args):
+    """query เดิมของ AdvancedSchedule (กรองทีละเงื่อนไขที่ฐานข้อมูล) ไว้เทียบผล"""
+    clean = lambda name: args.get(name).strip() if args.get(name) else None
+    query = db.table('generated_schedules').select('*')
+    if type_ == 'student':
+        std_id, fname, lname = clean('id'), clean('fname'), clean('lname')
+        if std_id or fname or lname:
+            std_query = db.table('students').select('*')
+            if std_id: std_query = std_query.eq('student_id', std_id)
+            if fname: std_query = std_query.ilike('first_name', f'%{fname}%')
+            if lname: std_query = std_query.ilike('last_name', f'%{lname}%')
+            students = std_query.execute().data
+            if not students: return []
+            query = query.eq('department', students[0]['department']).eq('year_level', students[0]['year_level'])
+        else:
+            if clean('dept'): query = query.eq('department', clean('dept'))
+            if clean('year'): query = query.eq('year_level', clean('year'))
+    elif type_ == 'instructor':
+        fname, lname, dept = clean('fname'), clean('lname'), clean('dept')
+        if fname or lname or dept:
+            ins_query = db.table('instructors').select('id')
+            if fname: ins_query = ins_query.ilike('first_name', f'%{fname}%')
+            if lname: ins_query = ins_query.ilike('last_name', f'%{lname}%')
+            if dept: ins_query = ins_query.eq('department', dept)
+            instructors = ins_query.execute().data
+            if not instructors: return []
+            query = query.in_('instructor_id', [str(i['id']) for i in instructors])
+    elif type_ == 'room':
+        room_code, room_type, building, dept = clean('room_code'), clean('room_type'), clean('building'), clean('dept')
+        if room_code: query = query.ilike('room_code', f'%{room_code}%')
+        if room_type or building or dept:
+            room_query = db.table('classrooms').select('room_code')
+            if room_type: room_query = room_query.eq('room_type', room_type)
+            if building: room_query = room_query.ilike('building', f'%{building}%')
+            if dept: room_query = room_query.eq('department_owner', dept)
+            rooms = room_query.execute().data
+            if not rooms: return []
+            query = query.in_('room_code', [r['room_code'] for r in rooms])
+    elif type_ == 'subject':
+        code, name, instructor = clean('code'), clean('name'), clean('instructor')
+        if code: query = query.ilike('subject_code', f'%{code}%')
+        if name: query = query.ilike('subject_name', f'%{name}%')
+        if instructor:
+            instructors = db.table('instructors').select('id').or_(
+                f"first_name.ilike.%{instructor}%,last_name.ilike.%{instructor}%").execute().data
+            if not instructors: return []
+            query = query.in_('instructor_id', [str(i['id']) for i in instructors])
+    return query.order('day_of_week').order('start_slot').execute().data
+
+def canonical(rows):
+    """เทียบแบบไม่สนลำดับของแถวที่ (วัน, คาบ) เท่ากัน"""
+    return sorted(json.dumps(r, sort_keys=True, default=str, ensure_ascii=False) for r in rows)
+
+CASES = [
+    ('student', {'id': '000103'}),
+    ('student', {'fname': 'นักเรียน2_', 'lname': 'ทดสอบ'}),
+    ('student', {'id': 'nope'}),
+    ('student', {'dept': 'ไฟฟ้า'}),
+    ('student', {'dept': 'ไฟฟ้า', 'year': ' 2 '}),
+    ('student', {}),
+    ('instructor', {'fname': 'ครู1'}),
+    ('instructor', {'lname': 'ทดสอบ1', 'dept': 'ไฟฟ้า'}),
+    ('instructor', {'fname': 'ไม่มีครูนี้'}),
+    ('instructor', {}),
+    ('room', {'room_code': 'r000'}),
+    ('room', {'room_type': 'lecture', 'building': 'อาคาร'}),
+    ('room', {'room_code': 'R', 'dept': 'ไฟฟ้า'}),
+    ('room', {'building': 'ไม่มีตึกนี้'}),
+    ('subject', {'code': 's0001'}),
+    ('subject', {'name': 'วงจร'}),
+    ('subject', {'code': 'S000', 'instructor': 'ครู3'}),
+    ('subject', {'instructor': 'ไม่มีครูนี้'}),
+    ('unknown', {}),
+]
+
+@pytest.mark.parametrize('type_, args', CASES)
+def test_search_matches_naive_query(db, index, type_, args):
+    expected = naive_search(db, type_, args)
+    got = index.search(type_, args)
+    assert canonical(got) == canonical(expected)
+    keys = [(r['day_of_week'], r['start_slot']) for r in got]
+    assert keys == sorted(keys)
+
+def test_cases_are_not_vacuous(db, index):
+    sizes = [len(index.search(type_, args)) for type_, args in CASES]
+    assert sum(0 < n < len(index.rows) for n in sizes) >= 10
+
+def test_search_returns_copies(index):
+    row = index.search('room', {'room_code': 'R0001'})[0]
+    row['room_code'] = 'edited'
+    assert all(r['room_code'] != 'edited' for r in index.rows)
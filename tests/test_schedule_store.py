@@ -0,0 +1,66 @@
+import pytest
+from postgrest.exceptions import APIError
+from benchmarks.memory_db import MemoryDB
+from core.schedule_store import (
+    ACTIVE_TABLE, SCHEDULE_TABLE, activate_version, compare_versions, get_active_version, load_active_rows,
+    row_key, save_schedule_version,
+)
+
+def rows(*slots):
+    return [{"subject_code": f"S{k}", "subject_name": "วิชา", "room_code": "R001", "instructor_id": 1,
+             "day_of_week": 0, "start_slot": k, "department": "ไฟฟ้า", "year_level": "1", "group_no": "1"}
+            for k in slots]
+
+def versioned_db():
+    return MemoryDB({SCHEDULE_TABLE: [], "schedule_versions": [{"id": 0, "status": "ready", "mode": "legacy"}],
+                     ACTIVE_TABLE: [{"id": 1, "version_id": 0}]})
+
+class FailingActiveDB(MemoryDB):
+    """อ่าน schedule_active ไม่ได้ด้วย error ที่กำหนด"""
+
+    def __init__(self, tables, error):
+        super().__init__(tables)
+        self.error = error
+
+    def table(self, name):
+        if name == ACTIVE_TABLE:
+            raise self.error
+        return super().table(name)
+
+def keys(data):
+    return sorted(row_key(r) for r in data)
+
+def test_save_only_inserts_changed_rows_and_rolls_back():
+    db = versioned_db()
+    first = save_schedule_version(rows(0, 1, 2), db, workers=1)
+    second = save_schedule_version(rows(0, 1, 3), db, workers=1)
+    assert (first['added'], second['added'], second['removed']) == (3, 1, 1)
+    assert len(db.tables[SCHEDULE_TABLE]) == 4  # แถวเดิมถูกปิด ไม่ถูกลบ
+    assert keys(load_active_rows(db)) == keys(rows(0, 1, 3))
+
+    diff = compare_versions(first['version_id'], second['version_id'], db)
+    assert (len(diff['added']), len(diff['removed']), diff['unchanged']) == (1, 1, 2)
+    assert activate_version(first['version_id'], db)
+    assert keys(load_active_rows(db)) == keys(rows(0, 1, 2))
+
+@pytest.mark.parametrize('code', ['42P01', 'PGRST205'])
+def test_missing_active_table_uses_legacy_table(code):
+    db = FailingActiveDB({SCHEDULE_TABLE: rows(0, 1)}, APIError({"code": code, "message": "missing"}))
+    assert get_active_version(db) is None
+    assert keys(load_active_rows(db)) == keys(rows(0, 1))
+    saved = save_schedule_version(rows(2), db, workers=1)
+    assert saved['version_id'] is None and keys(db.tables[SCHEDULE_TABLE]) == keys(rows(2))
+
+@pytest.mark.parametrize('error', [APIError({"code": "57014", "message": "canceling statement due to statement timeout"}),
+                                   ConnectionError("connection reset")])
+def test_other_errors_do_not_fall_back_to_legacy_save(error):
+    tables = versioned_db().tables
+    tables[SCHEDULE_TABLE] = [dict(r, id=k + 1, valid_from=0) for k, r in enumerate(rows(0, 1))]
+    db = FailingActiveDB(tables, error)
+    with pytest.raises(type(error)):
+        get_active_version(db)
+    with pytest.raises(type(error)):
+        load_active_rows(db)
+    with pytest.raises(type(error)):
+        save_schedule_version(rows(2), db, workers=1)
+    assert keys(db.tables[SCHEDULE_TABLE]) == keys(rows(0, 1))  # ประวัติไม่ถูกลบ
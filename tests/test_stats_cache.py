@@ -0,0 +1,60 @@
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+from core.stats_cache import COUNTED_TABLES, StatsCache
+
+class FailingDB(MemoryDB):
+    """MemoryDB ที่นับแถวไม่ได้ (เช่น network หลุด) เมื่อ failing = True"""
+    failing = False
+
+    def table(self, name):
+        if self.failing:
+            raise ConnectionError("network down")
+        return super().table(name)
+
+def expected_counts(db):
+    return {key: len(db.tables[table]) for key, table in COUNTED_TABLES.items()}
+
+def test_counts_match_tables_and_are_cached():
+    db = MemoryDB(generate_dataset(40, seed=1))
+    cache = StatsCache(ttl=60)
+    body, error = cache.get(db)
+    assert error is None and not body['stale']
+    assert {key: body[key] for key in COUNTED_TABLES} == expected_counts(db)
+
+    # ยังไม่หมดอายุ -> ไม่นับใหม่
+    db.table('students').insert({"student_id": "x1", "first_name": "a", "last_name": "b"}).execute()
+    assert cache.get(db)[0]['students'] == body['students']
+    cache.invalidate()
+    assert cache.get(db)[0]['students'] == body['students'] + 1
+
+def test_bump_after_insert():
+    db = MemoryDB(generate_dataset(40, seed=1))
+    cache = StatsCache(ttl=60)
+    cache.bump('rooms')                       # ยังไม่เคยนับ -> ไม่ทำอะไร
+    assert cache.counts is None
+    before = cache.get(db)[0]['rooms']
+    cache.bump('rooms', 2)
+    cache.bump('unknown')
+    body = cache.get(db)[0]
+    assert body['rooms'] == before + 2 and 'unknown' not in body
+
+def test_failure_returns_stale_counts():
+    db = FailingDB(generate_dataset(40, seed=1))
+    cache = StatsCache(ttl=0)
+    first, _ = cache.get(db)
+
+    db.failing = True
+    body, error = cache.get(db)
+    assert error and body['stale']
+    assert {key: body[key] for key in COUNTED_TABLES} == {key: first[key] for key in COUNTED_TABLES}
+
+    # ไม่เคยนับสำเร็จเลย -> ไม่มีตัวเลขให้คืน
+    body, error = StatsCache(ttl=60).get(db)
+    assert body is None and error
+
+def test_record_generation():
+    cache = StatsCache(ttl=60)
+    cache.record_generation({"penalty": 12.5, "generations": 40})
+    body, _ = cache.get(MemoryDB(generate_dataset(40, seed=1)))
+    assert body['last_generation']['penalty'] == 12.5
+    assert 'finished_at' in body['last_generation']
@@ -0,0 +1,45 @@
+import random
+import numpy as np
+import pytest
+from benchmarks.memory_db import MemoryDB
+from benchmarks.synthetic import generate_dataset
+import core.ai_scheduler as ai_scheduler
+from core.problem_cache import invalidate_problem_cache
+from core.fitness_engine import PopulationEvaluator
+from core.warm_start import load_current_schedule, rebuild_individual
+
+@pytest.fixture
+def saved():
+    """ตาราง 120 วิชา (มีวิชาเดียวกันในแผนก/ชั้นปีเดียวกันแต่คนละกลุ่ม) ที่บันทึกลง MemoryDB แล้ว"""
+    db = MemoryDB(generate_dataset(120, seed=0))
+    invalidate_problem_cache()
+    try:
+        table, instructor_details_map, head_instructor_ids = ai_scheduler.load_problem(db)
+    finally:
+        invalidate_problem_cache()
+    random.seed(1)
+    individual = ai_scheduler.create_smart_individual(table)
+    ai_scheduler.save_to_db(individual, table, db)
+    scorer = PopulationEvaluator(table, instructor_details_map, head_instructor_ids)
+    return db, table, individual, scorer
+
+def shared_keys(table):
+    groups_by_key = {}
+    for i in range(table.n_courses):
+        key = (table.subject_codes[i], table.departments[i], table.year_levels[i])
+        groups_by_key.setdefault(key, set()).add(table.group_nos[i])
+    return [key for key, groups in groups_by_key.items() if len(groups) > 1]
+
+def test_round_trip_keeps_penalty(saved):
+    db, table, individual, scorer = saved
+    assert shared_keys(table)
+    genes = rebuild_individual(load_current_schedule(db), table)
+    assert all(gene is not None for gene in genes)
+    rebuilt = np.array(genes, dtype=np.int64)
+    assert float(scorer.evaluate_population([rebuilt])[0]) == float(scorer.evaluate_population([individual])[0])
+
+def test_rows_without_group_no_still_rebuild(saved):
+    # แถวที่บันทึกก่อน migrations/002 ไม่มี group_no: ยังโหลดได้ครบทุกวิชา (จับคู่โดยไม่ดูกลุ่ม)
+    db, table, _, _ = saved
+    rows = [dict(row, group_no=None) for row in load_current_schedule(db)]
+    assert all(gene is not None for gene in rebuild_individual(rows, table))